@@ -0,0 +1,168 @@
+# ai_executor.py
+"""
+Ejecutor concurrente de solicitudes a la IA.
+- Pool de hilos compartido por el proceso: las llamadas salen del hilo del script de Streamlit
+- Limitador global tipo token bucket (solicitudes por segundo con ráfaga acotada)
+- Tope de solicitudes simultáneas por sesión de Streamlit (sin retener sesiones inactivas)
+- Coalescencia: prompts idénticos en vuelo comparten una sola llamada al proveedor
+- Métricas de cola (profundidad, en curso, espera media)
+"""
+
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+HILOS = int(os.getenv("FINMIND_IA_HILOS", "8"))
+SOLICITUDES_POR_S = float(os.getenv("FINMIND_IA_RPS", "2"))
+RAFAGA = int(os.getenv("FINMIND_IA_RAFAGA", "5"))
+MAX_POR_SESION = int(os.getenv("FINMIND_IA_POR_SESION", "2"))
+ESPERA_SESION_S = float(os.getenv("FINMIND_IA_ESPERA_SESION_S", "30"))
+
+
+class TokenBucket:
+    """Repone 'tasa' fichas por segundo hasta 'capacidad'; cada solicitud consume una."""
+
+    def __init__(self, tasa: float = SOLICITUDES_POR_S, capacidad: int = RAFAGA):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._fichas = float(capacidad)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self) -> float:
+        """Bloquea hasta obtener una ficha; devuelve los segundos esperados."""
+        inicio = time.monotonic()
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return ahora - inicio
+                falta = (1 - self._fichas) / self.tasa
+            time.sleep(falta)
+
+
+_POOL = ThreadPoolExecutor(max_workers=HILOS, thread_name_prefix="ia")
+_BUCKET = TokenBucket()
+_EN_VUELO: Dict[str, Future] = {}
+# referencias débiles: el cupo de una sesión vive mientras alguna llamada lo use; una sesión
+# inactiva no retiene memoria y, si vuelve, recibe un cupo nuevo (libre, como el anterior)
+_SESIONES: "weakref.WeakValueDictionary[str, threading.BoundedSemaphore]" = weakref.WeakValueDictionary()
+_LOCK = threading.Lock()
+_STATS = {"enviadas": 0, "coalescidas": 0, "rechazadas": 0, "completadas": 0, "errores": 0,
+          "en_cola": 0, "en_curso": 0, "espera_total_s": 0.0}
+
+
+def sesion_actual() -> str:
+    """Id de la sesión de Streamlit que ejecuta el script (o 'global' fuera de Streamlit)."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        return ctx.session_id if ctx is not None else "global"
+    except Exception:
+        return "global"
+
+
+def _semaforo(sesion: str) -> threading.BoundedSemaphore:
+    with _LOCK:
+        semaforo = _SESIONES.get(sesion)
+        if semaforo is None:
+            semaforo = threading.BoundedSemaphore(MAX_POR_SESION)
+            _SESIONES[sesion] = semaforo
+        return semaforo
+
+
+@contextmanager
+def turno(sesion: Optional[str] = None) -> Iterator[None]:
+    """Reserva un cupo de la sesión y una ficha del limitador global (para llamadas fuera del pool)."""
+    semaforo = _semaforo(sesion or sesion_actual())
+    if not semaforo.acquire(timeout=ESPERA_SESION_S):
+        with _LOCK:
+            _STATS["rechazadas"] += 1
+        raise RuntimeError("Hay demasiadas consultas a la IA en curso para esta sesión; intenta en unos segundos.")
+    try:
+        espera = _BUCKET.adquirir()
+        with _LOCK:
+            _STATS["espera_total_s"] += espera
+        yield
+    finally:
+        semaforo.release()
+
+
+def _ejecutar_en_pool(clave: str, fn: Callable[[], str], semaforo: threading.BoundedSemaphore) -> str:
+    with _LOCK:
+        _STATS["en_cola"] -= 1
+    espera = _BUCKET.adquirir()
+    with _LOCK:
+        _STATS["en_curso"] += 1
+        _STATS["espera_total_s"] += espera
+    try:
+        resultado = fn()
+        with _LOCK:
+            _STATS["completadas"] += 1
+        return resultado
+    except Exception:
+        with _LOCK:
+            _STATS["errores"] += 1
+        raise
+    finally:
+        with _LOCK:
+            _STATS["en_curso"] -= 1
+            _EN_VUELO.pop(clave, None)
+        semaforo.release()
+
+
+def ejecutar(clave: str, fn: Callable[[], str], sesion: Optional[str] = None,
+             timeout: Optional[float] = None) -> str:
+    """
+    Ejecuta fn() en el pool y espera su resultado. 'clave' identifica el prompt: si ya hay una
+    llamada idéntica en vuelo se espera esa misma en lugar de abrir otra.
+    'timeout' acota toda la espera, incluida la del cupo de la sesión.
+    """
+    inicio = time.monotonic()
+    with _LOCK:
+        futuro = _EN_VUELO.get(clave)
+        if futuro is not None:
+            _STATS["coalescidas"] += 1
+    if futuro is not None:
+        return futuro.result(timeout=timeout)
+
+    semaforo = _semaforo(sesion or sesion_actual())
+    espera_max = ESPERA_SESION_S if timeout is None else min(ESPERA_SESION_S, timeout)
+    if not semaforo.acquire(timeout=espera_max):
+        with _LOCK:
+            _STATS["rechazadas"] += 1
+        raise RuntimeError("Hay demasiadas consultas a la IA en curso para esta sesión; intenta en unos segundos.")
+
+    with _LOCK:
+        futuro = _EN_VUELO.get(clave)
+        if futuro is None:
+            _STATS["enviadas"] += 1
+            _STATS["en_cola"] += 1
+            futuro = _POOL.submit(_ejecutar_en_pool, clave, fn, semaforo)
+            _EN_VUELO[clave] = futuro
+            propio = True
+        else:
+            _STATS["coalescidas"] += 1
+            propio = False
+    if not propio:
+        semaforo.release()
+    # lo esperado por el cupo se descuenta del presupuesto
+    restante = None if timeout is None else max(0.0, timeout - (time.monotonic() - inicio))
+    return futuro.result(timeout=restante)
+
+
+def estadisticas() -> Dict[str, float]:
+    with _LOCK:
+        stats = dict(_STATS)
+        stats["en_vuelo"] = len(_EN_VUELO)
+        stats["sesiones"] = len(_SESIONES)
+    terminadas = stats["completadas"] + stats["errores"]
+    stats["espera_media_s"] = stats["espera_total_s"] / terminadas if terminadas else 0.0
+    return stats
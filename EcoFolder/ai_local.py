@@ -0,0 +1,155 @@
+# ai_local.py
+"""
+Motores de IA locales que respaldan a Gemini (sin red ni clave de API).
+- MotorReglas: asistente por palabras clave y KPIs (el de tempCodeRunnerFile.py), instantáneo
+- MotorTransformers: modelo de transformers en CPU (FINMIND_MODELO_LOCAL), cargado una sola vez
+- Interfaz común: nombre, disponible() y generar(prompt, pregunta)
+
+FINMIND_IA_LOCAL elige el motor ("reglas" por defecto o "transformers"); si el modelo
+no se puede cargar se usa el de reglas.
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Optional
+
+MOTOR_LOCAL = os.getenv("FINMIND_IA_LOCAL", "reglas")
+MODELO_LOCAL = os.getenv("FINMIND_MODELO_LOCAL", "google/flan-t5-small")
+MAX_TOKENS_LOCAL = int(os.getenv("FINMIND_MODELO_LOCAL_TOKENS", "256"))
+MAX_CARACTERES_PROMPT_LOCAL = 2_000  # los modelos pequeños tienen contexto corto
+
+# "ingresos: 1,234.5", "'total_gastos': 99.0", "\"flujo_total\":-3" ...
+_KPI = re.compile(
+    r"""["']?(?P<clave>[a-z_]*(?:ingreso|gasto|flujo|ahorro)[a-z_]*)["']?\s*[:=]\s*\$?(?P<valor>-?[\d,]*\.?\d+(?:e[-+]?\d+)?)(?P<pct>\s*%)?""",
+    re.IGNORECASE,
+)
+
+_REGLAS = [
+    (("mejorar", "aumentar", "incrementar", "ganar", "ingresos"), "Aumentar ingresos", 85),
+    (("reducir", "bajar", "disminuir", "gastos", "ahorrar"), "Reducir gastos", 90),
+    (("invertir", "inversión", "inversion", "rendimiento"), "Invertir de forma segura", 80),
+    (("ahorro", "guardar"), "Ahorrar más", 88),
+    (("flujo", "efectivo", "liquidez", "optimizar"), "Optimizar flujo de efectivo", 82),
+]
+
+
+class MotorReglas:
+    nombre = "reglas"
+
+    def disponible(self) -> bool:
+        return True
+
+    @staticmethod
+    def kpis_del_prompt(prompt: str) -> Dict[str, float]:
+        """Primer valor de ingresos/gastos/flujo/ahorro que aparezca en el prompt."""
+        kpis: Dict[str, float] = {}
+        for m in _KPI.finditer(prompt):
+            clave = m.group("clave").lower()
+            for nombre in ("ingreso", "gasto", "flujo", "ahorro"):
+                if nombre in clave and nombre not in kpis:
+                    try:
+                        valor = float(m.group("valor").replace(",", ""))
+                    except ValueError:
+                        continue
+                    kpis[nombre] = valor / 100 if m.group("pct") else valor
+        if "ahorro" not in kpis and kpis.get("ingreso"):
+            kpis["ahorro"] = (kpis["ingreso"] - kpis.get("gasto", 0.0)) / kpis["ingreso"]
+        if "flujo" not in kpis and "ingreso" in kpis and "gasto" in kpis:
+            kpis["flujo"] = kpis["ingreso"] - kpis["gasto"]
+        return kpis
+
+    def generar(self, prompt: str, pregunta: Optional[str] = None) -> str:
+        sugerencia, confianza = "Analizar estado financiero general", 75
+        texto = (pregunta or "").lower()
+        for palabras, nombre, conf in _REGLAS:
+            if any(p in texto for p in palabras):
+                sugerencia, confianza = nombre, conf
+                break
+
+        kpis = self.kpis_del_prompt(prompt)
+        ahorro = kpis.get("ahorro")
+        # el ahorro puede venir como fracción (0.12) o como porcentaje sin signo (12.0)
+        if ahorro is not None and abs(ahorro) > 1:
+            ahorro /= 100
+
+        lineas = [f"**Sugerencia:** {sugerencia} (confianza {confianza}%)", "", "**Análisis de tu situación:**"]
+        if ahorro is not None:
+            if ahorro < 0.1:
+                lineas.append("- ⚠️ Tu ahorro es menor al 10%. Intenta reducir gastos no esenciales.")
+            else:
+                lineas.append(f"- ✅ Mantienes un ahorro del {ahorro * 100:.1f}%.")
+        if kpis.get("ingreso") and kpis.get("gasto", 0) > kpis["ingreso"] * 0.9:
+            lineas.append("- 🔴 Tus gastos representan más del 90% de tus ingresos. Considera un presupuesto más estricto.")
+        flujo = kpis.get("flujo")
+        if flujo is not None:
+            if flujo > 0:
+                lineas.append(f"- 💰 Flujo acumulado de ${flujo:,.0f}. Considera invertir parte del excedente.")
+            elif flujo < 0:
+                lineas.append(f"- 🚨 Flujo negativo de ${flujo:,.0f}: los gastos superan los ingresos.")
+        if len(lineas) == 3:
+            lineas.append("- No se encontraron indicadores suficientes en los datos enviados.")
+
+        lineas += ["", "**Recomendaciones específicas:**"]
+        if sugerencia == "Aumentar ingresos":
+            recs = ["Busca fuentes de ingreso adicionales o pasivas",
+                    "Revisa precios y márgenes de tus productos o servicios",
+                    "Monetiza habilidades o activos subutilizados"]
+        elif sugerencia == "Invertir de forma segura":
+            recs = ["Considera fondos de inversión de bajo riesgo",
+                    "Diversifica tus inversiones",
+                    "Consulta con un asesor financiero certificado"]
+        else:
+            recs = ["Revisa suscripciones y servicios que no uses frecuentemente",
+                    "Establece un presupuesto mensual para gastos variables",
+                    "Usa la regla 50/30/20: 50% necesidades, 30% gustos, 20% ahorro"]
+        lineas += [f"{i}. {r}" for i, r in enumerate(recs, 1)]
+        return "\n".join(lineas)
+
+
+class MotorTransformers:
+    nombre = "transformers"
+
+    def __init__(self, modelo: str = MODELO_LOCAL):
+        self.modelo = modelo
+
+    def disponible(self) -> bool:
+        try:
+            _pipeline_local(self.modelo)
+            return True
+        except Exception:
+            return False
+
+    def generar(self, prompt: str, pregunta: Optional[str] = None) -> str:
+        generador = _pipeline_local(self.modelo)
+        entrada = prompt[-MAX_CARACTERES_PROMPT_LOCAL:]
+        salida = generador(entrada, max_new_tokens=MAX_TOKENS_LOCAL, truncation=True)
+        return salida[0]["generated_text"].strip()
+
+
+@lru_cache(maxsize=2)
+def _pipeline_local(modelo: str):
+    # import diferido: torch/transformers tardan varios segundos en cargar
+    from transformers import pipeline
+    return pipeline("text2text-generation", model=modelo, device=-1)
+
+
+MOTORES = {"reglas": MotorReglas, "transformers": MotorTransformers}
+
+
+@lru_cache(maxsize=None)
+def obtener_motor_local(nombre: str = MOTOR_LOCAL):
+    motor = MOTORES.get(nombre, MotorReglas)()
+    return motor if motor.disponible() else MotorReglas()
+
+
+def respuesta_local(prompt: str, pregunta: Optional[str] = None, motivo: str = "") -> str:
+    """Respuesta del motor local con una nota visible de que no viene de Gemini."""
+    motor = obtener_motor_local()
+    try:
+        texto = motor.generar(prompt, pregunta)
+    except Exception:
+        motor = MotorReglas()
+        texto = motor.generar(prompt, pregunta)
+    nota = f"_Respuesta local ({motor.nombre}){': ' + motivo if motivo else ''}._"
+    return f"{nota}\n\n{texto}"
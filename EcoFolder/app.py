@@ -1,11 +1,8 @@
 import streamlit as st
-import pandas as pd
-import base64
-from mcp import analizar_finanzas, simular_escenario
-from gemini import asistente_financiero
-from utils import cargar_datos, mostrar_kpis, mostrar_dashboard
-from optimizer import smart_optimizer
+from assets import aplicar_estilos, logo_base64
 from landingpage.landing import mostrar_landing  # 👈 importar tu landing
+# El resto de módulos se importa al usarse: la landing no carga pandas/plotly/sklearn/genai
+# y cada página trae sus dependencias la primera vez que se abre (ver perfil_arranque.py).
 
 
 # -----------------------------------------------------
@@ -30,150 +27,9 @@ if not st.session_state.mostrar_app:
 
 
 # -----------------------------------------------------
-# FUNCIÓN PARA INCRUSTAR EL LOGO EN BASE64
+# ESTILOS GLOBALES (static/finmind.css, preparados una vez por proceso)
 # -----------------------------------------------------
-def get_img_as_base64(file_path):
-    with open(file_path, "rb") as f:
-        data = f.read()
-    return base64.b64encode(data).decode()
-
-logo_base64 = get_img_as_base64("logo/logo.png")
-
-
-# -----------------------------------------------------
-# ESTILOS GLOBALES
-# -----------------------------------------------------
-st.markdown("""
-<style>
-    header, [data-testid="stToolbar"] \
-    [data-testid="stAppViewContainer"] > .main {padding-top: 2rem;}
-
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700;900&display=swap');
-    * { font-family: 'Inter', sans-serif; }
-
-    .hero-title {
-        font-size: 3rem;
-        text-align: center;
-        color: #0E1E40;
-        margin-bottom: 0.5rem;
-        font-weight: 900;
-    }
-
-    .hero-subtitle {
-        text-align: center;
-        font-size: 1.4rem;
-        color: #D71921;
-        font-weight: 700;
-        margin-bottom: 0.3rem;
-    }
-
-    .hero-description {
-        text-align: center;
-        font-size: 1rem;
-        color: #495057;
-        margin-bottom: 2rem;
-        line-height: 1.6;
-    }
-
-    .info-card {
-        background: #fff;
-        border-radius: 20px;
-        padding: 2rem 2.5rem;
-        box-shadow: 0 10px 25px rgba(0,0,0,0.1);
-        border-left: 6px solid #D71921;
-        max-width: 700px;
-        margin: 0 auto;
-    }
-
-    .info-card h4 {
-        font-weight: 700;
-        color: #0E1E40;
-        margin-bottom: 0.5rem;
-        font-size: 1.125rem;
-    }
-
-    .info-card p {
-        color: #495057;
-        font-size: 1rem;
-        line-height: 1.6;
-        margin-bottom: 1rem;
-    }
-
-    .feature-list {
-        display: grid;
-        grid-template-columns: repeat(2, 1fr);
-        gap: 0.4rem;
-        color: #D71921;
-        font-size: 0.95rem;
-        font-weight: 600;
-    }
-
-    .feature-list li {
-        list-style: none;
-        padding-left: 1.5rem;
-        position: relative;
-    }
-
-    .feature-list li::before {
-        content: '';
-        position: absolute;
-        left: 0;
-        top: 0.5rem;
-        width: 8px;
-        height: 8px;
-        background-color: #D71921;
-        border-radius: 50%;
-    }
-
-    .start-btn {
-        text-align: center;
-        margin-top: 2rem;
-    }
-
-    .start-btn button {
-        background: linear-gradient(135deg, #D71921 0%, #FF4757 100%);
-        color: white;
-        font-weight: 700;
-        font-size: 1.2rem;
-        padding: 0.8rem 3rem;
-        border-radius: 50px;
-        border: none;
-        cursor: pointer;
-        box-shadow: 0 10px 20px rgba(215, 25, 33, 0.3);
-        transition: all 0.3s ease;
-    }
-
-    .start-btn button:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 15px 30px rgba(215, 25, 33, 0.5);
-    }
-
-    .start-btn button:disabled {
-        background: #E0E0E0;
-        color: #9E9E9E;
-        cursor: not-allowed;
-        box-shadow: none;
-    }
-
-    .start-btn button:disabled:hover {
-        transform: none;
-    }
-
-    /* LOGO + TÍTULO */
-    .app-header {
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        gap: 12px;
-        margin-bottom: 0.5rem;
-    }
-    .app-header img {
-        height: 2.6rem;
-        width: auto;
-        vertical-align: middle;
-    }
-</style>
-""", unsafe_allow_html=True)
+aplicar_estilos()
 
 
 # -----------------------------------------------------
@@ -181,7 +37,7 @@ st.markdown("""
 # -----------------------------------------------------
 st.markdown(f"""
 <div class="app-header">
-    <img src="data:image/png;base64,{logo_base64}" alt="FinMind Logo">
+    <img src="data:image/png;base64,{logo_base64()}" alt="FinMind Logo">
     <h1 class="hero-title">FinMind</h1>
 </div>
 
@@ -193,6 +49,8 @@ st.markdown(f"""
 # -----------------------------------------------------
 # CARGAR DATOS
 # -----------------------------------------------------
+from utils import cargar_datos, mostrar_kpis
+
 df = cargar_datos()
 
 
@@ -201,7 +59,7 @@ if df is None:
     st.markdown("""
     <div class='info-card'>
         <h4>Para comenzar</h4>
-        <p>Sube un archivo Excel o activa la opción de datos de ejemplo para comenzar a usar tu asistente financiero inteligente. 
+        <p>Sube un archivo (Excel, CSV, Parquet o Feather) o activa la opción de datos de ejemplo para comenzar a usar tu asistente financiero inteligente. 
         Podrás analizar tendencias, obtener insights y tomar mejores decisiones financieras.</p>
         <div class='feature-list'>
             <div> - Análisis en tiempo real</div>
@@ -219,6 +77,8 @@ if df is None:
 # -----------------------------------------------------
 # ANÁLISIS CUANDO HAY DATOS
 # -----------------------------------------------------
+from mcp import analizar_finanzas
+
 analisis = analizar_finanzas(df)
 mostrar_kpis(analisis)
 
@@ -229,48 +89,57 @@ mostrar_kpis(analisis)
 menu = st.sidebar.radio("Menú principal", ["Dashboard", "Simulador What-If", "Asistente IA", "Optimizador Inteligente", "Salud Financiera 360", "CFO Digital"])
 
 if menu == "Dashboard":
+    from utils import mostrar_dashboard, mostrar_detalle_transacciones
     mostrar_dashboard(df, analisis)
+    mostrar_detalle_transacciones(df)
     st.markdown("---")
 
     if st.button("Analizar con IA"):
         with st.spinner("Generando análisis con IA..."):
             try:
-                from dashboard_ai import analizar_dashboard_ai
-                texto_ai = analizar_dashboard_ai(df, analisis)
+                from dashboard_ai import analizar_dashboard_ai_stream
                 st.subheader("Análisis generado por IA")
-                st.write(texto_ai)
+                st.write_stream(analizar_dashboard_ai_stream(df, analisis))
             except Exception as e:
                 st.error(f"Error al generar análisis con IA: {e}")
 
 elif menu == "Simulador What-If":
+    from mcp import simular_escenario
+    from utils import mostrar_superficie_sensibilidad
     st.header("Simulación de escenarios financieros")
     inc = st.slider("Variación de ingresos (%)", -50, 100, 0) / 100
     gas = st.slider("Variación de gastos (%)", -50, 50, 0) / 100
     sim = simular_escenario(df, inc, gas)
     mostrar_kpis(sim, titulo="Resultados simulados")
+
+    with st.expander("🗺️ Superficie de sensibilidad (todos los escenarios)"):
+        mostrar_superficie_sensibilidad(df, inc, gas)
     st.markdown("---")
 
     if st.button("Analizar con IA"):
         with st.spinner("Generando análisis con IA..."):
-            from simulator_ai import analizar_simulacion_ai
+            from simulator_ai import analizar_simulacion_ai_stream
             try:
-                texto_ai = analizar_simulacion_ai(df, sim, inc, gas)
                 st.subheader("Análisis y recomendaciones (IA)")
-                st.write(texto_ai)
+                st.write_stream(analizar_simulacion_ai_stream(df, sim, inc, gas))
             except Exception as e:
                 st.error(f"Error al generar análisis con IA: {e}")
 
 elif menu == "Asistente IA":
+    from gemini import asistente_financiero
     asistente_financiero(df, analisis)
 
 elif menu == "Optimizador Inteligente":
+    from optimizer import smart_optimizer
     smart_optimizer(df)
 
 elif menu == "Salud Financiera 360":
-    from health import indice_salud_financiera, detector_anomalias
+    from health import indice_salud_financiera, detector_anomalias, detector_transacciones
     score, nivel = indice_salud_financiera(df)
     st.divider()
     detector_anomalias(df)
+    st.divider()
+    detector_transacciones(df)
 
 elif menu == "CFO Digital":
     st.header("🤖 CFO Digital — Recomendaciones y Simulaciones Inteligentes")
@@ -288,12 +157,13 @@ elif menu == "CFO Digital":
     if st.button("Generar recomendaciones CFO Digital"):
         with st.spinner("Analizando y generando informe con IA..."):
             try:
-                from decision_ai import analizar_empresa_decisiones_text
+                from decision_ai import analizar_empresa_decisiones_text, reemplazar_en_stream
                 resultado = analizar_empresa_decisiones_text(
                     df,
                     horizon_months=horizon,
                     reinvertir_pct=reinv_pct,
-                    risk_profile=risk_profile
+                    risk_profile=risk_profile,
+                    stream=True
                 )
 
                 # --- Helpers locales para formateo ---
@@ -331,14 +201,32 @@ elif menu == "CFO Digital":
 """
                 st.markdown(col_html)
 
-                # --- Mostrar proyección simple ---
-                st.subheader("📈 Proyección simple del flujo (primeros meses)")
-                ps = resultado.get("proyeccion_simple", {}).get("monthly", [])
+                # --- Mostrar proyección del flujo (forecast.py) ---
+                st.subheader("📈 Proyección del flujo")
+                proy = resultado.get("proyeccion_simple", {})
+                ps = proy.get("monthly", [])
                 if not ps:
                     st.write("No hay proyección disponible.")
-                else:
+                elif "meses" not in proy:
                     for i, val in enumerate(ps[:36]):  # limitar a 36 meses
                         st.write(f"Mes {i+1}: **{fmt_num(val)}**")
+                else:
+                    import plotly.graph_objects as go
+                    nombres_modelo = {"estacional_ingenuo": "estacional ingenuo", "holt_winters": "Holt-Winters",
+                                      "tendencia_amortiguada": "tendencia amortiguada"}
+                    st.caption(f"Modelo elegido por backtest: {nombres_modelo.get(proy['modelo'], proy['modelo'])} "
+                               "· banda: intervalo de predicción al 80%")
+                    fig_proy = go.Figure()
+                    fig_proy.add_trace(go.Scatter(x=proy["meses"], y=proy["superior_80"], mode="lines",
+                                                  line=dict(width=0), showlegend=False, hoverinfo="skip"))
+                    fig_proy.add_trace(go.Scatter(x=proy["meses"], y=proy["inferior_80"], mode="lines",
+                                                  name="Intervalo 80%", line=dict(width=0), fill="tonexty",
+                                                  fillcolor="rgba(14,30,64,0.15)"))
+                    fig_proy.add_trace(go.Scatter(x=proy["meses"], y=ps, mode="lines+markers", name="Pronóstico",
+                                                  line=dict(color="#0E1E40", width=3)))
+                    fig_proy.update_layout(xaxis_title="Mes", yaxis_title="Flujo ($)",
+                                           plot_bgcolor="#ffffff", paper_bgcolor="#ffffff")
+                    st.plotly_chart(fig_proy, use_container_width=True)
 
                 # --- Mostrar resultados Monte Carlo ---
                 st.subheader("🎲 Simulación Monte Carlo — percentiles")
@@ -350,28 +238,41 @@ elif menu == "CFO Digital":
                     st.markdown(f"- **p90 (optimista):** {fmt_num(percentiles[2])}")
                     if "mc_mu" in mc:
                         st.markdown(f"- **MC media final (mu):** {fmt_num(mc.get('mc_mu'))} (std: {fmt_num(mc.get('mc_std'))})")
+
+                    # --- Abanico de percentiles por mes ---
+                    bandas = mc.get("bandas", {})
+                    if {"p10", "p50", "p90"}.issubset(bandas):
+                        import plotly.graph_objects as go
+                        meses_mc = list(range(1, len(bandas["p50"]) + 1))
+                        fig_mc = go.Figure()
+                        fig_mc.add_trace(go.Scatter(x=meses_mc, y=bandas["p90"], mode="lines",
+                                                    line=dict(width=0), showlegend=False, hoverinfo="skip"))
+                        fig_mc.add_trace(go.Scatter(x=meses_mc, y=bandas["p10"], mode="lines", name="p10–p90",
+                                                    line=dict(width=0), fill="tonexty",
+                                                    fillcolor="rgba(215,25,33,0.15)"))
+                        fig_mc.add_trace(go.Scatter(x=meses_mc, y=bandas["p50"], mode="lines+markers",
+                                                    name="p50", line=dict(color="#D71921", width=3)))
+                        fig_mc.update_layout(title="Abanico Monte Carlo del flujo por mes",
+                                             xaxis_title="Mes", yaxis_title="Flujo ($)",
+                                             plot_bgcolor="#ffffff", paper_bgcolor="#ffffff")
+                        st.plotly_chart(fig_mc, use_container_width=True)
                 else:
                     st.write("No hay resultados de Monte Carlo disponibles o la simulación no retornó percentiles válidos.")
 
                 # --- Mostrar informe de IA sin líneas grises ---
                 st.subheader("🧠 Informe generado por la IA — CFO Digital")
-                texto_ai = resultado.get("gemini_text", "")
+                # Se muestra a medida que llega, reemplazando separadores por saltos de línea simples
+                chunks_ai = resultado.get("gemini_text", iter(()))
+                texto_ai = st.write_stream(reemplazar_en_stream(chunks_ai, "-------", "\n\n"))
                 if not texto_ai:
                     st.info("La IA no devolvió texto. Intenta generar nuevamente.")
-                else:
-                    # Reemplazar separadores por saltos de línea simples
-                    texto_ai = texto_ai.replace("-------", "\n\n").strip()
-                    # Mostrar en bloque legible
-                    st.markdown(texto_ai)
-                    # Alternativa: usar bloque de código preformateado si quieres exactitud
-                    # st.code(texto_ai, language=None)
 
                 # --- Explicación breve de los campos ---
                 st.markdown("### ¿Qué significa cada campo? (resumen rápido)")
                 st.markdown(
                     """
 - **KPIs (Resumen financiero):** totales históricos (ingresos, gastos, flujo), márgenes y ratios básicos.
-- **Proyección simple:** estimación usando crecimiento promedio mensual aplicado al último valor del flujo.
+- **Proyección del flujo:** pronóstico mensual con el modelo (estacional ingenuo, Holt-Winters o tendencia amortiguada) que menos erró al predecir los últimos meses; la banda es el intervalo de predicción al 80%.
 - **Monte Carlo (p10/p50/p90):** percentiles de una simulación estocástica; p10 = escenario adverso, p50 = mediana, p90 = escenario optimista.
 - **Informe IA (Resumen/Insights/Recomendaciones):** texto humano con acciones sugeridas, prioridad y riesgos.
                     """
@@ -0,0 +1,75 @@
+# assets.py
+"""
+Recursos estáticos de la app: logo, hojas de estilo, fuentes e íconos.
+- Se leen y preparan una sola vez por proceso (lru_cache); en cada rerun sólo se re-emite el texto listo
+- Una hoja por vista (static/finmind.css, static/landing.css) en un único <style> minificado
+- Fuentes (Inter) e íconos (Bootstrap Icons) desde CDN o, con FINMIND_RECURSOS_LOCALES=1,
+  desde la carpeta static/ que sirve Streamlit (server.enableStaticServing en .streamlit/config.toml):
+    static/fonts/InterVariable.woff2
+    static/bootstrap-icons/bootstrap-icons.css  (+ su carpeta fonts/)
+  Esos archivos no vienen en el repositorio: si falta alguno, ese recurso se sigue pidiendo al CDN.
+
+Streamlit borra los elementos de la página en cada rerun, por eso la hoja se emite una vez por
+rerun desde app.py (antes se emitía varias veces, con @import de fuentes y enlaces duplicados).
+"""
+
+import base64
+import os
+import re
+from functools import lru_cache
+
+import streamlit as st
+
+DIR_BASE = os.path.dirname(os.path.abspath(__file__))
+DIR_STATIC = os.path.join(DIR_BASE, "static")
+URL_STATIC = "app/static"  # ruta con la que Streamlit publica la carpeta static/
+RECURSOS_LOCALES = os.getenv("FINMIND_RECURSOS_LOCALES", "0") == "1"
+
+FUENTES_CDN = "https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800;900&display=swap"
+ICONOS_CDN = "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.css"
+FUENTE_LOCAL = ("fonts", "InterVariable.woff2")
+ICONOS_LOCALES = (("bootstrap-icons", "bootstrap-icons.css"), ("bootstrap-icons", "fonts", "bootstrap-icons.woff2"))
+
+
+def _hay_locales(*rutas) -> bool:
+    """True si se pidieron recursos locales y todos los archivos existen en static/."""
+    return RECURSOS_LOCALES and all(os.path.isfile(os.path.join(DIR_STATIC, *ruta)) for ruta in rutas)
+
+
+@lru_cache(maxsize=None)
+def imagen_base64(ruta_relativa: str) -> str:
+    with open(os.path.join(DIR_BASE, ruta_relativa), "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+
+def logo_base64() -> str:
+    return imagen_base64(os.path.join("logo", "logo.png"))
+
+
+def _minificar(css: str) -> str:
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};])\s*", r"\1", css).strip()
+
+
+def _fuentes_css() -> str:
+    if not _hay_locales(FUENTE_LOCAL):
+        return f"@import url('{FUENTES_CDN}');"
+    return (
+        "@font-face{font-family:'Inter';font-style:normal;font-weight:100 900;font-display:swap;"
+        f"src:url('{URL_STATIC}/{'/'.join(FUENTE_LOCAL)}') format('woff2');}}"
+    )
+
+
+@lru_cache(maxsize=None)
+def hoja_estilos(nombre: str = "finmind") -> str:
+    """HTML listo para st.markdown: enlace de íconos + <style> con fuentes y la hoja minificada."""
+    with open(os.path.join(DIR_STATIC, f"{nombre}.css"), encoding="utf-8") as f:
+        css = f.read()
+    href_iconos = f"{URL_STATIC}/{'/'.join(ICONOS_LOCALES[0])}" if _hay_locales(*ICONOS_LOCALES) else ICONOS_CDN
+    # @import debe ir al inicio de la hoja para que el navegador lo aplique
+    return f'<link rel="stylesheet" href="{href_iconos}"><style>{_fuentes_css()}{_minificar(css)}</style>'
+
+
+def aplicar_estilos(nombre: str = "finmind") -> None:
+    st.markdown(hoja_estilos(nombre), unsafe_allow_html=True)
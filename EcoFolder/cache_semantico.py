@@ -0,0 +1,162 @@
+# cache_semantico.py
+"""
+Segundo nivel de la caché de respuestas: prompts casi idénticos comparten respuesta.
+- Normaliza el prompt (números a N cifras significativas, espacios, mayúsculas) sólo para la clave:
+  el prompt que recibe Gemini conserva las cifras exactas. Las cifras de la pregunta del usuario
+  entran exactas en la clave (dos montos distintos nunca comparten respuesta)
+- JSON canónico (claves ordenadas, cifras exactas) para los resúmenes que van al prompt
+- Opcional (apagado por defecto): similitud de la pregunta del usuario con embeddings locales
+  (n-gramas de caracteres con hashing, sin modelos ni dependencias externas); sólo se sirve
+  si las cifras y las negaciones de ambas preguntas coinciden exactamente
+
+Las respuestas se guardan en llm_cache; el índice de preguntas vive en memoria del proceso.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import llm_cache
+from ingesta import limpiar_texto
+
+ACTIVO = os.getenv("FINMIND_LLM_CACHE_SEMANTICO", "1") == "1"
+DIGITOS = int(os.getenv("FINMIND_LLM_CACHE_DIGITOS", "3"))  # cifras significativas
+# coseno; >1 desactiva. Los trigramas no distinguen "10%" de "20%" ni "debo" de "no debo"
+UMBRAL_SIMILITUD = float(os.getenv("FINMIND_LLM_CACHE_SIMILITUD", "1.01"))
+DIM_EMBEDDING = 2048
+MAX_PREGUNTAS_POR_CONTEXTO = 256
+
+# números sueltos; no toca piezas de fechas ("2024-01") ni identificadores ("p90")
+_NUMERO = re.compile(r"(?<![\w.\-])-?\d+(?:,\d{3})*(?:\.\d+)?(?:[eE][-+]?\d+)?(?![\w\-])")
+_ESPACIOS = re.compile(r"\s+")
+_NO_ALFANUM = re.compile(r"[^a-z0-9 ]+")
+_CIFRA = re.compile(r"\d+(?:[.,]\d+)*")
+NEGACIONES = frozenset({"no", "ni", "nunca", "jamas", "tampoco", "sin", "nada", "nadie",
+                        "ningun", "ninguno", "ninguna", "ningunos", "ningunas"})
+
+# contexto -> (matriz de embeddings, claves de respuesta, firmas de las preguntas)
+_INDICE: Dict[str, Tuple[np.ndarray, List[str], List[Tuple]]] = {}
+_LOCK = threading.Lock()
+_STATS = {"hits_normalizados": 0, "hits_similares": 0}
+
+
+def redondear(x: float, digitos: int = None) -> float:
+    """Redondea a 'digitos' cifras significativas."""
+    digitos = DIGITOS if digitos is None else digitos
+    if not np.isfinite(x) or x == 0:
+        return x
+    return float(f"{x:.{digitos}g}")
+
+
+def _nativo(obj: Any) -> Any:
+    # escalares de numpy (np.int64, np.float32...) como su equivalente de Python
+    return obj.item() if isinstance(obj, np.generic) else str(obj)
+
+
+def json_canonico(obj: Any) -> str:
+    """JSON estable (claves ordenadas, separadores fijos) con las cifras exactas."""
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=_nativo)
+
+
+def _normalizar_numero(m: "re.Match", digitos: int) -> str:
+    token = m.group(0)
+    limpio = token.replace(",", "")
+    try:
+        valor = float(limpio)
+    except ValueError:
+        return token
+    # enteros cortos (años, meses, conteos, horizontes) se dejan tal cual
+    if "." not in limpio and "e" not in limpio.lower() and len(limpio.lstrip("-")) <= 4:
+        return limpio
+    return f"{redondear(valor, digitos):.{digitos}g}"
+
+
+def normalizar_prompt(prompt: str, digitos: int = None) -> str:
+    digitos = DIGITOS if digitos is None else digitos
+    texto = _NUMERO.sub(lambda m: _normalizar_numero(m, digitos), prompt)
+    return _ESPACIOS.sub(" ", texto).strip().lower()
+
+
+def clave_normalizada(prompt: str, digitos: int = None, modelo: str = "", config: Dict = None,
+                      pregunta: Optional[str] = None) -> str:
+    """
+    Clave del prompt con las cifras redondeadas. Con 'pregunta' (texto libre del usuario dentro
+    del prompt) la clave incluye además sus cifras y negaciones exactas.
+    """
+    texto = normalizar_prompt(prompt, digitos)
+    if pregunta:
+        texto += "\x1f" + json.dumps(firma(pregunta), ensure_ascii=False)
+    return "n:" + llm_cache.clave_prompt(texto, modelo, config)
+
+
+# -------------------------
+# Similitud de preguntas
+# -------------------------
+def embedding(texto: str) -> np.ndarray:
+    """Vector L2-normalizado de trigramas de caracteres (hashing en DIM_EMBEDDING cubetas)."""
+    texto = " " + _ESPACIOS.sub(" ", _NO_ALFANUM.sub(" ", limpiar_texto(texto or ""))).strip() + " "
+    trigramas = [texto[i:i + 3] for i in range(len(texto) - 2)]
+    vec = np.zeros(DIM_EMBEDDING, dtype=np.float32)
+    if not trigramas:
+        return vec
+    cubetas = [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=4).digest(), "little") % DIM_EMBEDDING
+               for t in trigramas]
+    np.add.at(vec, cubetas, 1.0)
+    return vec / np.linalg.norm(vec)
+
+
+def firma(texto: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Cifras y negaciones de la pregunta, en orden: dos preguntas sólo comparten respuesta si coinciden."""
+    texto = limpiar_texto(texto or "")
+    cifras = tuple(c.replace(",", ".") for c in _CIFRA.findall(texto))
+    palabras = _NO_ALFANUM.sub(" ", texto).split()
+    return cifras, tuple(p for p in palabras if p in NEGACIONES)
+
+
+def buscar_similar(contexto: str, pregunta: str, umbral: float = None) -> Optional[str]:
+    """
+    Clave de la respuesta a la pregunta más parecida dentro del mismo contexto, si supera el umbral
+    y tiene la misma firma (cifras y negaciones).
+    """
+    umbral = UMBRAL_SIMILITUD if umbral is None else umbral
+    if umbral > 1:
+        return None
+    with _LOCK:
+        entrada = _INDICE.get(contexto)
+    if entrada is None:
+        return None
+    matriz, claves, firmas = entrada
+    similitudes = matriz @ embedding(pregunta)
+    # sólo candidatas con la misma firma: "10%" vs "20%" o "debo" vs "no debo" nunca comparten respuesta
+    propia = firma(pregunta)
+    similitudes[[f != propia for f in firmas]] = -1.0
+    mejor = int(np.argmax(similitudes))
+    return claves[mejor] if similitudes[mejor] >= umbral else None
+
+
+def registrar_pregunta(contexto: str, pregunta: str, clave: str, umbral: float = None) -> None:
+    umbral = UMBRAL_SIMILITUD if umbral is None else umbral
+    if umbral > 1:
+        return
+    vec = embedding(pregunta)[None, :]
+    with _LOCK:
+        matriz, claves, firmas = _INDICE.get(contexto, (np.empty((0, DIM_EMBEDDING), dtype=np.float32), [], []))
+        matriz = np.vstack([matriz, vec])[-MAX_PREGUNTAS_POR_CONTEXTO:]
+        claves = (claves + [clave])[-MAX_PREGUNTAS_POR_CONTEXTO:]
+        firmas = (firmas + [firma(pregunta)])[-MAX_PREGUNTAS_POR_CONTEXTO:]
+        _INDICE[contexto] = (matriz, claves, firmas)
+
+
+def contar(evento: str) -> None:
+    with _LOCK:
+        _STATS[evento] += 1
+
+
+def estadisticas() -> Dict[str, int]:
+    with _LOCK:
+        return {**_STATS, "contextos": len(_INDICE), "preguntas": sum(len(c) for _, c, _ in _INDICE.values())}
@@ -6,6 +6,7 @@ import plotly.graph_objects as go
 from datetime import datetime
 
 
+from ingesta import EXTENSIONES_SOPORTADAS, leer_archivo
 from mcp import normalizar_df, analizar_finanzas, simular_escenario, generar_recomendaciones
 
 # usa tus componentes de esta página
@@ -117,8 +118,8 @@ def mostrar_app_principal():
 
     # ----- uploader (propio de esta página; landing NO se usa aquí) -----
     st.markdown("### 📁 Sube tus datos financieros")
-    st.write("Carga un archivo CSV con columnas: **Descripcion, Monto, Tipo**.")
-    archivo = st.file_uploader("Archivo CSV", type=["csv"])
+    st.write("Carga un archivo (CSV, Excel, Parquet o Feather) con columnas: **Descripcion, Monto, Tipo**.")
+    archivo = st.file_uploader("Archivo de datos", type=EXTENSIONES_SOPORTADAS)
     usar_ejemplo = st.checkbox("✨ Usar datos de ejemplo", value=False)
 
     if not archivo and not usar_ejemplo:
@@ -134,7 +135,11 @@ def mostrar_app_principal():
         return
 
     # ----- data -----
-    df = pd.read_csv(archivo) if archivo else pd.read_csv("datos_ejemplo.csv")
+    if archivo:
+        df = leer_archivo(archivo.name, archivo.getvalue(), proyectar=False)
+    else:
+        with open("datos_ejemplo.csv", "rb") as f:
+            df = leer_archivo("datos_ejemplo.csv", f.read(), proyectar=False)
     df_norm = normalizar_df(df)
     analitica = analizar_finanzas(df_norm)
 
@@ -152,7 +157,7 @@ def mostrar_app_principal():
         tab_simulador.render(df_norm, analitica, simular_escenario)
 
     with tab3:
-        tab_tendencias.render(analitica, go=go, modo_oscuro=modo_oscuro)
+        tab_tendencias.render(analitica, go=go, modo_oscuro=modo_oscuro, df=df_norm)
 
     with tab4:
         # tu firma preferida:
@@ -1,17 +1,51 @@
 import streamlit as st
+import pandas as pd
+from forecast import MODELOS, pronosticar_dataset, series_dataset
 
-def render(analitica: dict, go, modo_oscuro: bool = False):
+NOMBRES_MODELO = dict(zip(MODELOS, ["Estacional ingenuo", "Holt-Winters", "Tendencia amortiguada"]))
+
+def render(analitica: dict, go, modo_oscuro: bool = False, df=None):
     st.subheader("📈 Proyección de Flujo Neto")
-    meses = ['Ene','Feb','Mar','Abr','May','Jun','Jul','Ago','Sep','Oct','Nov','Dic']
-    proy = [analitica['flujo']*(1+i*0.02) for i in range(12)]
+    if df is None:
+        st.info("Carga un archivo con fecha, tipo y monto para proyectar tus series mensuales.")
+        return
+    historia = series_dataset(df)
+    if len(historia) < 2:
+        st.info("Se necesitan al menos 2 meses de datos para proyectar.")
+        return
+
+    c1, c2 = st.columns(2)
+    serie = c1.selectbox("Serie", list(historia.columns), key="tendencias_serie")
+    horizonte = c2.slider("Horizonte (meses)", 3, 24, 12, key="tendencias_horizonte")
+    # todas las series se ajustan juntas (y quedan cacheadas); aquí sólo se elige cuál mostrar
+    pron = pronosticar_dataset(df, horizonte)
+
+    color_texto = '#0E1E40' if not modo_oscuro else 'white'
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=meses, y=proy, mode='lines+markers',
-                             line=dict(color='#D71921', width=3),
-                             fill='tozeroy', fillcolor='rgba(215,25,33,0.1)'))
+    fig.add_trace(go.Scatter(x=list(historia.index), y=historia[serie], mode='lines+markers', name='Histórico',
+                             line=dict(color=color_texto, width=2)))
+    for nivel, opacidad in ((95, 0.08), (80, 0.16)):
+        fig.add_trace(go.Scatter(x=list(pron["superior_%d" % nivel].index), y=pron["superior_%d" % nivel][serie],
+                                 mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=list(pron["inferior_%d" % nivel].index), y=pron["inferior_%d" % nivel][serie],
+                                 mode='lines', line=dict(width=0), name=f'Intervalo {nivel}%',
+                                 fill='tonexty', fillcolor=f'rgba(215,25,33,{opacidad})'))
+    fig.add_trace(go.Scatter(x=list(pron["pronostico"].index), y=pron["pronostico"][serie], mode='lines+markers',
+                             name='Pronóstico', line=dict(color='#D71921', width=3)))
     fig.update_layout(
         height=420, margin=dict(l=0, r=0, t=30, b=10),
         plot_bgcolor='rgba(0,0,0,0)' if not modo_oscuro else '#0E1E40',
         paper_bgcolor='rgba(0,0,0,0)' if not modo_oscuro else '#0E1E40',
-        font=dict(color='#0E1E40' if not modo_oscuro else 'white')
+        font=dict(color=color_texto)
     )
     st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"Modelo elegido por backtest: {NOMBRES_MODELO[pron['modelo'][serie]]}")
+
+    # Resumen de todas las series: próximo mes y total del horizonte
+    resumen = pd.DataFrame({
+        "Próximo mes": pron["pronostico"].iloc[0],
+        f"Total {horizonte} meses": pron["pronostico"].sum(),
+        "Modelo": pron["modelo"].map(NOMBRES_MODELO),
+    })
+    st.dataframe(resumen.style.format({"Próximo mes": "{:,.0f}", f"Total {horizonte} meses": "{:,.0f}"}),
+                 use_container_width=True)
@@ -1,15 +1,15 @@
 # dashboard_ai.py
 """
 Lógica para construir prompts y pedir a Gemini un análisis del Dashboard.
-Usa gemini_client.generar_respuesta(prompt) que ya tienes.
+Usa gemini_client.responder(prompt), que pasa por la caché compartida de respuestas.
 """
 
 import pandas as pd
 import hashlib
 import json
 from typing import Dict, Any
-from gemini_client import generar_respuesta
-import streamlit as st
+from typing import Iterator
+from gemini_client import responder
 
 # Plantilla del prompt
 PROMPT_TEMPLATE = """
@@ -107,28 +107,20 @@ def construir_prompt(df: pd.DataFrame, kpis: Dict[str, Any]) -> str:
     prompt = PROMPT_TEMPLATE.format(dataset_summary=dataset_summary, kpis_text=kpis_text)
     return prompt
 
-def _hash_prompt(prompt: str) -> str:
-    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
-
-@st.cache_data(show_spinner=False, ttl=60*30)  # cachea 30 minutos por prompt
-def _cached_gemini_call(prompt_hash: str, prompt_text: str) -> str:
-    # esta función se cachea por hash del prompt para evitar llamadas repetidas
-    return generar_respuesta(prompt_text)
-
 def analizar_dashboard_ai(df: pd.DataFrame, kpis: Dict[str, Any]) -> str:
     """
     Función principal: construye prompt, usa cache y llama al cliente.
     Retorna la respuesta de Gemini lista para mostrar.
     """
     prompt = construir_prompt(df, kpis)
-    prompt_hash = _hash_prompt(prompt)
 
     # límite de seguridad sobre longitud del prompt
     if len(prompt) > 40_000:
         # intenta reducir aún más el prompt
         prompt = prompt[:40_000] + "\n\n[TRUNCADO - dataset muy grande]"
     try:
-        respuesta = _cached_gemini_call(prompt_hash, prompt)
+        # caché persistente por hash del prompt (llm_cache), compartida con el modo streaming
+        respuesta = responder(prompt)
         # normalizar tipo de retorno a string
         if isinstance(respuesta, str):
             return respuesta
@@ -140,3 +132,14 @@ def analizar_dashboard_ai(df: pd.DataFrame, kpis: Dict[str, Any]) -> str:
     except Exception as e:
         # devolver una explicación clara en la UI
         return f"ERROR al consultar la IA: {e}\n\nPrueba más tarde o revisa tu clave GEMINI_API_KEY."
+
+
+def analizar_dashboard_ai_stream(df: pd.DataFrame, kpis: Dict[str, Any]) -> Iterator[str]:
+    """
+    Versión streaming de analizar_dashboard_ai: produce el texto por partes para st.write_stream.
+    Al completarse, la respuesta queda en la misma caché por hash del prompt.
+    """
+    prompt = construir_prompt(df, kpis)
+    if len(prompt) > 40_000:
+        prompt = prompt[:40_000] + "\n\n[TRUNCADO - dataset muy grande]"
+    return responder(prompt, stream=True)
@@ -0,0 +1,97 @@
+# dataset_cache.py
+"""
+Caché de datasets procesados compartida por todo el proceso.
+- La clave es el hash SHA-256 del contenido del archivo (no el nombre ni el tamaño)
+- Guarda el DataFrame ya devuelto por utils.procesar_dataframe
+- Expulsa por LRU cuando se supera el presupuesto de memoria
+- Un DataFrame que no cabe ni solo en el presupuesto no se guarda; el llamador decide
+  dónde conservarlo (utils lo deja en la sesión)
+
+Como el mismo objeto se comparte entre sesiones, los consumidores no deben modificarlo en sitio.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import pandas as pd
+
+PRESUPUESTO_MB = float(os.getenv("FINMIND_CACHE_DATOS_MB", "512"))
+
+# huella -> (DataFrame procesado, bytes en memoria)
+_CACHE: "OrderedDict[str, tuple[pd.DataFrame, int]]" = OrderedDict()
+_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0, "expulsiones": 0, "demasiado_grandes": 0}
+
+
+def huella_contenido(contenido: bytes) -> str:
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def huella_stream(flujo, bloque: int = 1 << 20) -> str:
+    """Misma huella que huella_contenido, leyendo un archivo abierto por bloques; lo deja en la posición 0."""
+    h = hashlib.sha256()
+    flujo.seek(0)
+    for parte in iter(lambda: flujo.read(bloque), b""):
+        h.update(parte)
+    flujo.seek(0)
+    return h.hexdigest()
+
+
+def _tamano_bytes(df: pd.DataFrame) -> int:
+    try:
+        return int(df.memory_usage(deep=True).sum())
+    except Exception:
+        return 0
+
+
+def obtener_dataset(huella: str) -> Optional[pd.DataFrame]:
+    """Devuelve el DataFrame cacheado para la huella (y lo marca como usado) o None."""
+    with _LOCK:
+        entrada = _CACHE.get(huella)
+        if entrada is None:
+            _STATS["misses"] += 1
+            return None
+        _CACHE.move_to_end(huella)
+        _STATS["hits"] += 1
+        return entrada[0]
+
+
+def guardar_dataset(huella: str, df: pd.DataFrame, presupuesto_mb: float = None) -> bool:
+    """
+    Guarda el DataFrame procesado y expulsa los menos usados hasta caber en el presupuesto.
+    Devuelve False si el DataFrame no cabe ni solo (y por tanto no se guardó).
+    """
+    presupuesto = (PRESUPUESTO_MB if presupuesto_mb is None else presupuesto_mb) * 1024 * 1024
+    tamano = _tamano_bytes(df)
+    if tamano > presupuesto:
+        # no cabe ni solo: no vale la pena vaciar la caché por él
+        with _LOCK:
+            _STATS["demasiado_grandes"] += 1
+        return False
+    with _LOCK:
+        _CACHE.pop(huella, None)
+        _CACHE[huella] = (df, tamano)
+        usado = sum(t for _, t in _CACHE.values())
+        while usado > presupuesto and len(_CACHE) > 1:
+            _, (_, t) = _CACHE.popitem(last=False)
+            usado -= t
+            _STATS["expulsiones"] += 1
+    return True
+
+
+def estadisticas() -> Dict[str, float]:
+    with _LOCK:
+        return {
+            **_STATS,
+            "entradas": len(_CACHE),
+            "memoria_mb": sum(t for _, t in _CACHE.values()) / (1024 * 1024),
+            "presupuesto_mb": PRESUPUESTO_MB,
+        }
+
+
+def limpiar() -> None:
+    with _LOCK:
+        _CACHE.clear()
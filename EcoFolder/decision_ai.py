@@ -2,21 +2,22 @@
 """
 Módulo CFO Digital (salida en texto plano).
 - Calcula KPIs
-- Genera proyecciones simples y Monte Carlo
+- Genera proyecciones (forecast.py) y Monte Carlo
 - Construye prompt (texto) y pide recomendaciones en formato humano (no JSON)
 - Retorna string listo para mostrar en Streamlit
 """
 
 import pandas as pd
 import numpy as np
-import json
-import hashlib
-from typing import Dict, Any
-from gemini_client import generar_respuesta
-import streamlit as st
+from typing import Dict, Any, Iterator
+from gemini_client import responder
+from ledger import serie_mensual, buscar_columna
+from cache_semantico import json_canonico
 
 DEFAULT_HORIZON_MONTHS = 12
-MC_ITER = 500
+MC_ITER = 10_000
+MC_BANDAS = (5, 10, 25, 50, 75, 90, 95)  # percentiles del abanico mensual
+MC_SEED = 42  # semilla fija: mismos datos -> mismos percentiles -> mismo prompt (caché)
 
 # Prompt: pedimos TEXTO estructurado (secciones) en vez de JSON
 PROMPT_DECISION_TEXT = """
@@ -62,34 +63,15 @@ Parámetros usuario:
 # -------------------------
 # Helpers
 # -------------------------
-def _hash_text(s: str) -> str:
-    return hashlib.sha256(s.encode("utf-8")).hexdigest()
-
 def resumen_financiero(df: pd.DataFrame) -> Dict[str, Any]:
     if df is None or df.empty:
         return {}
 
-    dfc = df.copy()
-    dfc.columns = [c.strip().lower() for c in dfc.columns]
-    if "fecha" in dfc.columns:
-        dfc["fecha"] = pd.to_datetime(dfc["fecha"], errors="coerce")
-        dfc = dfc.dropna(subset=["fecha"])
-        dfc["mes"] = dfc["fecha"].dt.to_period("M").astype(str)
-    if "tipo" in dfc.columns:
-        dfc["tipo"] = dfc["tipo"].astype(str).str.lower()
-
-    # Asegurar que "monto" existe y es numérico
-    if "monto" in dfc.columns:
-        dfc["monto"] = pd.to_numeric(dfc["monto"], errors="coerce").fillna(0.0)
-    else:
-        dfc["monto"] = 0.0
-
-    ingresos = dfc[dfc["tipo"] == "ingreso"].groupby("mes")["monto"].sum()
-    gastos = dfc[dfc["tipo"] == "gasto"].groupby("mes")["monto"].sum()
-    meses = sorted(set(ingresos.index).union(gastos.index))
-    ingresos = ingresos.reindex(meses, fill_value=0.0)
-    gastos = gastos.reindex(meses, fill_value=0.0)
-    flujo = ingresos - gastos
+    resumen = serie_mensual(df)
+    meses = list(resumen.index)
+    ingresos = resumen["ingreso"]
+    gastos = resumen["gasto"]
+    flujo = resumen["flujo"]
 
     total_ing = float(ingresos.sum())
     total_gas = float(gastos.sum())
@@ -105,8 +87,10 @@ def resumen_financiero(df: pd.DataFrame) -> Dict[str, Any]:
     except Exception:
         cagr = 0.0
 
-    deuda_total = float(dfc["deuda"].sum()) if "deuda" in dfc.columns else None
-    caja = float(dfc["caja"].sum()) if "caja" in dfc.columns else None
+    deuda = buscar_columna(df, "deuda")
+    caja_col = buscar_columna(df, "caja")
+    deuda_total = float(pd.to_numeric(deuda, errors="coerce").sum()) if deuda is not None else None
+    caja = float(pd.to_numeric(caja_col, errors="coerce").sum()) if caja_col is not None else None
     deuda_ratio = (deuda_total / flujo_total) if deuda_total is not None and flujo_total != 0 else None
     liquidez_simple = (caja / total_gas) if caja is not None and total_gas != 0 else None
 
@@ -127,65 +111,115 @@ def resumen_financiero(df: pd.DataFrame) -> Dict[str, Any]:
     }
 
 def proyeccion_simple_from_series(series, horizon_months=DEFAULT_HORIZON_MONTHS):
+    """
+    Proyección del flujo con forecast.pronosticar (estacional ingenuo, Holt-Winters o
+    tendencia amortiguada, elegido por backtest). Conserva 'monthly' y 'mean_growth'
+    (crecimiento mensual promedio, usado en el prompt) y agrega el modelo y el intervalo al 80%.
+    """
     if series is None or len(series) < 2:
-        last = float(series.iloc[-1]) if len(series)>0 else 0.0
+        last = float(series.iloc[-1]) if series is not None and len(series) > 0 else 0.0
         return {"monthly": [last]*horizon_months, "mean_growth": 0.0}
-    vals = np.array(list(series.astype(float)))
+    from forecast import pronosticar  # diferido: sólo lo usa el CFO Digital
+    serie = pd.Series(np.asarray(series, dtype=float), index=[str(i) for i in series.index], name="flujo")
+    vals = serie.to_numpy()
     mom = np.diff(vals) / (vals[:-1] + 1e-9)
-    mean_growth = float(np.nanmean(mom))
-    last = float(vals[-1])
-    projection = []
-    curr = last
-    for _ in range(horizon_months):
-        curr = curr * (1 + mean_growth)
-        projection.append(float(curr))
-    return {"monthly": projection, "mean_growth": mean_growth}
-
-def monte_carlo_projection(series, horizon_months=DEFAULT_HORIZON_MONTHS, iters=MC_ITER):
+    pron = pronosticar(serie.to_frame(), horizon_months)
+    return {
+        "monthly": pron["pronostico"]["flujo"].tolist(),
+        "mean_growth": float(np.nanmean(mom)),
+        "modelo": pron["modelo"]["flujo"],
+        "inferior_80": pron["inferior_80"]["flujo"].tolist(),
+        "superior_80": pron["superior_80"]["flujo"].tolist(),
+        "meses": list(pron["pronostico"].index),
+    }
+
+def monte_carlo_projection(series, horizon_months=DEFAULT_HORIZON_MONTHS, iters=MC_ITER,
+                           seed=None, bandas=MC_BANDAS):
+    """
+    Simulación Monte Carlo vectorizada del flujo.
+    Dibuja la matriz completa de shocks (iters x horizonte) en una sola llamada,
+    aplica el piso en cero con un producto acumulado y devuelve los percentiles
+    finales (p10/p50/p90) más las bandas de abanico mes a mes.
+    """
     res = {"horizon": horizon_months, "iters": iters}
     if series is None or len(series) < 2:
         res["percentiles"] = [0.0, 0.0, 0.0]
         return res
-    vals = np.array(list(series.astype(float)))
+    vals = np.asarray(series, dtype=float)
     # si todos los valores son iguales (sigma=0) la simulación será determinista; aún así devolvemos percentiles igual a 'last'
     returns = np.diff(vals) / (vals[:-1] + 1e-9)
     mu = float(np.nanmean(returns))
     sigma = float(np.nanstd(returns))
     last = float(vals[-1])
-    endpoints = []
     # Si sigma es 0 -> podemos agregar un ruido muy pequeño para evitar endpoints idénticos (opcional)
     epsilon = 0.0 if sigma > 0 else 1e-6
-    for i in range(iters):
-        curr = last
-        for _ in range(horizon_months):
-            shock = np.random.normal(mu, sigma + epsilon)
-            curr = curr * (1 + shock)
-            if curr < 0:
-                curr = 0.0
-        endpoints.append(curr)
-    p10, p50, p90 = np.percentile(endpoints, [10,50,90])
+
+    rng = np.random.default_rng(seed)
+    factores = 1.0 + rng.normal(mu, sigma + epsilon, size=(iters, horizon_months))
+    # Piso en cero: en cuanto una trayectoria cruza a negativo queda en 0 para siempre
+    caminos = last * np.cumprod(factores, axis=1)
+    quiebre = np.maximum.accumulate(caminos < 0, axis=1)
+    caminos[quiebre] = 0.0
+    endpoints = caminos[:, -1]
+
+    p10, p50, p90 = np.percentile(endpoints, [10, 50, 90])
     res["percentiles"] = [float(p10), float(p50), float(p90)]
+    res["mc_mu"] = float(endpoints.mean())
+    res["mc_std"] = float(endpoints.std())
+    niveles = list(bandas)
+    fan = np.percentile(caminos, niveles, axis=0)
+    res["bandas"] = {f"p{int(q)}": fan[i].tolist() for i, q in enumerate(niveles)}
     return res
 
 def construir_summary_for_prompt(summary_dict, user_params):
+    # JSON canónico con cifras exactas; KPIs casi iguales comparten respuesta por la clave
+    # normalizada de cache_semantico, no porque el prompt pierda precisión
     obj = {"kpis": summary_dict, "params": user_params}
-    return json.dumps(obj, default=str, ensure_ascii=False)
+    return json_canonico(obj)
 
-@st.cache_data(show_spinner=False, ttl=60*30)
-def _cached_gemini_call(prompt_hash: str, prompt_text: str) -> str:
-    return generar_respuesta(prompt_text)
-
-def solicitar_recomendaciones_text(summary_dict, user_params) -> str:
+def _prompt_recomendaciones(summary_dict, user_params) -> str:
     summary_json = construir_summary_for_prompt(summary_dict, user_params)
     prompt = PROMPT_DECISION_TEXT.format(summary_json=summary_json, user_params=user_params)
     # trim largo si es necesario
     if len(prompt) > 40000:
         prompt = prompt[:40000] + "\n\n[TRUNCADO]"
-    phash = _hash_text(prompt)
-    return _cached_gemini_call(phash, prompt)
+    return prompt
+
+def solicitar_recomendaciones_text(summary_dict, user_params) -> str:
+    prompt = _prompt_recomendaciones(summary_dict, user_params)
+    return responder(prompt)
+
+def solicitar_recomendaciones_stream(summary_dict, user_params) -> Iterator[str]:
+    """Igual que solicitar_recomendaciones_text pero por partes (st.write_stream); comparte la caché."""
+    prompt = _prompt_recomendaciones(summary_dict, user_params)
+    return responder(prompt, stream=True)
+
+def reemplazar_en_stream(chunks: Iterator[str], buscado: str, reemplazo: str) -> Iterator[str]:
+    """
+    str.replace sobre un stream de chunks: retiene el final de cada chunk que podría ser
+    el comienzo de 'buscado', así un separador partido entre dos chunks también se reemplaza.
+    """
+    pendiente = ""
+    for chunk in chunks:
+        texto = (pendiente + chunk).replace(buscado, reemplazo)
+        corte = len(texto)
+        for largo in range(min(len(buscado) - 1, len(texto)), 0, -1):
+            if texto.endswith(buscado[:largo]):
+                corte = len(texto) - largo
+                break
+        pendiente = texto[corte:]
+        if corte:
+            yield texto[:corte]
+    if pendiente:
+        yield pendiente
 
 def analizar_empresa_decisiones_text(df: pd.DataFrame, horizon_months: int = DEFAULT_HORIZON_MONTHS,
-                                     reinvertir_pct: float = 0.3, risk_profile: str = "moderado") -> Dict[str, Any]:
+                                     reinvertir_pct: float = 0.3, risk_profile: str = "moderado",
+                                     stream: bool = False) -> Dict[str, Any]:
+    """
+    Con stream=True, "gemini_text" es un iterador de chunks (para st.write_stream)
+    y el resto del resultado está disponible de inmediato.
+    """
     summary = resumen_financiero(df)
 
     # Construir flujo_series correctamente a partir del resumen
@@ -196,29 +230,13 @@ def analizar_empresa_decisiones_text(df: pd.DataFrame, horizon_months: int = DEF
             months_sorted = sorted(flujo_dict.keys())
             flujo_series = pd.Series([float(flujo_dict[m]) for m in months_sorted], index=months_sorted)
         else:
-            # fallback: intentar reconstruir desde df (por si resumen no tuvo meses)
-            dfc = df.copy()
-            dfc.columns = [c.strip().lower() for c in dfc.columns]
-            if "fecha" in dfc.columns:
-                dfc["fecha"] = pd.to_datetime(dfc["fecha"], errors="coerce")
-                dfc = dfc.dropna(subset=["fecha"])
-                dfc["mes"] = dfc["fecha"].dt.to_period("M").astype(str)
-            if "tipo" in dfc.columns and "monto" in dfc.columns:
-                dfc["monto"] = pd.to_numeric(dfc["monto"], errors="coerce").fillna(0.0)
-                ingresos = dfc[dfc["tipo"].str.lower() == "ingreso"].groupby("mes")["monto"].sum()
-                gastos = dfc[dfc["tipo"].str.lower() == "gasto"].groupby("mes")["monto"].sum()
-                meses = sorted(set(ingresos.index).union(gastos.index))
-                ingresos = ingresos.reindex(meses, fill_value=0.0)
-                gastos = gastos.reindex(meses, fill_value=0.0)
-                flujo = ingresos - gastos
-                flujo_series = pd.Series(list(flujo.values), index=meses)
-            else:
-                flujo_series = pd.Series([])
+            # fallback: leer directo del cubo mensual compartido (por si resumen no tuvo meses)
+            flujo_series = serie_mensual(df)["flujo"] if df is not None else pd.Series([])
     except Exception:
         flujo_series = pd.Series([])
 
     proy = proyeccion_simple_from_series(flujo_series, horizon_months)
-    mc = monte_carlo_projection(flujo_series, horizon_months, iters=MC_ITER)
+    mc = monte_carlo_projection(flujo_series, horizon_months, iters=MC_ITER, seed=MC_SEED)
 
     user_params = {
         "horizon_months": horizon_months,
@@ -238,7 +256,10 @@ def analizar_empresa_decisiones_text(df: pd.DataFrame, horizon_months: int = DEF
     }
 
     # pedir recomendaciones en texto
-    texto_resp = solicitar_recomendaciones_text(prompt_kpis, user_params)
+    if stream:
+        texto_resp = solicitar_recomendaciones_stream(prompt_kpis, user_params)
+    else:
+        texto_resp = solicitar_recomendaciones_text(prompt_kpis, user_params)
 
     return {
         "summary": summary,
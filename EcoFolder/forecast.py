@@ -0,0 +1,305 @@
+# forecast.py
+"""
+Motor de pronósticos mensuales vectorizado.
+- Modelos: estacional ingenuo, Holt-Winters aditivo y tendencia amortiguada (Holt con phi < 1)
+- Todas las series (flujo, ingreso, gasto y cada categoría) se ajustan juntas: la recursión
+  avanza mes a mes sobre una matriz series x combinaciones de parámetros
+- Parámetros por búsqueda en malla (mínimo error cuadrático a un paso)
+- Selección de modelo por serie con backtest sobre los últimos meses (MAE)
+- Intervalos de predicción al 80% y 95%: error a un paso escalado con la varianza a h pasos
+  de cada modelo, sigma_h² = sigma² (1 + Σ_{j<h} c_j²) con c_j el peso de una innovación
+  j meses después (estacional ingenuo: 1 en cada ciclo; suavizado: alpha + alpha·beta·Σphi^i + gamma)
+- Los meses sin movimientos se rellenan con 0: el modelo asume que la columna t es el mes t
+- Ajustes cacheados por hash del contenido de las series; pronosticar otro horizonte no reajusta
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from itertools import product
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from ledger import matriz_categorias, memo_dataset, serie_mensual
+
+PERIODO = 12
+MODELOS = ("estacional_ingenuo", "holt_winters", "tendencia_amortiguada")
+ALPHAS = (0.1, 0.3, 0.5, 0.8)
+BETAS = (0.05, 0.2)
+GAMMAS = (0.05, 0.2, 0.4)
+PHIS = (0.8, 0.9, 0.98)
+MESES_BACKTEST = 6
+Z_INTERVALOS = {80: 1.2816, 95: 1.96}
+MAX_AJUSTES = 16
+
+_AJUSTES: "OrderedDict[str, Dict]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+# -------------------------
+# Suavizamiento exponencial por lotes
+# -------------------------
+def _estados_iniciales(Y: np.ndarray, m: int):
+    """Nivel, tendencia y estacionalidad iniciales (m=1: sin estacionalidad)."""
+    if m > 1:
+        nivel = Y[:, :m].mean(axis=1)
+        tendencia = (Y[:, m:2 * m].mean(axis=1) - nivel) / m
+        estacional = Y[:, :m] - nivel[:, None]
+    else:
+        nivel = Y[:, 0]
+        tendencia = Y[:, 1] - Y[:, 0]
+        estacional = np.zeros((len(Y), 1))
+    return nivel, tendencia, estacional
+
+
+def _suavizar(Y: np.ndarray, alpha: np.ndarray, beta: np.ndarray, gamma: np.ndarray,
+              phi: np.ndarray, m: int) -> Dict[str, np.ndarray]:
+    """
+    Recursión aditiva (forma de corrección de error) para S series x G combinaciones a la vez:
+        pred_t = l + phi*b + s[t % m];  e_t = y_t - pred_t
+        l <- l + phi*b + alpha*e;  b <- phi*b + alpha*beta*e;  s[t % m] <- s[t % m] + gamma*e
+    Devuelve los estados finales, la suma de errores cuadrados y su varianza (a partir del 2º ciclo).
+    """
+    S, T = Y.shape
+    nivel0, tendencia0, estacional0 = _estados_iniciales(Y, m)
+    G = len(alpha)
+    nivel = np.repeat(nivel0[:, None], G, axis=1)
+    tendencia = np.repeat(tendencia0[:, None], G, axis=1)
+    estacional = np.repeat(estacional0[:, None, :], G, axis=1)
+    sse = np.zeros((S, G))
+    # el primer ciclo (o los dos primeros meses sin estacionalidad) se usa para inicializar
+    inicio = m if m > 1 else min(2, T - 1)
+    for t in range(T):
+        j = t % m
+        pred = nivel + phi * tendencia + estacional[:, :, j]
+        error = Y[:, t, None] - pred
+        if t >= inicio:
+            sse += error ** 2
+        nivel = nivel + phi * tendencia + alpha * error
+        tendencia = phi * tendencia + alpha * beta * error
+        estacional[:, :, j] += gamma * error
+    return {"nivel": nivel, "tendencia": tendencia, "estacional": estacional, "sse": sse,
+            "varianza": sse / max(T - inicio, 1)}
+
+
+def _malla(modelo: str):
+    if modelo == "holt_winters":
+        combinaciones = [(a, b, g, 1.0) for a, b, g in product(ALPHAS, BETAS, GAMMAS)]
+    else:
+        combinaciones = [(a, b, 0.0, p) for a, b, p in product(ALPHAS, BETAS, PHIS)]
+    return [np.array(c) for c in zip(*combinaciones)]
+
+
+def _ajustar_suavizado(Y: np.ndarray, modelo: str) -> Dict[str, np.ndarray]:
+    """Mejor combinación de la malla por serie (mínimo SSE a un paso) y sus estados finales."""
+    m = PERIODO if modelo == "holt_winters" else 1
+    alpha, beta, gamma, phi = _malla(modelo)
+    res = _suavizar(Y, alpha, beta, gamma, phi, m)
+    mejor = res["sse"].argmin(axis=1)
+    filas = np.arange(len(Y))
+    return {
+        "m": m,
+        "alpha": alpha[mejor], "beta": beta[mejor], "gamma": gamma[mejor], "phi": phi[mejor],
+        "nivel": res["nivel"][filas, mejor],
+        "tendencia": res["tendencia"][filas, mejor],
+        "estacional": res["estacional"][filas, mejor],
+        "sigma": np.sqrt(res["varianza"][filas, mejor]),
+        "t_final": Y.shape[1],
+    }
+
+
+def _pronostico_suavizado(ajuste: Dict[str, np.ndarray], horizonte: int) -> np.ndarray:
+    h = np.arange(1, horizonte + 1)
+    phi = ajuste["phi"][:, None]
+    # suma de phi^1..phi^h (= h cuando phi = 1)
+    amortiguado = np.where(phi == 1.0, h, phi * (1 - phi ** h) / np.where(phi == 1.0, 1.0, 1 - phi))
+    indices = (ajuste["t_final"] + h - 1) % ajuste["m"]
+    return ajuste["nivel"][:, None] + amortiguado * ajuste["tendencia"][:, None] + ajuste["estacional"][:, indices]
+
+
+def _ajustar_ingenuo(Y: np.ndarray) -> Dict[str, np.ndarray]:
+    m = PERIODO if Y.shape[1] > PERIODO else 1
+    errores = Y[:, m:] - Y[:, :-m]
+    return {"m": m, "ultimo_ciclo": Y[:, -m:], "sigma": np.sqrt((errores ** 2).mean(axis=1))}
+
+
+def _pronostico_ingenuo(ajuste: Dict[str, np.ndarray], horizonte: int) -> np.ndarray:
+    return ajuste["ultimo_ciclo"][:, np.arange(horizonte) % ajuste["m"]]
+
+
+def _pesos_innovacion(ajuste: Dict[str, np.ndarray], modelo: str, horizonte: int) -> np.ndarray:
+    """sqrt(1 + Σ_{j<h} c_j²) por serie y horizonte: múltiplo de sigma para el error a h pasos."""
+    j = np.arange(1, horizonte)  # c_1..c_{H-1}
+    m = ajuste["m"]
+    en_ciclo = (j % m == 0) if m > 1 else np.zeros(len(j), dtype=bool)
+    if modelo == "estacional_ingenuo":
+        # con m = 1 es el paseo aleatorio: cada innovación pesa 1 en todo el horizonte
+        c = np.broadcast_to((en_ciclo | (m == 1)).astype(float), (len(ajuste["sigma"]), len(j)))
+    else:
+        phi = ajuste["phi"][:, None]
+        suma_phi = np.where(phi == 1.0, j, phi * (1 - phi ** j) / np.where(phi == 1.0, 1.0, 1 - phi))
+        c = (ajuste["alpha"][:, None] + ajuste["alpha"][:, None] * ajuste["beta"][:, None] * suma_phi
+             + ajuste["gamma"][:, None] * en_ciclo)
+    acumulado = np.concatenate([np.zeros((len(c), 1)), np.cumsum(c ** 2, axis=1)], axis=1)
+    return np.sqrt(1.0 + acumulado)
+
+
+def _aplicable(modelo: str, T: int) -> bool:
+    if modelo == "holt_winters":
+        return T >= 2 * PERIODO
+    if modelo == "tendencia_amortiguada":
+        return T >= 3
+    return T >= 2
+
+
+def _ajustar_modelo(Y: np.ndarray, modelo: str) -> Dict[str, np.ndarray]:
+    return _ajustar_ingenuo(Y) if modelo == "estacional_ingenuo" else _ajustar_suavizado(Y, modelo)
+
+
+def _pronostico_modelo(ajuste: Dict[str, np.ndarray], modelo: str, horizonte: int) -> np.ndarray:
+    if modelo == "estacional_ingenuo":
+        return _pronostico_ingenuo(ajuste, horizonte)
+    return _pronostico_suavizado(ajuste, horizonte)
+
+
+# -------------------------
+# Ajuste con selección por backtest
+# -------------------------
+def _clave_series(series: pd.DataFrame) -> str:
+    h = hashlib.sha256("\x1f".join(map(str, series.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(series, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _construir_ajuste(series: pd.DataFrame) -> Dict:
+    Y = series.to_numpy(dtype=float).T  # series x meses
+    S, T = Y.shape
+    aplicables = [m for m in MODELOS if _aplicable(m, T)]
+
+    # Backtest: se ajusta sin los últimos meses y se mide el MAE de su pronóstico
+    n_bt = min(MESES_BACKTEST, T // 4)
+    mae = pd.DataFrame(np.nan, index=series.columns, columns=list(MODELOS))
+    if n_bt >= 1:
+        entrenamiento, prueba = Y[:, :-n_bt], Y[:, -n_bt:]
+        for modelo in aplicables:
+            if _aplicable(modelo, T - n_bt):
+                pred = _pronostico_modelo(_ajustar_modelo(entrenamiento, modelo), modelo, n_bt)
+                mae[modelo] = np.abs(pred - prueba).mean(axis=1)
+    valores = mae.to_numpy()
+    con_backtest = ~np.isnan(valores).all(axis=1)
+    indice = np.zeros(S, dtype=int)
+    indice[con_backtest] = np.nanargmin(valores[con_backtest], axis=1)
+    por_defecto = MODELOS.index(aplicables[0]) if aplicables else 0
+    elegido = pd.Series(np.asarray(MODELOS, dtype=object)[np.where(con_backtest, indice, por_defecto)],
+                        index=series.columns)
+
+    ajustes = {modelo: _ajustar_modelo(Y, modelo) for modelo in aplicables} if T >= 2 else {}
+    return {"columnas": list(series.columns), "ultimo_mes": series.index[-1], "n_meses": T,
+            "serie_final": Y[:, -1], "elegido": elegido, "mae_backtest": mae, "ajustes": ajustes}
+
+
+def ajustar_series(series: pd.DataFrame) -> Dict:
+    """
+    Ajusta todos los modelos a todas las columnas de 'series' (índice 'YYYY-MM' ordenado)
+    y elige uno por columna con backtest. Cacheado por contenido: mismas series, mismo ajuste.
+    """
+    clave = _clave_series(series)
+    with _LOCK:
+        ajuste = _AJUSTES.get(clave)
+        if ajuste is not None:
+            _AJUSTES.move_to_end(clave)
+            return ajuste
+    ajuste = _construir_ajuste(series)
+    with _LOCK:
+        _AJUSTES[clave] = ajuste
+        while len(_AJUSTES) > MAX_AJUSTES:
+            _AJUSTES.popitem(last=False)
+    return ajuste
+
+
+def _meses_siguientes(ultimo_mes: str, horizonte: int) -> list:
+    try:
+        inicio = pd.Period(str(ultimo_mes), freq="M")
+        return [str(inicio + i) for i in range(1, horizonte + 1)]
+    except (ValueError, TypeError):
+        return [f"+{i}" for i in range(1, horizonte + 1)]
+
+
+def _completar_meses(series: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reindexa un índice 'YYYY-MM' a todos los meses entre el primero y el último (faltantes en 0):
+    la estacionalidad usa la posición de la columna, así que un mes omitido la desplazaría.
+    """
+    if series.empty:
+        return series
+    try:
+        periodos = pd.PeriodIndex(series.index.astype(str), freq="M")
+    except (ValueError, TypeError):
+        return series  # índice sin meses (p. ej. posiciones): se usa tal cual
+    completo = pd.period_range(periodos.min(), periodos.max(), freq="M")
+    if len(completo) == len(series):
+        return series
+    completas = series.set_axis(periodos).reindex(completo, fill_value=0.0)
+    return completas.set_axis(completo.astype(str)).rename_axis(series.index.name)
+
+
+def pronosticar(series: pd.DataFrame, horizonte: int = 12) -> Dict:
+    """
+    Pronóstico de cada columna de 'series' para 'horizonte' meses.
+    Devuelve {modelo (Serie columna -> modelo elegido), mae_backtest, pronostico y
+    limites ('inferior_80', 'superior_80', 'inferior_95', 'superior_95'), como DataFrames meses x columna}.
+    """
+    series = _completar_meses(series.dropna(axis=1, how="all")).fillna(0.0)
+    meses = _meses_siguientes(series.index[-1], horizonte) if len(series) else []
+    if series.empty:
+        vacio = pd.DataFrame(index=meses)
+        return {"modelo": pd.Series(dtype=object), "mae_backtest": pd.DataFrame(), "pronostico": vacio,
+                **{f"{lado}_{n}": vacio for n in Z_INTERVALOS for lado in ("inferior", "superior")}}
+
+    ajuste = ajustar_series(series)
+    S = len(ajuste["columnas"])
+    pred = np.repeat(ajuste["serie_final"][:, None], horizonte, axis=1)  # sin historia: se repite el último
+    escala = np.zeros((S, horizonte))
+    for modelo, ajuste_modelo in ajuste["ajustes"].items():
+        filas = (ajuste["elegido"] == modelo).to_numpy()
+        if filas.any():
+            pred[filas] = _pronostico_modelo(ajuste_modelo, modelo, horizonte)[filas]
+            escala[filas] = (ajuste_modelo["sigma"][:, None]
+                             * _pesos_innovacion(ajuste_modelo, modelo, horizonte))[filas]
+
+    def marco(valores: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame(valores.T, index=pd.Index(meses, name="mes"), columns=ajuste["columnas"])
+    resultado = {"modelo": ajuste["elegido"], "mae_backtest": ajuste["mae_backtest"], "pronostico": marco(pred)}
+    for nivel, z in Z_INTERVALOS.items():
+        resultado[f"inferior_{nivel}"] = marco(pred - z * escala)
+        resultado[f"superior_{nivel}"] = marco(pred + z * escala)
+    return resultado
+
+
+# -------------------------
+# Series del dataset
+# -------------------------
+def _construir_series(df: pd.DataFrame) -> pd.DataFrame:
+    serie = serie_mensual(df)
+    columnas = {"flujo": serie["flujo"], "ingreso": serie["ingreso"], "gasto": serie["gasto"]}
+    for tipo in ("ingreso", "gasto"):
+        matriz = matriz_categorias(df, tipo).reindex(serie.index, fill_value=0.0)
+        for categoria in matriz.columns:
+            columnas[f"{tipo}: {categoria}"] = matriz[categoria]
+    return _completar_meses(pd.DataFrame(columnas, index=serie.index).astype(float))
+
+
+def series_dataset(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Matriz mes x serie: flujo, ingreso, gasto y cada categoría ('gasto: Renta', ...), con todos
+    los meses entre el primero y el último (los meses sin movimientos valen 0).
+    """
+    return memo_dataset(df, "series_pronostico", _construir_series)
+
+
+def pronosticar_dataset(df: pd.DataFrame, horizonte: int = 12, columnas: Optional[list] = None) -> Dict:
+    """pronosticar() sobre series_dataset(df) (o sólo 'columnas'); todas las series en una pasada."""
+    series = series_dataset(df)
+    return pronosticar(series if columnas is None else series[columnas], horizonte)
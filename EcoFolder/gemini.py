@@ -1,17 +1,6 @@
-import os
-from dotenv import load_dotenv
-import google.generativeai as genai
 import streamlit as st
 import pandas as pd
 
-# -------------------------
-# Configuración de Gemini
-# -------------------------
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel("gemini-2.5-flash")
-
 # -------------------------
 # Función del asistente financiero
 # -------------------------
@@ -33,17 +22,21 @@ def asistente_financiero(df, analisis):
                 return
 
             # -------------------------
-            # 🔹 Prompt enriquecido
+            # 🔹 Prompt enriquecido (sólo agregados, con presupuesto de tokens)
             # -------------------------
+            try:
+                from prompt_context import construir_contexto, estimar_tokens
+                contexto, stats = construir_contexto(df, analisis)
+            except Exception as e:
+                st.error(f"Error al preparar el contexto: {e}")
+                return
+
             prompt = f"""
 Eres un asistente financiero experto en análisis de datos personales y empresariales.
 Tu tarea es analizar la siguiente información y responder con claridad, precisión y utilidad práctica.
 
-### 📊 Resumen de datos financieros:
-{df.to_dict()}
-
-### 📈 Indicadores y análisis calculados:
-{analisis}
+### 📊 Resumen de datos financieros (agregados e indicadores):
+{contexto}
 
 ### ❓ Pregunta del usuario:
 {pregunta}
@@ -67,9 +60,14 @@ Tu tarea es analizar la siguiente información y responder con claridad, precisi
             # -------------------------
             # Llamada al modelo Gemini
             # -------------------------
+            st.caption(
+                f"📏 Prompt: {len(prompt):,} caracteres · ~{estimar_tokens(prompt):,} tokens "
+                f"(contexto {stats['tokens_estimados']:,}/{stats['presupuesto_tokens']:,} · "
+                f"{stats['meses_incluidos']}/{stats['meses_totales']} meses)"
+            )
             try:
-                respuesta = model.generate_content(prompt)
+                from gemini_client import responder
                 st.success("✅ Respuesta del asistente:")
-                st.write(respuesta.text)
+                st.write_stream(responder(prompt, stream=True, pregunta=pregunta))
             except Exception as e:
                 st.error(f"Error al consultar Gemini: {e}")
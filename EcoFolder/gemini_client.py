@@ -1,29 +1,352 @@
 # gemini_client.py
+"""
+Cliente compartido de Gemini para todo el proceso.
+- Un único GenerativeModel (y su transporte) reutilizado entre llamadas y sesiones
+- Deadline total por solicitud: reintentos y backoff incluidos (TIMEOUT_S)
+- Reintentos acotados con backoff exponencial y jitter ante errores transitorios
+- Límite real de tokens de salida vía generation_config
+- Las llamadas pasan por ai_executor (pool, limitador global, cupo por sesión, coalescencia)
+- Respaldo local (ai_local) sin clave de API o cuando Gemini excede el presupuesto de latencia
+- Modo streaming (chunks a medida que llegan) y caché de respuestas por hash de prompt,
+  modelo y configuración de generación
+  (exacta en llm_cache y de segundo nivel para prompts casi idénticos en cache_semantico)
+"""
 import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import TimeoutError as FuturoTimeout
+from functools import lru_cache
+from typing import Callable, Iterator, List, Optional, Tuple
+
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+import ai_executor
+import cache_semantico
+import llm_cache
+
 load_dotenv()
 API_KEY = os.getenv("GEMINI_API_KEY")
+# sin clave la app sigue funcionando: responder() usa el motor local de ai_local
+DISPONIBLE = bool(API_KEY)
 
-if not API_KEY:
-    raise RuntimeError("GEMINI_API_KEY no encontrado en .env")
-
-genai.configure(api_key=API_KEY)
+# GEMINI_API_ENDPOINT apunta el cliente a otro servidor (p. ej. servidor_gemini_falso.py en local)
+API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+if DISPONIBLE and API_ENDPOINT:
+    genai.configure(api_key=API_KEY, transport="rest", client_options={"api_endpoint": API_ENDPOINT})
+elif DISPONIBLE:
+    genai.configure(api_key=API_KEY)
 MODEL_NAME = "gemini-2.5-flash"
 
-def generar_respuesta(prompt: str, max_output_tokens: int = 512) -> str:
+# gemini-2.5-flash descuenta los tokens de "razonamiento" del mismo límite de salida,
+# por eso el valor por defecto es holgado.
+MAX_OUTPUT_TOKENS = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", "2048"))
+TIMEOUT_S = float(os.getenv("GEMINI_TIMEOUT_S", "30"))
+MAX_REINTENTOS = int(os.getenv("GEMINI_MAX_REINTENTOS", "3"))
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 8.0
+# si Gemini no empezó a responder en este tiempo se sirve la respuesta local
+PRESUPUESTO_S = float(os.getenv("FINMIND_IA_PRESUPUESTO_S", "20"))
+
+try:
+    from google.api_core import exceptions as _api_exc
+    ERRORES_TRANSITORIOS = (
+        _api_exc.ServiceUnavailable,
+        _api_exc.DeadlineExceeded,
+        _api_exc.ResourceExhausted,
+        _api_exc.InternalServerError,
+        _api_exc.TooManyRequests,
+    )
+except ImportError:  # versiones del SDK sin google-api-core
+    ERRORES_TRANSITORIOS = ()
+ERRORES_TRANSITORIOS = ERRORES_TRANSITORIOS + (TimeoutError, ConnectionError)
+
+
+@lru_cache(maxsize=None)
+def obtener_modelo(model_name: str = MODEL_NAME):
+    """Modelo compartido: se crea una sola vez por proceso y nombre de modelo."""
+    if not DISPONIBLE:
+        raise RuntimeError("GEMINI_API_KEY no encontrado en .env")
+    return genai.GenerativeModel(model_name)
+
+
+def _config_generacion(max_output_tokens: int) -> dict:
+    """Parámetros de generación que cambian la respuesta (entran en la clave de la caché)."""
+    return {"max_output_tokens": max_output_tokens}
+
+
+def clave_respuesta(prompt: str, max_output_tokens: int = MAX_OUTPUT_TOKENS) -> str:
+    return llm_cache.clave_prompt(prompt, MODEL_NAME, _config_generacion(max_output_tokens))
+
+
+def _espera_backoff(intento: int) -> float:
+    """Backoff exponencial con jitter completo: U(0, min(max, base * 2^intento))."""
+    return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** intento)))
+
+
+def _dormir_antes_de(intento: int, deadline: float) -> bool:
+    """Espera el backoff del reintento si aún cabe antes del deadline; False si ya no vale la pena reintentar."""
+    pausa = _espera_backoff(intento)
+    if time.monotonic() + pausa >= deadline:
+        return False
+    time.sleep(pausa)
+    return True
+
+
+def _texto_respuesta(resp) -> str:
+    # En algunas versiones resp puede tener .candidates[0].content o .text
+    try:
+        return resp.text
+    except Exception:
+        pass
+    # intenta otras estructuras seguras:
+    try:
+        return resp.candidates[0].content
+    except Exception:
+        return str(resp)
+
+
+def generar_respuesta(prompt: str, max_output_tokens: int = MAX_OUTPUT_TOKENS,
+                      timeout: float = None, max_reintentos: int = None,
+                      sesion: Optional[str] = None) -> str:
+    """
+    Llamada bloqueante a través de ai_executor: limitador global, cupo por sesión y
+    coalescencia de prompts idénticos en vuelo.
+    """
+    clave = clave_respuesta(prompt, max_output_tokens)
+    return ai_executor.ejecutar(
+        clave, lambda: _generar_respuesta_directa(prompt, max_output_tokens, timeout, max_reintentos),
+        sesion=sesion,
+    )
+
+
+def _generar_respuesta_directa(prompt: str, max_output_tokens: int = MAX_OUTPUT_TOKENS,
+                               timeout: float = None, max_reintentos: int = None) -> str:
+    timeout = TIMEOUT_S if timeout is None else timeout
+    max_reintentos = MAX_REINTENTOS if max_reintentos is None else max_reintentos
+    config = genai.GenerationConfig(**_config_generacion(max_output_tokens))
+    deadline = time.monotonic() + timeout
+
+    ultimo_error = None
+    for intento in range(max_reintentos + 1):
+        try:
+            resp = obtener_modelo().generate_content(
+                prompt,
+                generation_config=config,
+                request_options={"timeout": max(deadline - time.monotonic(), 0.1)},
+            )
+            return _texto_respuesta(resp)
+        except ERRORES_TRANSITORIOS as e:
+            ultimo_error = e
+            if intento == max_reintentos or not _dormir_antes_de(intento, deadline):
+                break
+        except Exception as e:
+            # errores no transitorios (clave inválida, prompt bloqueado...) no se reintentan
+            raise RuntimeError(f"Error al generar respuesta con Gemini: {e}")
+    raise RuntimeError(
+        f"Error al generar respuesta con Gemini tras {intento + 1} intentos: {ultimo_error}"
+    )
+
+
+def _texto_chunk(chunk) -> str:
+    # los chunks finales (finish_reason, métricas) pueden no traer partes de texto
     try:
-        model = genai.GenerativeModel(MODEL_NAME)
-        resp = model.generate_content(prompt)  # adapta según la versión real de SDK
-        # En algunas versiones resp puede tener .candidates[0].content o .text
-        if hasattr(resp, "text"):
-            return resp.text
-        # intenta otras estructuras seguras:
+        return chunk.text or ""
+    except Exception:
+        return ""
+
+
+def generar_respuesta_stream(prompt: str, max_output_tokens: int = MAX_OUTPUT_TOKENS,
+                             timeout: float = None, max_reintentos: int = None,
+                             cache_key: Optional[str] = None, sesion: Optional[str] = None) -> Iterator[str]:
+    """
+    Igual que generar_respuesta pero produce el texto por partes a medida que llega
+    (apto para st.write_stream). Sólo se reintenta antes del primer chunk.
+    Con 'cache_key' se sirve desde la caché si existe y, al terminar, se guarda el texto completo.
+    La llamada ocupa un cupo de la sesión y una ficha del limitador de ai_executor mientras dura.
+    """
+    if cache_key is not None:
+        cacheada = respuesta_cacheada(cache_key)
+        if cacheada is not None:
+            yield cacheada
+            return
+
+    timeout = TIMEOUT_S if timeout is None else timeout
+    max_reintentos = MAX_REINTENTOS if max_reintentos is None else max_reintentos
+    config = genai.GenerationConfig(**_config_generacion(max_output_tokens))
+    deadline = time.monotonic() + timeout
+
+    partes = []
+    ultimo_error = None
+    with ai_executor.turno(sesion):
+        for intento in range(max_reintentos + 1):
+            try:
+                resp = obtener_modelo().generate_content(
+                    prompt,
+                    generation_config=config,
+                    request_options={"timeout": max(deadline - time.monotonic(), 0.1)},
+                    stream=True,
+                )
+                for chunk in resp:
+                    texto = _texto_chunk(chunk)
+                    if texto:
+                        partes.append(texto)
+                        yield texto
+                break
+            except ERRORES_TRANSITORIOS as e:
+                if partes:
+                    raise RuntimeError(f"Se interrumpió la respuesta de Gemini: {e}")
+                ultimo_error = e
+                if intento == max_reintentos or not _dormir_antes_de(intento, deadline):
+                    raise RuntimeError(
+                        f"Error al generar respuesta con Gemini tras {intento + 1} intentos: {ultimo_error}"
+                    )
+            except Exception as e:
+                raise RuntimeError(f"Error al generar respuesta con Gemini: {e}")
+
+    if cache_key is not None:
+        guardar_respuesta(cache_key, "".join(partes))
+
+
+# -------------------------
+# Caché de respuestas por hash de prompt, modelo y configuración (llm_cache: SQLite en disco por defecto)
+# -------------------------
+def respuesta_cacheada(clave: str) -> Optional[str]:
+    return llm_cache.obtener(clave)
+
+
+def guardar_respuesta(clave: str, texto: str) -> None:
+    llm_cache.guardar(clave, texto)
+
+
+def generar_respuesta_cacheada(clave: str, prompt: str, **kwargs) -> str:
+    """generar_respuesta con la misma caché por hash que usa el modo streaming."""
+    texto = respuesta_cacheada(clave)
+    if texto is None:
+        texto = generar_respuesta(prompt, **kwargs)
+        guardar_respuesta(clave, texto)
+    return texto
+
+
+def _buscar_en_cache(prompt: str, pregunta: Optional[str],
+                     max_output_tokens: int = MAX_OUTPUT_TOKENS) -> Tuple[Optional[str], List[str], Optional[str]]:
+    """
+    Busca por hash exacto y, si cache_semantico está activo, por prompt normalizado y por
+    similitud de la pregunta. Devuelve (texto o None, claves donde guardar, contexto de la pregunta).
+    """
+    config = _config_generacion(max_output_tokens)
+    clave = clave_respuesta(prompt, max_output_tokens)
+    texto = llm_cache.obtener(clave)
+    if texto is not None or not cache_semantico.ACTIVO:
+        return texto, [clave], None
+
+    clave_n = cache_semantico.clave_normalizada(prompt, modelo=MODEL_NAME, config=config, pregunta=pregunta)
+    texto = llm_cache.obtener(clave_n, contar=False)
+    if texto is not None:
+        cache_semantico.contar("hits_normalizados")
+        return texto, [clave], None
+
+    contexto = None
+    if pregunta:
+        contexto = cache_semantico.clave_normalizada(prompt.replace(pregunta, ""), modelo=MODEL_NAME, config=config)
+        similar = cache_semantico.buscar_similar(contexto, pregunta)
+        texto = llm_cache.obtener(similar, contar=False) if similar else None
+        if texto is not None:
+            cache_semantico.contar("hits_similares")
+            return texto, [clave], None
+    return None, [clave, clave_n], contexto
+
+
+def _guardar_en_cache(texto: str, claves: List[str], contexto: Optional[str], pregunta: Optional[str]) -> None:
+    if not texto:
+        return
+    for clave in claves:
+        guardar_respuesta(clave, texto)
+    if contexto is not None:
+        cache_semantico.registrar_pregunta(contexto, pregunta, claves[-1])
+
+
+def _stream_y_guardar(chunks: Iterator[str], claves: List[str], contexto: Optional[str],
+                      pregunta: Optional[str]) -> Iterator[str]:
+    partes = []
+    for chunk in chunks:
+        partes.append(chunk)
+        yield chunk
+    _guardar_en_cache("".join(partes), claves, contexto, pregunta)
+
+
+def _stream_con_presupuesto(chunks: Iterator[str], presupuesto_s: float,
+                            respaldo: Callable[[str], str]) -> Iterator[str]:
+    """
+    Consume 'chunks' en un hilo aparte; si el primero no llega dentro del presupuesto (o la
+    llamada falla antes de empezar) produce la respuesta de respaldo. La llamada original
+    sigue en segundo plano y, si termina, su respuesta queda en la caché.
+    """
+    cola: "queue.Queue[Tuple[str, object]]" = queue.Queue()
+
+    def _consumir():
         try:
-            return resp.candidates[0].content
-        except Exception:
-            return str(resp)
-    except Exception as e:
-        # Loguea o re-lanza según prefieras
-        raise RuntimeError(f"Error al generar respuesta con Gemini: {e}")
+            for chunk in chunks:
+                cola.put(("chunk", chunk))
+            cola.put(("fin", None))
+        except Exception as e:
+            cola.put(("error", e))
+
+    threading.Thread(target=_consumir, name="ia-stream", daemon=True).start()
+    try:
+        tipo, valor = cola.get(timeout=presupuesto_s)
+    except queue.Empty:
+        yield respaldo(f"Gemini no respondió en {presupuesto_s:.0f} s")
+        return
+    if tipo == "error":
+        yield respaldo(f"Gemini no disponible ({valor})")
+        return
+    while tipo == "chunk":
+        yield valor
+        tipo, valor = cola.get()
+    if tipo == "error":
+        raise valor
+
+
+def responder(prompt: str, stream: bool = False, pregunta: Optional[str] = None,
+              presupuesto_s: float = None, **kwargs):
+    """
+    Punto de entrada único para los módulos de IA: caché exacta por SHA-256 del prompt, el
+    modelo y la configuración de generación y, de segundo nivel, por prompt normalizado y
+    pregunta parecida ('pregunta' = texto libre del usuario contenido en el prompt). Con stream=True devuelve un iterador de chunks.
+    Si Gemini no está configurado, falla o no responde en 'presupuesto_s' segundos, responde
+    el motor local de ai_local (esa respuesta no se guarda en la caché).
+    """
+    presupuesto_s = PRESUPUESTO_S if presupuesto_s is None else presupuesto_s
+    texto, claves, contexto = _buscar_en_cache(prompt, pregunta,
+                                               kwargs.get("max_output_tokens", MAX_OUTPUT_TOKENS))
+    if texto is not None:
+        return iter([texto]) if stream else texto
+
+    def _respaldo(motivo: str) -> str:
+        from ai_local import respuesta_local
+        return respuesta_local(prompt, pregunta, motivo)
+
+    if not DISPONIBLE:
+        texto = _respaldo("sin GEMINI_API_KEY")
+        return iter([texto]) if stream else texto
+
+    sesion = ai_executor.sesion_actual()
+    if stream:
+        chunks = _stream_y_guardar(generar_respuesta_stream(prompt, sesion=sesion, **kwargs),
+                                   claves, contexto, pregunta)
+        return _stream_con_presupuesto(chunks, presupuesto_s, _respaldo)
+
+    def _generar_y_guardar() -> str:
+        texto = _generar_respuesta_directa(prompt, **kwargs)
+        _guardar_en_cache(texto, claves, contexto, pregunta)
+        return texto
+
+    try:
+        return ai_executor.ejecutar(claves[0], _generar_y_guardar, sesion=sesion, timeout=presupuesto_s)
+    except FuturoTimeout:
+        return _respaldo(f"Gemini no respondió en {presupuesto_s:.0f} s")
+    except RuntimeError as e:
+        return _respaldo(f"Gemini no disponible ({e})")
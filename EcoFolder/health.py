@@ -2,27 +2,24 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import IsolationForest
 import plotly.express as px
-from typing import Tuple, Dict
+from typing import Tuple
+from health_core import (
+    CONTAMINACION, MODOS_ANOMALIAS, UMBRAL_Z_ROBUSTO, EstadoSalud,
+    anomalias_transacciones, calcular_salud, detectar_anomalias,
+)
 
-# --- Constantes ---
-MIN_MESES_ANOMALIAS = 6  # mínimo de meses para usar IsolationForest
 
-
-def _validar_columnas(df: pd.DataFrame, columnas_requeridas: set) -> Tuple[bool, str]:
-    """Valida que existan las columnas requeridas en el DataFrame."""
-    faltantes = columnas_requeridas - set(df.columns)
-    if faltantes:
-        return False, f"Faltan columnas necesarias: {', '.join(sorted(faltantes))}"
-    return True, ""
-
-
-def _normalizar_columns(df: pd.DataFrame) -> pd.DataFrame:
-    """Normaliza nombres de columnas a minúsculas y remueve espacios alrededor."""
-    df = df.copy()
-    df.columns = [col.strip().lower() for col in df.columns]
-    return df
+def estado_salud() -> EstadoSalud:
+    """
+    EstadoSalud de la sesión: al cargar un ledger con meses agregados o corregidos
+    calcular_salud sólo reprocesa esos meses.
+    """
+    estado = st.session_state.get("estado_salud")
+    if not isinstance(estado, EstadoSalud):
+        estado = EstadoSalud()
+        st.session_state["estado_salud"] = estado
+    return estado
 
 
 def indice_salud_financiera(df: pd.DataFrame) -> Tuple[float, str]:
@@ -31,100 +28,24 @@ def indice_salud_financiera(df: pd.DataFrame) -> Tuple[float, str]:
     Muestra resultados en Streamlit (gráfico, progress bar y diagnóstico).
     """
     st.header("Índice de Salud Financiera 360")
-    if df is None or df.empty:
-        st.warning("El dataset está vacío. Carga datos para calcular el índice.")
-        return 0.0, "Sin datos"
-
-    # Normalizar columnas y validar
-    df = _normalizar_columns(df)
-    ok, msg = _validar_columnas(df, {"fecha", "monto", "tipo"})
-    if not ok:
-        st.warning(msg)
-        return 0.0, "Sin datos"
-
-    # --- Limpieza y preparación ---
-    df = df.copy()
-    df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce")
-    df = df.dropna(subset=["fecha", "monto"])
-    if df.empty:
-        st.warning("Después de limpiar los datos no quedan filas válidas.")
-        return 0.0, "Sin datos"
-
-    df["mes"] = df["fecha"].dt.to_period("M").astype(str)
-    df["tipo"] = df["tipo"].astype(str).str.lower()
-
-    # --- Agregaciones por mes ---
-    ingresos = df[df["tipo"] == "ingreso"].groupby("mes")["monto"].sum()
-    gastos = df[df["tipo"] == "gasto"].groupby("mes")["monto"].sum()
-
-    # Alinear índices (meses) — tomar union de meses encontrados
-    meses = sorted(set(ingresos.index).union(gastos.index))
-    ingresos = ingresos.reindex(meses, fill_value=0.0)
-    gastos = gastos.reindex(meses, fill_value=0.0)
-
-    flujo = ingresos - gastos
-
-    # Validaciones
-    if flujo.empty or ingresos.sum() == 0:
-        st.warning("No hay suficientes datos financieros (ingresos o meses) para calcular el índice.")
-        return 0.0, "Sin datos"
-
-    # --- Métricas componentes ---
-    # Ahorro relativo: promedio del flujo relativo a ingresos por mes
-    with np.errstate(divide="ignore", invalid="ignore"):
-        ratio_mes = (flujo / ingresos).replace([np.inf, -np.inf], np.nan).fillna(0.0)
-    ahorro_promedio = float(np.nanmean(ratio_mes))
-
-    # Estabilidad: basado en coeficiente de variación (std / |mean|)
-    media_flujo = float(flujo.mean())
-    std_flujo = float(flujo.std(ddof=0)) if len(flujo) > 1 else 0.0
-    if abs(media_flujo) < 1e-9:
-        coef_cv = 0.0
-    else:
-        coef_cv = std_flujo / abs(media_flujo)
-    estabilidad = 1.0 - coef_cv
-    estabilidad = float(max(min(estabilidad, 1.0), 0.0))
-
-    # Diversificación de ingresos: si no existe 'categoria' retorna 0
-    if "categoria" in df.columns and df["categoria"].nunique() > 0:
-        ingresos_total_cat = df[df["tipo"] == "ingreso"]["categoria"].nunique()
-        todas_categorias = max(df["categoria"].nunique(), 1)
-        diversificacion = ingresos_total_cat / todas_categorias
-    else:
-        diversificacion = 0.0
-
-    # --- Score compuesto (0..100) ---
-    score = (
-        (ahorro_promedio * 0.4) +
-        (estabilidad * 0.35) +
-        (diversificacion * 0.25)
-    ) * 100
-    score = float(max(0.0, min(100.0, score)))
-
-    # --- Diagnóstico textual ---
-    if score >= 80:
-        nivel = "Excelente"
-        mensaje = "Tu empresa presenta una salud financiera sólida y estable. Puedes considerar invertir o expandirte."
-        color = "green"
-    elif score >= 60:
-        nivel = "Estable"
-        mensaje = "Tu salud financiera es buena, aunque podrías optimizar algunos gastos o diversificar ingresos."
-        color = "gold"
-    else:
-        nivel = "Riesgosa"
-        mensaje = "Alerta: alto riesgo de desequilibrio financiero. Reduce gastos y mejora el flujo operativo."
-        color = "red"
+    salud = calcular_salud(df, estado=estado_salud(), historial=True)
+    if not salud["ok"]:
+        st.warning(salud["mensaje"])
+        return salud["score"], salud["nivel"]
+
+    score, nivel, color = salud["score"], salud["nivel"], salud["color"]
 
     # --- Mostrar resultados en UI ---
     st.subheader("Puntaje Global de Salud")
     st.write(f"**Nivel:** {nivel}")
     st.progress(int(score))
     st.metric("Índice de Salud Financiera", f"{score:.1f}/100")
-    st.info(f"**Diagnóstico:** {mensaje}")
+    st.info(f"**Diagnóstico:** {salud['diagnostico']}")
 
     # --- Gráfico de evolución del flujo (normalizando columnas) ---
     try:
-        df_flujo = pd.DataFrame({"mes": meses, "flujo": flujo.values})
+        flujo = salud["flujo"]
+        df_flujo = pd.DataFrame({"mes": list(flujo.index), "flujo": flujo.values})
         fig = px.line(
             df_flujo,
             x="mes",
@@ -142,82 +63,56 @@ def indice_salud_financiera(df: pd.DataFrame) -> Tuple[float, str]:
     except Exception as e:
         st.warning(f"No se pudo generar el gráfico del flujo: {e}")
 
+    # --- Historial del índice (score con los meses hasta cada mes) ---
+    historial = salud["historial"].dropna()
+    if len(historial) > 1:
+        try:
+            fig = px.line(historial, x="mes", y="score", markers=True,
+                          title="Evolución del Índice de Salud Financiera", range_y=[0, 100])
+            st.plotly_chart(fig, use_container_width=True)
+        except Exception as e:
+            st.warning(f"No se pudo generar el historial del índice: {e}")
+
     return score, nivel
 
 
 def detector_anomalias(df: pd.DataFrame) -> None:
     """
-    Detecta anomalías mensuales en el flujo usando IsolationForest.
-    Si hay pocos meses disponibles, usa un fallback estadístico (z-score).
-    Muestra resultados y gráfico en Streamlit.
+    Muestra las anomalías mensuales (health_core.detectar_anomalias) con su tabla y gráfico
+    en Streamlit; permite elegir el modo (flujo o multivariable) y la contaminación.
     """
     st.subheader("Detector de Anomalías Financieras")
 
-    if df is None or df.empty:
-        st.warning("Carga datos para ejecutar el detector de anomalías.")
-        return
-
-    # Normalizar y validar
-    df = _normalizar_columns(df)
-    ok, msg = _validar_columnas(df, {"fecha", "monto", "tipo"})
-    if not ok:
-        st.warning(msg)
-        return
-
-    df = df.copy()
-    df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce")
-    df = df.dropna(subset=["fecha", "monto"])
-    if df.empty:
-        st.warning("No hay filas válidas tras limpieza.")
-        return
-
-    df["mes"] = df["fecha"].dt.to_period("M").astype(str)
-    df["tipo"] = df["tipo"].astype(str).str.lower()
+    c1, c2 = st.columns(2)
+    modo = c1.radio("Rasgos del modelo", MODOS_ANOMALIAS, horizontal=True, key="anomalias_modo",
+                    format_func=lambda m: "Flujo mensual" if m == "flujo" else "Multivariable (categorías, ingreso, transacciones)")
+    contaminacion = c2.select_slider("Fracción esperada de meses anómalos",
+                                     options=["auto", 0.05, 0.1, 0.15, 0.2, 0.25, 0.3], value=CONTAMINACION,
+                                     key="anomalias_contaminacion")
 
-    resumen = df.groupby(["mes", "tipo"])["monto"].sum().unstack(fill_value=0.0)
-    resumen["flujo"] = resumen.get("ingreso", 0.0) - resumen.get("gasto", 0.0)
-
-    if len(resumen) < 3:
-        st.warning("No hay suficientes meses para detectar anomalías (se requieren al menos 3).")
+    resultado = detectar_anomalias(df, modo=modo, contaminacion=contaminacion)
+    if not resultado["ok"]:
+        st.warning(resultado["mensaje"])
         return
+    if resultado["aviso"]:
+        st.warning(resultado["aviso"])
+    if resultado["origen"] == "incremental":
+        st.caption(f"Modelo reutilizado: {resultado['meses_incrementales']} meses nuevos puntuados sin reentrenar.")
+    elif resultado["origen"] == "memoria":
+        st.caption("Modelo reutilizado: los datos no cambiaron desde el último entrenamiento.")
 
-    resumen_for_model = resumen[["flujo"]].copy()
-
-    # --- Selección método ---
-    if len(resumen_for_model) < MIN_MESES_ANOMALIAS:
-        # Fallback estadístico: z-score
-        resumen_for_model["z"] = (resumen_for_model["flujo"] - resumen_for_model["flujo"].mean()) / (
-            resumen_for_model["flujo"].std(ddof=0) + 1e-9
-        )
-        resumen["anomalia"] = ((resumen_for_model["z"].abs() > 2).astype(int) * -1).replace({0: 1, -1: -1})
-        metodo = "Z-score (fallback)"
-    else:
-        # IsolationForest
-        try:
-            modelo = IsolationForest(contamination=0.15, random_state=42)
-            modelo.fit(resumen_for_model[["flujo"]])
-            preds = modelo.predict(resumen_for_model[["flujo"]])  # 1 normal, -1 anomalía
-            resumen["anomalia"] = preds
-            metodo = "IsolationForest"
-        except Exception as e:
-            st.warning(f"Error entrenando IsolationForest, usando fallback estadístico: {e}")
-            resumen_for_model["z"] = (resumen_for_model["flujo"] - resumen_for_model["flujo"].mean()) / (
-                resumen_for_model["flujo"].std(ddof=0) + 1e-9
-            )
-            resumen["anomalia"] = ((resumen_for_model["z"].abs() > 2).astype(int) * -1).replace({0: 1, -1: -1})
-            metodo = "Z-score (fallback)"
-
-    # -1 = anomalía, 1 = normal
-    anomalías = resumen[resumen["anomalia"] == -1]
+    metodo = resultado["metodo"]
+    anomalías = resultado["anomalias"]
 
     if anomalías.empty:
         st.success("✅ No se detectaron comportamientos anómalos.")
     else:
         st.warning(f"⚠️ Se detectaron {len(anomalías)} meses con comportamiento financiero atípico ({metodo}):")
-        st.dataframe(anomalías[["flujo"]])
+        columnas = [c for c in ("flujo", "puntaje", "rasgo_principal") if c in anomalías.columns]
+        st.dataframe(anomalías[columnas])
 
     # Visualización del flujo con estado
-    resumen_plot = resumen.reset_index().copy()
+    resumen_plot = resultado["resumen"].reset_index().copy()
     resumen_plot["estado"] = resumen_plot["anomalia"].map({1: "Normal", -1: "Anómalo"})
 
     try:
@@ -238,3 +133,46 @@ def detector_anomalias(df: pd.DataFrame) -> None:
         st.plotly_chart(fig, use_container_width=True)
     except Exception as e:
         st.warning(f"No se pudo generar el gráfico de anomalías: {e}")
+
+
+def detector_transacciones(df: pd.DataFrame) -> None:
+    """
+    Muestra las transacciones y categoría-meses más atípicos frente a su categoría
+    (health_core.anomalias_transacciones), con filtro por categoría para el drill-down.
+    """
+    st.subheader("Anomalías por Transacción")
+    if df is not None and df.attrs.get("agregado"):
+        st.info("El ledger se cargó agregado por mes: se comparan totales mensuales por categoría, no transacciones.")
+
+    c1, c2, c3 = st.columns(3)
+    k = c1.slider("Transacciones a mostrar", 5, 100, 20, key="anomalias_tx_k")
+    umbral = c2.slider("Umbral de z robusto", 2.0, 8.0, UMBRAL_Z_ROBUSTO, 0.5, key="anomalias_tx_umbral")
+    usar_isolation = c3.checkbox("Ordenar con IsolationForest", key="anomalias_tx_isolation",
+                                 help="Combina el desvío de la fila, el de su categoría en el mes y el monto.")
+
+    resultado = anomalias_transacciones(df, k=k, umbral=umbral, usar_isolation=usar_isolation)
+    if not resultado["ok"]:
+        st.warning(resultado["mensaje"])
+        return
+
+    por_categoria = resultado["categorias"]
+    st.metric("Transacciones atípicas", f"{resultado['atipicas']:,}",
+              delta=f"{resultado['atipicas'] / max(resultado['filas'], 1):.2%} del ledger", delta_color="off")
+    if por_categoria.empty:
+        st.success("✅ Ninguna transacción se aleja de su categoría más allá del umbral.")
+    else:
+        try:
+            fig = px.bar(por_categoria.head(15), x="atipicas", y="categoria", color="tipo", orientation="h",
+                         title="Transacciones atípicas por categoría")
+            st.plotly_chart(fig, use_container_width=True)
+        except Exception as e:
+            st.warning(f"No se pudo generar el gráfico por categoría: {e}")
+
+    filtro = st.selectbox("Ver categoría", ["Todas"] + resultado["todas_categorias"], key="anomalias_tx_categoria")
+    if filtro != "Todas":
+        resultado = anomalias_transacciones(df, k=k, umbral=umbral, usar_isolation=usar_isolation, categoria=filtro)
+
+    st.markdown(f"**Top {k} transacciones** ({resultado['metodo']})")
+    st.dataframe(resultado["top"], use_container_width=True)
+    st.markdown("**Categorías con meses fuera de lo normal** (total del mes vs. mediana de la categoría)")
+    st.dataframe(resultado["meses"], use_container_width=True)
@@ -0,0 +1,607 @@
+# health_core.py
+"""
+Núcleo de cálculo de salud financiera y anomalías, sin Streamlit.
+- calcular_salud(df): score, nivel, componentes, flujo mensual e historial del índice como datos
+- detectar_anomalias(df, modo): etiqueta por mes (1 normal, -1 anómalo) con IsolationForest sobre el flujo
+  o sobre gasto por categoría + ingreso + transacciones; modelos cacheados por hash de los rasgos
+- anomalias_transacciones(df): z robusto de cada fila frente a su categoría y top-k de filas atípicas
+- EstadoSalud: estadísticos acumulados por mes; el índice se actualiza en O(meses cambiados)
+
+health.py sólo dibuja estos resultados y tests/test_benchmark_salud.py los mide sin UI.
+"""
+
+import hashlib
+import threading
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ledger import buscar_columna, cubo_mensual, matriz_categorias, memo_dataset, serie_mensual
+
+# --- Constantes ---
+MIN_MESES_ANOMALIAS = 6  # mínimo de meses para usar IsolationForest
+MIN_MESES_DETECTOR = 3
+PESOS_SALUD = {"ahorro_promedio": 0.4, "estabilidad": 0.35, "diversificacion": 0.25}
+COLUMNAS_REQUERIDAS = {"fecha", "monto", "tipo"}
+
+# (ingreso, gasto, categorías del mes, categorías de ingreso del mes)
+DatosMes = Tuple[float, float, FrozenSet, FrozenSet]
+
+
+def _validar_columnas(df: pd.DataFrame, columnas_requeridas: set) -> Tuple[bool, str]:
+    """Valida que existan las columnas requeridas en el DataFrame."""
+    faltantes = columnas_requeridas - set(df.columns)
+    if faltantes:
+        return False, f"Faltan columnas necesarias: {', '.join(sorted(faltantes))}"
+    return True, ""
+
+
+def _normalizar_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza nombres de columnas a minúsculas y remueve espacios alrededor."""
+    df = df.copy()
+    df.columns = [col.strip().lower() for col in df.columns]
+    return df
+
+
+# --- Estado incremental del índice ---
+def _contar_categorias(conteo: Counter, categorias: FrozenSet, signo: int) -> None:
+    for cat in categorias:
+        conteo[cat] += signo
+        if conteo[cat] <= 0:
+            del conteo[cat]
+
+
+class _Acumulado:
+    """
+    Estadísticos acumulados sobre un conjunto de meses:
+    - media y M2 de Welford del flujo (admite altas y bajas de meses)
+    - suma de ratios flujo/ingreso y total de ingresos
+    - meses en que aparece cada categoría (todas y de ingreso)
+    """
+
+    __slots__ = ("n", "media", "m2", "suma_ratio", "total_ingreso", "categorias", "categorias_ingreso")
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.suma_ratio = 0.0
+        self.total_ingreso = 0.0
+        self.categorias: Counter = Counter()
+        self.categorias_ingreso: Counter = Counter()
+
+    def copia(self) -> "_Acumulado":
+        otro = _Acumulado()
+        otro.n, otro.media, otro.m2 = self.n, self.media, self.m2
+        otro.suma_ratio, otro.total_ingreso = self.suma_ratio, self.total_ingreso
+        otro.categorias = self.categorias.copy()
+        otro.categorias_ingreso = self.categorias_ingreso.copy()
+        return otro
+
+    def sumar(self, datos: DatosMes, signo: int = 1) -> None:
+        """signo=1 agrega el mes, signo=-1 lo quita."""
+        ingreso, gasto, categorias, categorias_ingreso = datos
+        flujo = ingreso - gasto
+        if signo > 0:
+            self.n += 1
+            delta = flujo - self.media
+            self.media += delta / self.n
+            self.m2 += delta * (flujo - self.media)
+        elif self.n <= 1:
+            self.n, self.media, self.m2 = 0, 0.0, 0.0
+        else:
+            self.n -= 1
+            delta = flujo - self.media
+            self.media -= delta / self.n
+            self.m2 = max(self.m2 - delta * (flujo - self.media), 0.0)
+        # sin ingresos el ratio es inf/nan y el índice original lo toma como 0
+        self.suma_ratio += signo * (flujo / ingreso if ingreso != 0 else 0.0)
+        self.total_ingreso += signo * ingreso
+        _contar_categorias(self.categorias, categorias, signo)
+        _contar_categorias(self.categorias_ingreso, categorias_ingreso, signo)
+
+    def con_datos(self) -> bool:
+        return self.n > 0 and abs(self.total_ingreso) > 1e-9
+
+    def componentes(self) -> Dict[str, float]:
+        ahorro_promedio = self.suma_ratio / self.n if self.n else 0.0
+        # Estabilidad: 1 - coeficiente de variación (std poblacional / |media|)
+        std_flujo = float(np.sqrt(self.m2 / self.n)) if self.n > 1 else 0.0
+        coef_cv = 0.0 if abs(self.media) < 1e-9 else std_flujo / abs(self.media)
+        estabilidad = float(max(min(1.0 - coef_cv, 1.0), 0.0))
+        # Diversificación: categorías de ingreso / categorías totales
+        diversificacion = len(self.categorias_ingreso) / len(self.categorias) if self.categorias else 0.0
+        return {"ahorro_promedio": ahorro_promedio, "estabilidad": estabilidad, "diversificacion": diversificacion}
+
+    def score(self) -> float:
+        """Score compuesto 0..100 (nan si aún no hay ingresos)."""
+        if not self.con_datos():
+            return float("nan")
+        componentes = self.componentes()
+        score = sum(componentes[k] * peso for k, peso in PESOS_SALUD.items()) * 100
+        return float(max(0.0, min(100.0, score)))
+
+
+class EstadoSalud:
+    """
+    Índice de salud respaldado por estadísticos acumulados por mes.
+    aplicar() recibe el resumen mensual del dataset y sólo procesa los meses nuevos,
+    modificados o eliminados: el score se actualiza en O(meses cambiados).
+    historial() devuelve el score tras cada prefijo de meses; guarda un acumulado por mes,
+    así que tras agregar meses sólo se extiende desde el primer mes cambiado.
+    """
+
+    def __init__(self):
+        self.meses: Dict[str, DatosMes] = {}
+        self.total = _Acumulado()
+        self._orden: List[str] = []
+        self._prefijos: List[_Acumulado] = []
+        self._historial: List[Tuple[str, float]] = []
+
+    def aplicar(self, resumen: Dict[str, DatosMes]) -> List[str]:
+        """Sincroniza el estado con 'resumen' (mes -> datos); devuelve los meses cambiados."""
+        cambiados = [mes for mes, datos in resumen.items() if self.meses.get(mes) != datos]
+        cambiados += [mes for mes in self.meses if mes not in resumen]
+        for mes in cambiados:
+            anterior = self.meses.pop(mes, None)
+            if anterior is not None:
+                self.total.sumar(anterior, -1)
+                self._orden.remove(mes)
+            nuevo = resumen.get(mes)
+            if nuevo is not None:
+                self.total.sumar(nuevo, 1)
+                self.meses[mes] = nuevo
+                insort(self._orden, mes)
+        if cambiados:
+            # el historial sigue siendo válido antes del primer mes cambiado
+            corte = bisect_left(self._orden, min(cambiados))
+            del self._prefijos[corte:], self._historial[corte:]
+        return sorted(cambiados)
+
+    def componentes(self) -> Dict[str, float]:
+        return self.total.componentes()
+
+    def score(self) -> float:
+        return self.total.score()
+
+    def historial(self) -> List[Tuple[str, float]]:
+        """[(mes, score con los meses hasta ese mes inclusive), ...] en orden cronológico."""
+        acumulado = self._prefijos[-1].copia() if self._prefijos else _Acumulado()
+        for mes in self._orden[len(self._prefijos):]:
+            acumulado.sumar(self.meses[mes], 1)
+            self._prefijos.append(acumulado.copia())
+            self._historial.append((mes, acumulado.score()))
+        return list(self._historial)
+
+
+def _construir_resumen_salud(df: pd.DataFrame) -> Dict[str, DatosMes]:
+    cubo = cubo_mensual(df)
+    serie = serie_mensual(df)
+    con_categoria = cubo.dropna(subset=["categoria"])
+    categorias = con_categoria.groupby("mes")["categoria"].agg(frozenset)
+    categorias_ingreso = con_categoria[con_categoria["tipo"] == "ingreso"].groupby("mes")["categoria"].agg(frozenset)
+    vacio = frozenset()
+    return {
+        mes: (float(ingreso), float(gasto), categorias.get(mes, vacio), categorias_ingreso.get(mes, vacio))
+        for mes, ingreso, gasto in zip(serie.index, serie["ingreso"], serie["gasto"])
+    }
+
+
+def resumen_salud(df: pd.DataFrame) -> Dict[str, DatosMes]:
+    """Datos por mes que alimentan EstadoSalud (memoizado por dataset)."""
+    return memo_dataset(df, "resumen_salud", _construir_resumen_salud)
+
+
+def _diagnostico(score: float) -> Tuple[str, str, str]:
+    """(nivel, mensaje, color) para un score."""
+    if score >= 80:
+        return ("Excelente",
+                "Tu empresa presenta una salud financiera sólida y estable. Puedes considerar invertir o expandirte.",
+                "green")
+    if score >= 60:
+        return ("Estable",
+                "Tu salud financiera es buena, aunque podrías optimizar algunos gastos o diversificar ingresos.",
+                "gold")
+    return ("Riesgosa",
+            "Alerta: alto riesgo de desequilibrio financiero. Reduce gastos y mejora el flujo operativo.",
+            "red")
+
+
+def _sin_datos(mensaje: str) -> Dict:
+    return {"ok": False, "mensaje": mensaje, "score": 0.0, "nivel": "Sin datos"}
+
+
+def _validar_dataset(df: pd.DataFrame, mensaje_vacio: str, mensaje_sin_filas: str) -> Optional[str]:
+    """Mensaje de error si el dataset no sirve para los cálculos, None si está bien."""
+    if df is None or df.empty:
+        return mensaje_vacio
+    # Validar columnas (sin copiar el ledger)
+    ok, msg = _validar_columnas(_normalizar_columns(df.head(0)), COLUMNAS_REQUERIDAS)
+    if not ok:
+        return msg
+    if cubo_mensual(df).empty:
+        return mensaje_sin_filas
+    return None
+
+
+# --- Índice de salud ---
+def calcular_salud(df: pd.DataFrame, estado: Optional[EstadoSalud] = None, historial: bool = False) -> Dict:
+    """
+    Índice compuesto de salud financiera (0-100) como datos:
+    {ok, mensaje, score, nivel, diagnostico, color, componentes, flujo (Serie por mes)
+     y, con historial=True, historial (DataFrame mes/score)}.
+    Con 'estado' se reutiliza (y sincroniza) un EstadoSalud previo en lugar de construir uno nuevo.
+    """
+    error = _validar_dataset(df, "El dataset está vacío. Carga datos para calcular el índice.",
+                             "Después de limpiar los datos no quedan filas válidas.")
+    if error:
+        return _sin_datos(error)
+
+    estado = estado if estado is not None else EstadoSalud()
+    estado.aplicar(resumen_salud(df))
+    if not estado.total.con_datos():
+        return _sin_datos("No hay suficientes datos financieros (ingresos o meses) para calcular el índice.")
+
+    score = estado.score()
+    nivel, diagnostico, color = _diagnostico(score)
+    resultado = {
+        "ok": True,
+        "mensaje": "",
+        "score": score,
+        "nivel": nivel,
+        "diagnostico": diagnostico,
+        "color": color,
+        "componentes": estado.componentes(),
+        "flujo": serie_mensual(df)["flujo"],
+    }
+    if historial:
+        resultado["historial"] = pd.DataFrame(estado.historial(), columns=["mes", "score"])
+    return resultado
+
+
+# --- Detector de anomalías ---
+CONTAMINACION = 0.15  # fracción esperada de meses anómalos ("auto" deja que sklearn la estime)
+MODOS_ANOMALIAS = ("flujo", "multivariable")
+MAX_MESES_INCREMENTALES = 6  # meses nuevos que se puntúan con un modelo previo antes de reentrenar
+MAX_MODELOS_MENSUALES = 8
+
+# clave de rasgos -> {"modelo", "meses", "columnas", "clave_entrenamiento"}
+_MODELOS_MENSUALES: "OrderedDict[str, Dict]" = OrderedDict()
+_LOCK_MODELOS = threading.Lock()
+
+
+def _etiquetas_zscore(flujo: pd.Series) -> np.ndarray:
+    z = (flujo - flujo.mean()) / (flujo.std(ddof=0) + 1e-9)
+    return np.where(z.abs() > 2, -1, 1)
+
+
+def _construir_rasgos_multivariable(df: pd.DataFrame) -> pd.DataFrame:
+    serie = serie_mensual(df)
+    gastos = matriz_categorias(df, "gasto").reindex(serie.index, fill_value=0.0)
+    gastos.columns = [f"gasto: {c}" for c in gastos.columns]
+    transacciones = cubo_mensual(df).groupby("mes")["n"].sum().reindex(serie.index, fill_value=0)
+    rasgos = gastos.assign(ingreso=serie["ingreso"], transacciones=transacciones.astype(float))
+    rasgos.columns.name = None
+    return rasgos
+
+
+def rasgos_mensuales(df: pd.DataFrame, modo: str = "flujo") -> pd.DataFrame:
+    """
+    Matriz mes x rasgo del detector: sólo el flujo ('flujo') o el gasto por categoría,
+    el ingreso y el número de transacciones ('multivariable').
+    """
+    if modo not in MODOS_ANOMALIAS:
+        raise ValueError(f"Modo no soportado: '{modo}'. Usa: {', '.join(MODOS_ANOMALIAS)}")
+    if modo == "flujo":
+        return serie_mensual(df)[["flujo"]]
+    return memo_dataset(df, "rasgos_multivariable", _construir_rasgos_multivariable)
+
+
+def _clave_rasgos(X: pd.DataFrame, contaminacion) -> str:
+    h = hashlib.sha256(f"{contaminacion}|".encode("utf-8"))
+    h.update("\x1f".join(map(str, X.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(X, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _recordar_modelo(clave: str, entrada: Dict) -> None:
+    with _LOCK_MODELOS:
+        _MODELOS_MENSUALES[clave] = entrada
+        _MODELOS_MENSUALES.move_to_end(clave)
+        while len(_MODELOS_MENSUALES) > MAX_MODELOS_MENSUALES:
+            _MODELOS_MENSUALES.popitem(last=False)
+
+
+def _modelo_previo(X: pd.DataFrame, contaminacion) -> Optional[Dict]:
+    """
+    Modelo entrenado con un prefijo de estos mismos meses (mismos rasgos y valores), para
+    puntuar sólo los meses agregados después sin reentrenar.
+    """
+    with _LOCK_MODELOS:
+        candidatos = list(_MODELOS_MENSUALES.values())
+    for entrada in reversed(candidatos):
+        meses = entrada["meses"]
+        nuevos = len(X) - len(meses)
+        if (entrada["contaminacion"] != contaminacion or list(X.columns) != entrada["columnas"]
+                or not 0 < nuevos <= MAX_MESES_INCREMENTALES or list(X.index[:len(meses)]) != meses):
+            continue
+        if _clave_rasgos(X.iloc[:len(meses)], contaminacion) == entrada["clave_entrenamiento"]:
+            return entrada
+    return None
+
+
+def modelo_anomalias(X: pd.DataFrame, contaminacion=CONTAMINACION) -> Tuple[object, str, int]:
+    """
+    (IsolationForest, origen, meses puntuados sin reentrenar) para la matriz de rasgos X.
+    origen: 'memoria' (mismos datos), 'incremental' (X agrega meses a un modelo previo)
+    o 'entrenado' (n_jobs=-1). Los modelos se identifican por el hash del contenido de X.
+    """
+    clave = _clave_rasgos(X, contaminacion)
+    with _LOCK_MODELOS:
+        entrada = _MODELOS_MENSUALES.get(clave)
+    if entrada is not None:
+        return entrada["modelo"], "memoria", len(X) - len(entrada["meses"])
+
+    entrada = _modelo_previo(X, contaminacion)
+    if entrada is not None:
+        _recordar_modelo(clave, entrada)
+        return entrada["modelo"], "incremental", len(X) - len(entrada["meses"])
+
+    from sklearn.ensemble import IsolationForest  # diferido: sklearn tarda en importarse
+    modelo = IsolationForest(contamination=contaminacion, random_state=42, n_jobs=-1)
+    modelo.fit(X)
+    _recordar_modelo(clave, {
+        "modelo": modelo,
+        "meses": list(X.index),
+        "columnas": list(X.columns),
+        "contaminacion": contaminacion,
+        "clave_entrenamiento": clave,
+    })
+    return modelo, "entrenado", 0
+
+
+def _rasgo_principal(X: pd.DataFrame) -> pd.Series:
+    """Rasgo con mayor desvío robusto (mediana/MAD entre meses) en cada mes."""
+    valores = X.to_numpy(dtype=float)
+    mediana = np.median(valores, axis=0)
+    escala = np.median(np.abs(valores - mediana), axis=0) / _K_MAD
+    z = np.abs(_z_robusto(valores, mediana, escala))
+    return pd.Series(np.asarray(X.columns, dtype=object)[z.argmax(axis=1)], index=X.index)
+
+
+def detectar_anomalias(df: pd.DataFrame, modo: str = "flujo", contaminacion=CONTAMINACION) -> Dict:
+    """
+    Etiqueta cada mes como normal (1) o anómalo (-1):
+    IsolationForest con MIN_MESES_ANOMALIAS meses o más, z-score del flujo con menos.
+    modo='flujo' usa sólo el flujo mensual; 'multivariable' el gasto por categoría, el ingreso
+    y el número de transacciones. El modelo se reutiliza mientras los datos no cambien y los
+    meses agregados al final se puntúan con él sin reentrenar (hasta MAX_MESES_INCREMENTALES).
+    Devuelve {ok, mensaje, metodo, aviso, origen, meses_incrementales, rasgos,
+    resumen (mes -> ingreso/gasto/flujo/anomalia/puntaje[/rasgo_principal]), anomalias}.
+    """
+    error = _validar_dataset(df, "Carga datos para ejecutar el detector de anomalías.",
+                             "No hay filas válidas tras limpieza.")
+    if error:
+        return {"ok": False, "mensaje": error}
+
+    resumen = serie_mensual(df).copy()
+    if len(resumen) < MIN_MESES_DETECTOR:
+        return {"ok": False,
+                "mensaje": "No hay suficientes meses para detectar anomalías (se requieren al menos 3)."}
+
+    aviso, origen, incrementales, columnas = "", "", 0, ["flujo"]
+    if len(resumen) < MIN_MESES_ANOMALIAS:
+        resumen["anomalia"] = _etiquetas_zscore(resumen["flujo"])
+        metodo = "Z-score (fallback)"
+    else:
+        try:
+            X = rasgos_mensuales(df, modo)
+            modelo, origen, incrementales = modelo_anomalias(X, contaminacion)
+            resumen["anomalia"] = modelo.predict(X)  # 1 normal, -1 anomalía
+            resumen["puntaje"] = -modelo.score_samples(X)  # mayor = más atípico
+            if modo == "multivariable":
+                resumen["rasgo_principal"] = _rasgo_principal(X)
+            columnas = list(X.columns)
+            metodo = "IsolationForest" if modo == "flujo" else f"IsolationForest multivariable ({len(columnas)} rasgos)"
+        except Exception as e:
+            aviso = f"Error entrenando IsolationForest, usando fallback estadístico: {e}"
+            resumen["anomalia"] = _etiquetas_zscore(resumen["flujo"])
+            metodo = "Z-score (fallback)"
+
+    return {
+        "ok": True,
+        "mensaje": "",
+        "metodo": metodo,
+        "aviso": aviso,
+        "origen": origen,
+        "meses_incrementales": incrementales,
+        "rasgos": columnas,
+        "resumen": resumen,
+        "anomalias": resumen[resumen["anomalia"] == -1],
+    }
+
+
+# --- Anomalías por transacción ---
+UMBRAL_Z_ROBUSTO = 3.5  # z robusto (Iglewicz-Hoaglin) a partir del cual una fila es atípica
+MAX_MUESTRA_ISOLATION = 200_000
+_K_MAD = 0.6745
+
+
+def _escala_robusta(valores: pd.Series, grupos: np.ndarray, n_grupos: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (mediana, escala) por grupo: escala = MAD / 0.6745; si el MAD es 0 (más de la mitad de los
+    valores iguales) se usa la desviación absoluta media * 1.2533.
+    """
+    mediana = valores.groupby(grupos).median().reindex(range(n_grupos)).to_numpy()
+    desvio = (valores - mediana[grupos]).abs()
+    mad = desvio.groupby(grupos).median().reindex(range(n_grupos)).to_numpy()
+    media_abs = desvio.groupby(grupos).mean().reindex(range(n_grupos)).to_numpy()
+    escala = np.where(mad > 0, mad / _K_MAD, media_abs * 1.2533)
+    return mediana, escala
+
+
+def _z_robusto(x: np.ndarray, mediana: np.ndarray, escala: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (x - mediana) / escala
+    # categorías constantes: sin dispersión no hay desvío medible
+    return np.where(escala > 0, z, 0.0)
+
+
+def _columnas_transacciones(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    tipo = buscar_columna(df, "tipo")
+    if not isinstance(tipo.dtype, pd.CategoricalDtype):
+        tipo = tipo.astype(str).str.lower().str.strip()
+    categoria = buscar_columna(df, "categoria")
+    if categoria is None:
+        categoria = pd.Series("(sin categoría)", index=df.index)
+    mes_id = buscar_columna(df, "mes_id")
+    if mes_id is None:
+        fecha = buscar_columna(df, "fecha")
+        fecha = fecha if pd.api.types.is_datetime64_any_dtype(fecha) else pd.to_datetime(fecha, errors="coerce")
+        mes_id = fecha.dt.year * 12 + fecha.dt.month - 1
+    return {
+        "tipo": tipo,
+        "categoria": categoria,
+        "monto": pd.to_numeric(buscar_columna(df, "monto"), errors="coerce").to_numpy(dtype=np.float64),
+        "mes_id": pd.to_numeric(mes_id, errors="coerce").to_numpy(dtype=np.float64),
+    }
+
+
+def _construir_baselines(df: pd.DataFrame) -> Dict:
+    """
+    Una pasada vectorizada sobre las filas:
+    - grupo tipo x categoría de cada fila (códigos enteros) y su mediana/escala de montos
+    - total de cada grupo x mes y su mediana/escala entre los meses del grupo
+    - z robusto de cada fila frente a su categoría y de su categoría-mes frente a los otros meses
+    """
+    cols = _columnas_transacciones(df)
+    monto, mes_id = cols["monto"], cols["mes_id"]
+    valido = ~(np.isnan(monto) | np.isnan(mes_id))
+
+    codigo_tipo, tipos = pd.factorize(cols["tipo"], use_na_sentinel=False)
+    codigo_cat, categorias = pd.factorize(cols["categoria"], use_na_sentinel=False)
+    grupo, claves_grupo = pd.factorize(codigo_tipo.astype(np.int64) * len(categorias) + codigo_cat)
+    n_grupos = len(claves_grupo)
+    grupos = pd.DataFrame({
+        "tipo": np.asarray(tipos, dtype=object)[claves_grupo // len(categorias)],
+        "categoria": np.asarray(categorias, dtype=object)[claves_grupo % len(categorias)],
+    })
+
+    # Fila vs. su categoría
+    z_fila = np.full(len(monto), np.nan)
+    montos_validos = pd.Series(monto[valido])
+    mediana, escala = _escala_robusta(montos_validos, grupo[valido], n_grupos)
+    z_fila[valido] = _z_robusto(monto[valido], mediana[grupo[valido]], escala[grupo[valido]])
+
+    # Categoría-mes vs. los demás meses de la categoría
+    mes_min = int(np.nanmin(mes_id[valido])) if valido.any() else 0
+    rango_mes = int(np.nanmax(mes_id[valido])) - mes_min + 1 if valido.any() else 1
+    clave_cm = grupo[valido].astype(np.int64) * rango_mes + (mes_id[valido].astype(np.int64) - mes_min)
+    codigo_cm, claves_cm = pd.factorize(clave_cm)
+    total_cm = np.bincount(codigo_cm, weights=monto[valido], minlength=len(claves_cm))
+    grupo_cm = (claves_cm // rango_mes).astype(np.int64)
+    mediana_cm, escala_cm = _escala_robusta(pd.Series(total_cm), grupo_cm, n_grupos)
+    z_cm = _z_robusto(total_cm, mediana_cm[grupo_cm], escala_cm[grupo_cm])
+    z_mes = np.full(len(monto), np.nan)
+    z_mes[valido] = z_cm[codigo_cm]
+
+    meses = pd.DataFrame({
+        "mes_id": claves_cm % rango_mes + mes_min,
+        "tipo": grupos["tipo"].to_numpy()[grupo_cm],
+        "categoria": grupos["categoria"].to_numpy()[grupo_cm],
+        "total": total_cm,
+        "mediana_categoria": mediana_cm[grupo_cm],
+        "z_mes": z_cm,
+    })
+    grupos["z_max"] = pd.Series(np.abs(z_fila)).groupby(grupo).max().reindex(range(n_grupos)).to_numpy()
+    return {
+        "grupo": grupo, "grupos": grupos, "mediana": mediana, "escala": escala,
+        "z_fila": z_fila, "z_mes": z_mes, "meses": meses, "monto": monto,
+    }
+
+
+def baselines_transacciones(df: pd.DataFrame) -> Dict:
+    """Baselines robustos por categoría y categoría-mes con sus z, calculados una vez por dataset."""
+    return memo_dataset(df, "baselines_transacciones", _construir_baselines)
+
+
+def _construir_isolation(df: pd.DataFrame) -> np.ndarray:
+    """Puntaje de IsolationForest (mayor = más atípico) sobre [z fila, z categoría-mes, log monto]."""
+    from sklearn.ensemble import IsolationForest  # diferido: sklearn tarda en importarse
+    base = baselines_transacciones(df)
+    X = np.column_stack([base["z_fila"], base["z_mes"], np.log1p(np.abs(base["monto"]))])
+    valido = ~np.isnan(X).any(axis=1)
+    rng = np.random.default_rng(42)
+    indices = np.flatnonzero(valido)
+    muestra = indices if len(indices) <= MAX_MUESTRA_ISOLATION else rng.choice(indices, MAX_MUESTRA_ISOLATION, replace=False)
+    modelo = IsolationForest(n_estimators=100, random_state=42, n_jobs=-1).fit(X[muestra])
+    puntaje = np.full(len(X), np.nan)
+    puntaje[valido] = -modelo.score_samples(X[valido])
+    return puntaje
+
+
+def anomalias_transacciones(df: pd.DataFrame, k: int = 20, umbral: float = UMBRAL_Z_ROBUSTO,
+                            usar_isolation: bool = False, categoria: Optional[str] = None) -> Dict:
+    """
+    Detector por transacción: cada fila se compara con la mediana/MAD de su tipo x categoría y
+    su categoría-mes con los demás meses de esa categoría. Con usar_isolation=True se ordena por
+    un IsolationForest sobre esos rasgos (entrenado con una muestra, puntúa todas las filas).
+    Devuelve {ok, mensaje, metodo, filas, atipicas, top (k filas del ledger con sus puntajes),
+    categorias (atípicas por categoría), todas_categorias y meses (categoría-meses más desviados)}.
+    'categoria' restringe el top-k a esa categoría (drill-down).
+    """
+    error = _validar_dataset(df, "Carga datos para ejecutar el detector de transacciones.",
+                             "No hay filas válidas tras limpieza.")
+    if error:
+        return {"ok": False, "mensaje": error}
+
+    base = baselines_transacciones(df)
+    z_fila = base["z_fila"]
+    atipica = np.abs(np.nan_to_num(z_fila)) > umbral
+    if usar_isolation:
+        puntaje = memo_dataset(df, "isolation_transacciones", _construir_isolation)
+        metodo = "IsolationForest (z categoría, z categoría-mes, monto)"
+    else:
+        puntaje = np.abs(z_fila)
+        metodo = "Mediana/MAD por categoría"
+
+    grupos = base["grupos"]
+    candidato = ~np.isnan(puntaje)
+    if categoria is not None:
+        codigos = np.flatnonzero(grupos["categoria"].astype(str).to_numpy() == str(categoria))
+        candidato &= np.isin(base["grupo"], codigos)
+    indices = np.flatnonzero(candidato)
+    if len(indices) > k:
+        # selección O(n) de los k mayores; sólo ellos se ordenan
+        indices = indices[np.argpartition(puntaje[indices], -k)[-k:]]
+    indices = indices[np.argsort(-puntaje[indices])]
+
+    top = df.iloc[indices].copy()
+    top["z_categoria"] = z_fila[indices]
+    top["z_categoria_mes"] = base["z_mes"][indices]
+    top["mediana_categoria"] = base["mediana"][base["grupo"][indices]]
+    if usar_isolation:
+        top["puntaje_isolation"] = puntaje[indices]
+
+    conteo = np.bincount(base["grupo"], weights=atipica, minlength=len(grupos))
+    por_categoria = grupos.assign(atipicas=conteo.astype(np.int64))[["tipo", "categoria", "atipicas", "z_max"]]
+    por_categoria = por_categoria[por_categoria["atipicas"] > 0].sort_values("atipicas", ascending=False)
+
+    meses = base["meses"]
+    meses = meses.iloc[np.argsort(-np.abs(meses["z_mes"].to_numpy()))[:k]].copy()
+    meses.insert(0, "mes", [f"{m // 12:04d}-{m % 12 + 1:02d}" for m in meses.pop("mes_id").astype(np.int64)])
+
+    return {
+        "ok": True,
+        "mensaje": "",
+        "metodo": metodo,
+        "filas": int(len(z_fila)),
+        "atipicas": int(atipica.sum()),
+        "top": top,
+        "categorias": por_categoria.reset_index(drop=True),
+        "todas_categorias": sorted(grupos["categoria"].dropna().astype(str).unique()),
+        "meses": meses.reset_index(drop=True),
+    }
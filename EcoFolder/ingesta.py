@@ -0,0 +1,237 @@
+# ingesta.py
+"""
+Lectura unificada de archivos del ledger.
+- Formatos: Excel (.xlsx), CSV (motor pyarrow si está instalado), Parquet y Feather/Arrow
+- Proyecta sólo las columnas que usa la app (fecha, tipo, categoria, monto, concepto)
+  antes de leer el cuerpo del archivo
+- Devuelve el DataFrame crudo; la normalización sigue en utils.procesar_dataframe
+- Para ledgers más grandes que la memoria, itera CSV/Parquet por lotes ya normalizados
+- Compacta el ledger normalizado (categóricas, clave de mes entera, float32 opcional)
+"""
+
+import io
+import os
+import unicodedata
+from typing import BinaryIO, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+COLUMNAS_LEDGER = ["fecha", "tipo", "categoria", "monto", "concepto"]
+COLUMNAS_REQUERIDAS = ["fecha", "tipo", "categoria", "monto"]
+TAMANO_LOTE = 250_000  # filas por lote en la ingesta por lotes
+
+# Representación compacta del ledger normalizado
+COLUMNAS_CATEGORICAS = ["tipo", "categoria", "concepto"]
+MONTO_FLOAT32 = os.getenv("FINMIND_MONTO_FLOAT32", "0") == "1"
+TOLERANCIA_MONTO = float(os.getenv("FINMIND_TOLERANCIA_MONTO", "0.005"))  # error absoluto máx. por fila
+
+FORMATOS_POR_LOTES = {"csv", "parquet"}
+
+FORMATOS = {
+    ".xlsx": "excel",
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+}
+EXTENSIONES_SOPORTADAS = sorted({ext.lstrip(".") for ext in FORMATOS})
+
+
+def limpiar_texto(texto):
+    if not isinstance(texto, str):
+        return texto
+    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('utf-8')
+    return texto.strip().lower()
+
+
+def formato_de(nombre: str) -> str:
+    ext = os.path.splitext(nombre or "")[1].lower()
+    if ext not in FORMATOS:
+        raise ValueError(f"Formato no soportado: '{ext or nombre}'. Usa: {', '.join(EXTENSIONES_SOPORTADAS)}")
+    return FORMATOS[ext]
+
+
+def _pyarrow_disponible() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _proyeccion(columnas: List[str]) -> List[str]:
+    """Columnas originales cuyo nombre normalizado pertenece al ledger."""
+    return [c for c in columnas if limpiar_texto(str(c)) in COLUMNAS_LEDGER]
+
+
+def _columnas_archivo(formato: str, contenido: bytes) -> Optional[List[str]]:
+    """Lee sólo el encabezado/esquema del archivo; None si no se puede sin leerlo completo."""
+    try:
+        if formato == "csv":
+            return list(pd.read_csv(io.BytesIO(contenido), nrows=0).columns)
+        if formato == "parquet":
+            import pyarrow.parquet as pq
+            return list(pq.read_schema(io.BytesIO(contenido)).names)
+        if formato == "feather":
+            import pyarrow.ipc as ipc
+            return list(ipc.open_file(io.BytesIO(contenido)).schema.names)
+    except Exception:
+        return None
+    return None
+
+
+def leer_archivo(nombre: str, contenido: bytes, proyectar: bool = True) -> pd.DataFrame:
+    """
+    Lee el archivo según su extensión. Con 'proyectar' sólo carga las columnas del ledger
+    (si ninguna coincide se lee todo para que procesar_dataframe pueda reportar las faltantes).
+    """
+    formato = formato_de(nombre)
+    buffer = io.BytesIO(contenido)
+
+    if formato == "excel":
+        usecols = (lambda c: limpiar_texto(str(c)) in COLUMNAS_LEDGER) if proyectar else None
+        df = pd.read_excel(buffer, usecols=usecols)
+        if proyectar and df.columns.empty:
+            df = pd.read_excel(io.BytesIO(contenido))
+        return df
+
+    columnas = None
+    if proyectar:
+        columnas = _proyeccion(_columnas_archivo(formato, contenido) or []) or None
+
+    if formato == "csv":
+        motor = "pyarrow" if _pyarrow_disponible() else "c"
+        return pd.read_csv(buffer, usecols=columnas, engine=motor)
+    if formato == "parquet":
+        return pd.read_parquet(buffer, columns=columnas)
+    return pd.read_feather(buffer, columns=columnas)
+
+
+# -------------------------
+# Normalización
+# -------------------------
+def normalizar_ledger(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reglas de limpieza del ledger (mismas para archivo completo o por lotes).
+    Espera nombres de columnas ya pasados por limpiar_texto y las columnas requeridas presentes.
+    """
+    df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce")
+    df["monto"] = pd.to_numeric(df["monto"], errors="coerce")
+    df["tipo"] = df["tipo"].astype(str).str.lower().str.strip()
+    df["categoria"] = df["categoria"].astype(str).str.lower().str.strip()
+    df["concepto"] = df.get("concepto", "Sin concepto")
+
+    df = df.dropna(subset=["fecha", "monto"])
+    return df
+
+
+def compactar_ledger(df: pd.DataFrame, float32: bool = None, tolerancia: float = None) -> pd.DataFrame:
+    """
+    Representación compacta del ledger ya normalizado:
+    - tipo/categoria/concepto como categóricas
+    - 'mes_id' (año*12 + mes-1) precalculado una sola vez
+    - monto en float32 si se pide y el error absoluto máximo queda dentro de la tolerancia
+    """
+    float32 = MONTO_FLOAT32 if float32 is None else float32
+    tolerancia = TOLERANCIA_MONTO if tolerancia is None else tolerancia
+
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    df["mes_id"] = (df["fecha"].dt.year * 12 + df["fecha"].dt.month - 1).astype(np.int32)
+
+    if float32 and df["monto"].dtype == np.float64 and len(df):
+        monto32 = df["monto"].astype(np.float32)
+        error = float(np.abs(monto32.to_numpy(dtype=np.float64) - df["monto"].to_numpy()).max())
+        if error <= tolerancia:
+            df["monto"] = monto32
+    return df
+
+
+def reporte_memoria(uso_antes: pd.Series, despues: pd.DataFrame) -> pd.DataFrame:
+    """
+    MB por columna antes y después de compactar.
+    'uso_antes' es df.memory_usage(deep=True, index=False) tomado antes de compactar.
+    """
+    uso_despues = despues.memory_usage(deep=True, index=False)
+    reporte = pd.DataFrame({"antes_mb": uso_antes, "despues_mb": uso_despues}).fillna(0.0) / (1024 * 1024)
+    reporte.loc["TOTAL"] = reporte.sum()
+    reporte["ahorro_%"] = np.where(
+        reporte["antes_mb"] > 0, (1 - reporte["despues_mb"] / reporte["antes_mb"]) * 100, 0.0
+    )
+    return reporte.round(3)
+
+
+# -------------------------
+# Lectura por lotes
+# -------------------------
+def clave_mes(mes: str) -> int:
+    """'YYYY-MM' -> año*12 + mes-1 (misma clave entera que usa ledger.cubo_mensual)."""
+    anio, num_mes = (int(p) for p in mes.split("-"))
+    return anio * 12 + num_mes - 1
+
+
+def _abrir(fuente: Union[bytes, str, "os.PathLike", BinaryIO]):
+    if isinstance(fuente, (bytes, bytearray)):
+        return io.BytesIO(fuente)
+    if hasattr(fuente, "read"):
+        # archivo abierto (p. ej. el UploadedFile de Streamlit): se relee desde el inicio sin copiarlo
+        fuente.seek(0)
+    return fuente
+
+
+def iterar_lotes(nombre: str, fuente, tamano_lote: int = TAMANO_LOTE) -> Iterator[pd.DataFrame]:
+    """
+    Itera el archivo en lotes de 'tamano_lote' filas, cada uno proyectado y normalizado.
+    'fuente' puede ser el contenido en bytes, una ruta o un archivo abierto en modo binario.
+    Sólo CSV y Parquet.
+    """
+    formato = formato_de(nombre)
+    if formato not in FORMATOS_POR_LOTES:
+        raise ValueError("La ingesta por lotes sólo está disponible para archivos CSV y Parquet.")
+
+    if formato == "csv":
+        encabezado = list(pd.read_csv(_abrir(fuente), nrows=0).columns)
+        lotes = pd.read_csv(_abrir(fuente), usecols=_proyeccion(encabezado) or None, chunksize=tamano_lote)
+    else:
+        import pyarrow.parquet as pq
+        archivo = pq.ParquetFile(_abrir(fuente))
+        columnas = _proyeccion(archivo.schema_arrow.names) or None
+        lotes = (b.to_pandas() for b in archivo.iter_batches(batch_size=tamano_lote, columns=columnas))
+
+    for lote in lotes:
+        lote.columns = [limpiar_texto(c) for c in lote.columns]
+        faltantes = [c for c in COLUMNAS_REQUERIDAS if c not in lote.columns]
+        if faltantes:
+            raise ValueError(f"Faltan columnas requeridas: {', '.join(faltantes)}")
+        yield normalizar_ledger(lote)
+
+
+def filtrar_por_lotes(nombre: str, fuente, mes: str = None, categoria: str = None, tipo: str = None,
+                      limite: int = 5_000, tamano_lote: int = TAMANO_LOTE) -> pd.DataFrame:
+    """
+    Recorre el archivo por lotes y devuelve hasta 'limite' filas crudas (normalizadas)
+    del mes 'YYYY-MM', categoria y tipo pedidos. Sirve para el drill-down sin cargar todo el ledger.
+    """
+    clave = clave_mes(mes) if mes is not None else None
+    encontrados: List[pd.DataFrame] = []
+    total = 0
+    for lote in iterar_lotes(nombre, fuente, tamano_lote):
+        mascara = pd.Series(True, index=lote.index)
+        if clave is not None:
+            mascara &= (lote["fecha"].dt.year * 12 + lote["fecha"].dt.month - 1) == clave
+        if categoria is not None:
+            mascara &= lote["categoria"] == categoria
+        if tipo is not None:
+            mascara &= lote["tipo"] == tipo
+        sub = lote[mascara]
+        if not sub.empty:
+            encontrados.append(sub.head(limite - total))
+            total += len(encontrados[-1])
+            if total >= limite:
+                break
+    if not encontrados:
+        return pd.DataFrame(columns=COLUMNAS_LEDGER)
+    return pd.concat(encontrados, ignore_index=True)
@@ -1,4 +1,5 @@
 import streamlit as st
+from assets import aplicar_estilos
 
 # -----------------------------------------------------
 # CONFIGURACIÓN DE PÁGINA
@@ -14,114 +15,8 @@ st.set_page_config(
 # FUNCIÓN PARA MOSTRAR LANDING PAGE
 # -----------------------------------------------------
 def mostrar_landing():
-    # ----- estilos personalizados -----
-    st.markdown("""
-    <style>
-        /* ---- Ocultar header y ajustar padding ---- */
-    header {visibility: hidden;}
-    [data-testid="stToolbar"] {display: none !important;}
-    [data-testid="stHeader"] {display: none !important;}
-    [data-testid="stDecoration"] {display: none !important;}
-    [data-testid="stStatusWidget"] {display: none !important;}
-    [data-testid="stAppViewContainer"] > .main {
-        padding-top: 0rem;
-        padding-bottom: 0rem;
-    }
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600;700;900&display=swap');
-        * { font-family: 'Inter', sans-serif; }
-
-        [data-testid="stAppViewContainer"] {
-            background: linear-gradient(135deg, #0E1E40 0%, #1A2847 50%, #D71921 100%);
-            color: white;
-        }
-
-        .main-title {
-            font-size: 5rem;
-            font-weight: 900;
-            text-align: center;
-            background: linear-gradient(135deg, #FFFFFF 0%, #FFD700 50%, #FF4757 100%);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            margin-bottom: 1rem;
-        }
-
-        .subtitle {
-            font-size: 1.8rem;
-            text-align: center;
-            color: #E9ECEF;
-            font-weight: 300;
-            margin-bottom: 3rem;
-        }
-
-        .feature-card {
-            background: rgba(255, 255, 255, 0.1);
-            backdrop-filter: blur(10px);
-            border-radius: 24px;
-            padding: 2rem;
-            border: 2px solid rgba(255, 255, 255, 0.2);
-            transition: all 0.4s ease;
-            height: 100%;
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-            justify-content: center;
-        }
-
-        .feature-card:hover {
-            background: rgba(255, 255, 255, 0.15);
-            border-color: #D71921;
-            transform: translateY(-10px) scale(1.02);
-            box-shadow: 0 20px 40px rgba(215, 25, 33, 0.3);
-        }
-
-        .feature-icon {
-            font-size: 4rem;
-            margin-bottom: 1rem;
-            text-align: center;
-            color: #FFD700;
-        }
-
-        .feature-title {
-            font-size: 1.5rem;
-            font-weight: 700;
-            color: white;
-            margin-bottom: 0.5rem;
-            text-align: center;
-        }
-
-        .feature-description {
-            font-size: 1rem;
-            color: #CED4DA;
-            text-align: center;
-        }
-
-        .stButton>button {
-            background: linear-gradient(135deg, #D71921 0%, #FF4757 100%);
-            color: white;
-            padding: 1.5rem 4rem;
-            font-size: 1.5rem;
-            font-weight: 700;
-            border-radius: 50px;
-            border: none;
-            box-shadow: 0 10px 30px rgba(215, 25, 33, 0.5);
-            transition: all 0.3s ease;
-            display: block;
-            margin: 0 auto;
-        }
-
-        .stButton>button:hover {
-            transform: translateY(-5px) scale(1.05);
-            box-shadow: 0 15px 40px rgba(215, 25, 33, 0.7);
-        }
-
-        footer { visibility: hidden; }
-    </style>
-    """, unsafe_allow_html=True)
-
-    # Importar librería Bootstrap Icons
-    st.markdown("""
-    <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.css">
-    """, unsafe_allow_html=True)
+    # ----- estilos personalizados (static/landing.css, fuentes e íconos incluidos) -----
+    aplicar_estilos("landing")
 
     # -----------------------------------------------------
     # CONTENIDO
@@ -0,0 +1,241 @@
+# ledger.py
+"""
+Capa compartida de agregación mensual del ledger.
+- Construye una sola vez por dataset el "cubo" mes x tipo x categoria (suma y conteo)
+- Memoiza el cubo (y cualquier derivado) por objeto DataFrame cargado
+- Pliega ledgers leídos por lotes directamente en agregados (memoria acotada)
+- Expone vistas listas para usar: serie mensual de ingresos/gastos/flujo,
+  matriz mes x categoria y totales por categoria
+
+Las vistas (health, optimizer, decision_ai, utils) deben leer de aquí en lugar de
+repetir el pipeline fecha -> mes -> groupby -> reindex sobre las filas crudas.
+Se asume que el DataFrame no se modifica en sitio después de cargarlo.
+"""
+
+import threading
+import weakref
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+COLUMNAS_CUBO = ["mes", "tipo", "categoria", "monto", "n"]
+PERIODOS = ("mes", "trimestre", "anio")
+
+# id(df) -> (weakref al df, {clave: valor memoizado})
+_MEMO_DATASETS: Dict[int, Tuple[weakref.ref, Dict[str, Any]]] = {}
+_LOCK = threading.Lock()
+
+
+# -------------------------
+# Memo por dataset
+# -------------------------
+def _liberar(clave: int, ref: weakref.ref) -> None:
+    with _LOCK:
+        entrada = _MEMO_DATASETS.get(clave)
+        if entrada is not None and entrada[0] is ref:
+            del _MEMO_DATASETS[clave]
+
+
+def _memo_de(df: pd.DataFrame) -> Dict[str, Any]:
+    clave = id(df)
+    with _LOCK:
+        entrada = _MEMO_DATASETS.get(clave)
+        if entrada is not None and entrada[0]() is df:
+            return entrada[1]
+        ref = weakref.ref(df, lambda r, k=clave: _liberar(k, r))
+        memo: Dict[str, Any] = {}
+        _MEMO_DATASETS[clave] = (ref, memo)
+        return memo
+
+
+def memo_dataset(df: pd.DataFrame, clave: str, fn: Callable[[pd.DataFrame], Any]) -> Any:
+    """
+    Devuelve fn(df) memoizado para este objeto DataFrame.
+    La entrada se libera automáticamente cuando el DataFrame deja de existir.
+    """
+    memo = _memo_de(df)
+    if clave not in memo:
+        memo[clave] = fn(df)
+    return memo[clave]
+
+
+# -------------------------
+# Construcción del cubo
+# -------------------------
+def buscar_columna(df: pd.DataFrame, nombre: str):
+    """Busca una columna ignorando mayúsculas/espacios sin copiar el DataFrame."""
+    for col in df.columns:
+        if str(col).strip().lower() == nombre:
+            return df[col]
+    return None
+
+
+def _etiquetas_mes(claves: np.ndarray) -> np.ndarray:
+    """Convierte claves enteras (año*12 + mes-1) en etiquetas 'YYYY-MM'."""
+    claves = np.asarray(claves, dtype=np.int64)
+    return np.array([f"{k // 12:04d}-{k % 12 + 1:02d}" for k in claves], dtype=object)
+
+
+def _construir_cubo(df: pd.DataFrame) -> pd.DataFrame:
+    fecha = buscar_columna(df, "fecha")
+    tipo = buscar_columna(df, "tipo")
+    monto = buscar_columna(df, "monto")
+    if df is None or df.empty or fecha is None or tipo is None or monto is None:
+        return pd.DataFrame(columns=COLUMNAS_CUBO)
+
+    mes_id = buscar_columna(df, "mes_id")
+    if mes_id is None:
+        fecha = fecha if pd.api.types.is_datetime64_any_dtype(fecha) else pd.to_datetime(fecha, errors="coerce")
+        mes_id = fecha.dt.year * 12 + fecha.dt.month - 1
+    monto = pd.to_numeric(monto, errors="coerce").astype(np.float64)
+    categoria = buscar_columna(df, "categoria")
+    # filas ya agregadas (p. ej. ingesta por lotes) traen su propio conteo en 'n'
+    conteo = buscar_columna(df, "n")
+
+    if not isinstance(tipo.dtype, pd.CategoricalDtype):
+        # las categóricas vienen de ingesta.compactar_ledger, ya normalizadas
+        tipo = tipo.astype(str).str.lower().str.strip()
+
+    base = pd.DataFrame({
+        "mes_id": mes_id,
+        "tipo": tipo,
+        "categoria": categoria if categoria is not None else np.nan,
+        "monto": monto,
+        "n": conteo if conteo is not None else 1,
+    }).dropna(subset=["mes_id", "monto"])
+    if base.empty:
+        return pd.DataFrame(columns=COLUMNAS_CUBO)
+
+    cubo = (
+        base.groupby(["mes_id", "tipo", "categoria"], dropna=False, observed=True, sort=True)[["monto", "n"]]
+        .sum()
+        .reset_index()
+    )
+    cubo["n"] = cubo["n"].astype(np.int64)
+    # el cubo es pequeño: sin categóricas para no arrastrar categorías no observadas a las vistas
+    cubo["tipo"] = cubo["tipo"].astype(object)
+    cubo["categoria"] = cubo["categoria"].astype(object)
+    cubo.insert(0, "mes", _etiquetas_mes(cubo.pop("mes_id").to_numpy()))
+    return cubo[COLUMNAS_CUBO]
+
+
+def cubo_mensual(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cubo mes x tipo x categoria con columnas [mes, tipo, categoria, monto, n].
+    'mes' es 'YYYY-MM', 'tipo' viene normalizado en minúsculas y 'n' es el número de transacciones.
+    Se calcula una única vez por dataset.
+    """
+    if df is None:
+        return pd.DataFrame(columns=COLUMNAS_CUBO)
+    return memo_dataset(df, "cubo_mensual", _construir_cubo)
+
+
+# -------------------------
+# Ingesta por lotes
+# -------------------------
+def _agregar_lote(lote: pd.DataFrame) -> pd.DataFrame:
+    mes_id = lote["fecha"].dt.year * 12 + lote["fecha"].dt.month - 1
+    return (
+        pd.DataFrame({"mes_id": mes_id, "tipo": lote["tipo"], "categoria": lote["categoria"], "monto": lote["monto"]})
+        .groupby(["mes_id", "tipo", "categoria"], dropna=False, sort=False)["monto"]
+        .agg(monto="sum", n="count")
+    )
+
+
+def ledger_agregado(lotes: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Pliega lotes ya normalizados (ingesta.iterar_lotes) en un ledger colapsado:
+    una fila por mes x tipo x categoria con fecha = primer día del mes, monto sumado
+    y 'n' = número de transacciones. El acumulado sólo crece con meses x categorías,
+    no con filas, y todas las vistas basadas en sumas (KPIs, dashboard, salud,
+    optimizador) dan el mismo resultado que sobre el ledger completo.
+    """
+    acumulado = None
+    for lote in lotes:
+        if lote.empty:
+            continue
+        parcial = _agregar_lote(lote)
+        acumulado = parcial if acumulado is None else (
+            pd.concat([acumulado, parcial]).groupby(level=[0, 1, 2], dropna=False, sort=False).sum()
+        )
+
+    if acumulado is None:
+        return pd.DataFrame(columns=["fecha", "tipo", "categoria", "monto", "concepto", "n", "mes_id"])
+
+    agregado = acumulado.sort_index().reset_index()
+    mes_id = agregado["mes_id"].astype(np.int64)
+    agregado["fecha"] = pd.to_datetime({"year": mes_id // 12, "month": mes_id % 12 + 1, "day": 1})
+    agregado["concepto"] = "Agregado mensual"
+    agregado["n"] = agregado["n"].astype(np.int64)
+    agregado["mes_id"] = mes_id
+    agregado = agregado[["fecha", "tipo", "categoria", "monto", "concepto", "n", "mes_id"]]
+    agregado.attrs["agregado"] = True
+    return agregado
+
+
+# -------------------------
+# Vistas derivadas
+# -------------------------
+def _serie_mensual(df: pd.DataFrame) -> pd.DataFrame:
+    cubo = cubo_mensual(df)
+    # otros tipos (p. ej. 'transferencia') no aportan meses: sólo cuentan ingresos y gastos
+    cubo = cubo[cubo["tipo"].isin(["ingreso", "gasto"])]
+    por_tipo = cubo.groupby(["mes", "tipo"])["monto"].sum().unstack(fill_value=0.0)
+    meses = sorted(por_tipo.index)
+    resumen = pd.DataFrame(index=pd.Index(meses, name="mes"))
+    for tipo in ("ingreso", "gasto"):
+        resumen[tipo] = por_tipo[tipo].reindex(meses, fill_value=0.0).astype(float) if tipo in por_tipo else 0.0
+    resumen["flujo"] = resumen["ingreso"] - resumen["gasto"]
+    return resumen
+
+
+def serie_mensual(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ingresos, gastos y flujo por mes (índice 'YYYY-MM' ordenado, meses con algún ingreso o gasto).
+    """
+    return memo_dataset(df, "serie_mensual", _serie_mensual)
+
+
+def serie_periodica(df: pd.DataFrame, periodo: str = "mes") -> pd.DataFrame:
+    """
+    serie_mensual re-agregada por 'mes', 'trimestre' ('YYYY-T1') o 'anio' ('YYYY').
+    Sirve para graficar rangos largos con menos puntos.
+    """
+    if periodo == "mes":
+        return serie_mensual(df)
+    if periodo not in PERIODOS:
+        raise ValueError(f"Periodo no soportado: '{periodo}'. Usa: {', '.join(PERIODOS)}")
+
+    def _construir(d: pd.DataFrame) -> pd.DataFrame:
+        serie = serie_mensual(d)
+        anio = serie.index.str[:4]
+        if periodo == "trimestre":
+            trimestre = (serie.index.str[5:7].astype(int) - 1) // 3 + 1
+            etiquetas = anio + "-T" + trimestre.astype(str)
+        else:
+            etiquetas = anio
+        return serie.groupby(np.asarray(etiquetas)).sum().rename_axis(periodo)
+    return memo_dataset(df, f"serie_periodica:{periodo}", _construir)
+
+
+def matriz_categorias(df: pd.DataFrame, tipo: str = "gasto") -> pd.DataFrame:
+    """Matriz mes x categoria con la suma de montos del tipo indicado (sólo meses con ese tipo)."""
+    def _construir(d: pd.DataFrame) -> pd.DataFrame:
+        cubo = cubo_mensual(d)
+        sub = cubo[cubo["tipo"] == tipo]
+        return sub.pivot_table(index="mes", columns="categoria", values="monto", aggfunc="sum", fill_value=0.0)
+    return memo_dataset(df, f"matriz_categorias:{tipo}", _construir)
+
+
+def totales_por_categoria(df: pd.DataFrame, tipo: str = None) -> pd.Series:
+    """
+    Total por categoria. Con 'tipo' devuelve Serie indexada por categoria;
+    sin él, Serie con MultiIndex (tipo, categoria).
+    """
+    def _construir(d: pd.DataFrame) -> pd.Series:
+        cubo = cubo_mensual(d)
+        if tipo is None:
+            return cubo.groupby(["tipo", "categoria"], dropna=False)["monto"].sum()
+        return cubo[cubo["tipo"] == tipo].groupby("categoria")["monto"].sum()
+    return memo_dataset(df, f"totales_por_categoria:{tipo}", _construir)
@@ -0,0 +1,237 @@
+# llm_cache.py
+"""
+Caché persistente de respuestas de la IA, compartida entre procesos.
+- La clave es el SHA-256 del modelo, la configuración de generación y el prompt final
+- Backends intercambiables: SQLite (por defecto, en disco), memoria o ninguno
+- Expulsión LRU por tamaño total y caducidad por TTL
+- Contadores de hits/misses para ver su efecto
+
+Con SQLite en un volumen compartido, varias réplicas de la app reutilizan las mismas respuestas.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator, Optional
+
+BACKEND = os.getenv("FINMIND_LLM_CACHE", "sqlite")  # sqlite | memoria | ninguno
+# junto al módulo por defecto: no depende del directorio desde el que se lanza streamlit
+RUTA_SQLITE = os.getenv("FINMIND_LLM_CACHE_RUTA",
+                        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "llm_respuestas.sqlite"))
+PRESUPUESTO_MB = float(os.getenv("FINMIND_LLM_CACHE_MB", "64"))
+TTL_S = float(os.getenv("FINMIND_LLM_CACHE_TTL_S", str(60 * 60 * 24)))
+
+_STATS = {"hits": 0, "misses": 0, "escrituras": 0, "expulsiones": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def clave_prompt(prompt: str, modelo: str = "", config: Optional[Dict] = None) -> str:
+    """
+    Hash del prompt junto con el modelo y la configuración de generación: la misma pregunta
+    con otro modelo o con otro max_output_tokens no comparte respuesta.
+    """
+    firma = json.dumps({"modelo": modelo, "config": config or {}}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{firma}\x1f{prompt}".encode("utf-8")).hexdigest()
+
+
+def _contar(evento: str, n: int = 1) -> None:
+    with _STATS_LOCK:
+        _STATS[evento] += n
+
+
+# -------------------------
+# Backends
+# -------------------------
+class CacheMemoria:
+    """LRU en memoria del proceso (no sobrevive reinicios)."""
+
+    def __init__(self, presupuesto_mb: float = PRESUPUESTO_MB, ttl_s: float = TTL_S):
+        self.presupuesto = presupuesto_mb * 1024 * 1024
+        self.ttl_s = ttl_s
+        self._datos: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str) -> Optional[str]:
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            if time.time() - entrada[0] > self.ttl_s:
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return entrada[1]
+
+    def guardar(self, clave: str, texto: str) -> int:
+        with self._lock:
+            self._datos.pop(clave, None)
+            self._datos[clave] = (time.time(), texto)
+            usado = sum(len(t.encode("utf-8")) for _, t in self._datos.values())
+            expulsadas = 0
+            while usado > self.presupuesto and len(self._datos) > 1:
+                _, (_, t) = self._datos.popitem(last=False)
+                usado -= len(t.encode("utf-8"))
+                expulsadas += 1
+            return expulsadas
+
+    def resumen(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "entradas": len(self._datos),
+                "tamano_mb": sum(len(t.encode("utf-8")) for _, t in self._datos.values()) / (1024 * 1024),
+            }
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+
+class CacheSQLite:
+    """
+    LRU en un archivo SQLite (modo WAL para lectores/escritores concurrentes de varios procesos).
+    Cada operación abre su propia conexión, así que es seguro entre hilos.
+    """
+
+    def __init__(self, ruta: str = RUTA_SQLITE, presupuesto_mb: float = PRESUPUESTO_MB, ttl_s: float = TTL_S):
+        self.ruta = ruta
+        self.presupuesto = int(presupuesto_mb * 1024 * 1024)
+        self.ttl_s = ttl_s
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        with self._conectar() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS respuestas ("
+                " clave TEXT PRIMARY KEY, texto TEXT NOT NULL, creado REAL NOT NULL,"
+                " accedido REAL NOT NULL, tamano INTEGER NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_accedido ON respuestas (accedido)")
+
+    @contextmanager
+    def _conectar(self) -> Iterator[sqlite3.Connection]:
+        con = sqlite3.connect(self.ruta, timeout=10)
+        try:
+            with con:  # commit/rollback de la transacción
+                yield con
+        finally:
+            con.close()
+
+    def obtener(self, clave: str) -> Optional[str]:
+        ahora = time.time()
+        with self._conectar() as con:
+            fila = con.execute("SELECT texto, creado FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                return None
+            if ahora - fila[1] > self.ttl_s:
+                con.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                return None
+            con.execute("UPDATE respuestas SET accedido = ? WHERE clave = ?", (ahora, clave))
+            return fila[0]
+
+    def guardar(self, clave: str, texto: str) -> int:
+        ahora = time.time()
+        tamano = len(texto.encode("utf-8"))
+        with self._conectar() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, texto, creado, accedido, tamano) VALUES (?, ?, ?, ?, ?)",
+                (clave, texto, ahora, ahora, tamano),
+            )
+            usado = con.execute("SELECT COALESCE(SUM(tamano), 0) FROM respuestas").fetchone()[0]
+            expulsadas = 0
+            if usado > self.presupuesto:
+                # borra las menos usadas (nunca la recién escrita) hasta volver al presupuesto
+                for clave_vieja, t in con.execute(
+                    "SELECT clave, tamano FROM respuestas WHERE clave != ? ORDER BY accedido", (clave,)
+                ).fetchall():
+                    if usado <= self.presupuesto:
+                        break
+                    con.execute("DELETE FROM respuestas WHERE clave = ?", (clave_vieja,))
+                    usado -= t
+                    expulsadas += 1
+            return expulsadas
+
+    def resumen(self) -> Dict[str, float]:
+        with self._conectar() as con:
+            entradas, tamano = con.execute("SELECT COUNT(*), COALESCE(SUM(tamano), 0) FROM respuestas").fetchone()
+        return {"entradas": entradas, "tamano_mb": tamano / (1024 * 1024), "ruta": self.ruta}
+
+    def limpiar(self) -> None:
+        with self._conectar() as con:
+            con.execute("DELETE FROM respuestas")
+
+
+class SinCache:
+    def obtener(self, clave: str) -> Optional[str]:
+        return None
+
+    def guardar(self, clave: str, texto: str) -> int:
+        return 0
+
+    def resumen(self) -> Dict[str, float]:
+        return {"entradas": 0, "tamano_mb": 0.0}
+
+    def limpiar(self) -> None:
+        pass
+
+
+@lru_cache(maxsize=None)
+def obtener_backend(nombre: str = BACKEND):
+    """Backend compartido por el proceso; si el archivo SQLite no es utilizable cae a memoria."""
+    if nombre == "ninguno":
+        return SinCache()
+    if nombre == "memoria":
+        return CacheMemoria()
+    try:
+        return CacheSQLite()
+    except (sqlite3.Error, OSError):
+        return CacheMemoria()
+
+
+# -------------------------
+# API
+# -------------------------
+def obtener(clave: str, contar: bool = True) -> Optional[str]:
+    """'contar=False' para búsquedas de segundo nivel (cache_semantico), que no son consultas nuevas."""
+    try:
+        texto = obtener_backend().obtener(clave)
+    except sqlite3.Error:
+        texto = None
+    if contar:
+        _contar("hits" if texto is not None else "misses")
+    return texto
+
+
+def guardar(clave: str, texto: str) -> None:
+    if not texto:
+        return
+    try:
+        expulsadas = obtener_backend().guardar(clave, texto)
+    except sqlite3.Error:
+        return
+    _contar("escrituras")
+    _contar("expulsiones", expulsadas)
+
+
+def estadisticas() -> Dict[str, float]:
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+    consultas = stats["hits"] + stats["misses"]
+    stats["tasa_hits"] = stats["hits"] / consultas if consultas else 0.0
+    stats["backend"] = BACKEND
+    stats["presupuesto_mb"] = PRESUPUESTO_MB
+    try:
+        stats.update(obtener_backend().resumen())
+    except sqlite3.Error:
+        pass
+    return stats
+
+
+def limpiar() -> None:
+    obtener_backend().limpiar()
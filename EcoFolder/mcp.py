@@ -1,16 +1,110 @@
 # Se implementa el MCP para análisis financiero y simulación de escenarios
 
+import numpy as np
 import pandas as pd
+from ingesta import limpiar_texto
+from ledger import buscar_columna, memo_dataset
 
-def analizar_finanzas(df: pd.DataFrame) -> dict:
-    ingresos = df.loc[df["tipo"] == "ingreso", "monto"].sum()
-    gastos = df.loc[df["tipo"] == "gasto", "monto"].sum()
+# Claves del dict de variaciones que aplican a todo un tipo
+_ALIAS_TIPO = {"ingreso": "ingreso", "ingresos": "ingreso", "gasto": "gasto", "gastos": "gasto"}
+
+
+def _kpis(ingresos: float, gastos: float) -> dict:
     flujo = ingresos - gastos
     ahorro = (flujo / ingresos) if ingresos > 0 else 0
     return {"ingresos": ingresos, "gastos": gastos, "flujo": flujo, "ahorro": ahorro}
 
-def simular_escenario(df: pd.DataFrame, var_ing: float, var_gas: float) -> dict:
-    df_sim = df.copy()
-    df_sim.loc[df_sim["tipo"] == "ingreso", "monto"] *= (1 + var_ing)
-    df_sim.loc[df_sim["tipo"] == "gasto", "monto"] *= (1 + var_gas)
-    return analizar_finanzas(df_sim)
+
+def _totales_ledger(df: pd.DataFrame) -> pd.Series:
+    """
+    Total de monto por (tipo, categoria) sobre el ledger mismo, no sobre el cubo mensual:
+    las filas sin fecha válida (o los datasets sin columna fecha) también cuentan.
+    """
+    tipo, monto = buscar_columna(df, "tipo"), buscar_columna(df, "monto")
+    if tipo is None or monto is None:
+        return pd.Series(dtype=float, index=pd.MultiIndex.from_arrays([[], []], names=["tipo", "categoria"]))
+    categoria = buscar_columna(df, "categoria")
+    if categoria is None:
+        categoria = pd.Series("", index=df.index)
+    monto = pd.to_numeric(monto, errors="coerce")
+    return monto.groupby([tipo.rename("tipo"), categoria.rename("categoria")], dropna=False, observed=True).sum()
+
+
+def _base_simulacion(df: pd.DataFrame) -> dict:
+    """Totales base por (tipo, categoria) precalculados una vez por dataset."""
+    totales = _totales_ledger(df)
+    tipos = np.asarray(totales.index.get_level_values(0), dtype=object)
+    categorias = np.array([limpiar_texto(str(c)) for c in totales.index.get_level_values(1)], dtype=object)
+    montos = totales.to_numpy(dtype=float)
+    es_ingreso = tipos == "ingreso"
+    es_gasto = tipos == "gasto"
+    return {
+        "categorias": categorias,
+        "montos": montos,
+        "es_ingreso": es_ingreso,
+        "es_gasto": es_gasto,
+        "ingresos": float(montos[es_ingreso].sum()),
+        "gastos": float(montos[es_gasto].sum()),
+    }
+
+
+def _base(df: pd.DataFrame) -> dict:
+    return memo_dataset(df, "base_simulacion", _base_simulacion)
+
+
+def analizar_finanzas(df: pd.DataFrame) -> dict:
+    base = _base(df)
+    return _kpis(base["ingresos"], base["gastos"])
+
+
+def simular_escenario(df: pd.DataFrame, var_ing, var_gas: float = 0.0) -> dict:
+    """
+    Escenario what-if sobre los totales base, sin copiar el ledger.
+    - var_ing float: variación de todos los ingresos; var_gas: variación de todos los gastos
+    - var_ing dict: variación por categoria (p. ej. {"Ingresos": 0.1, "Alimentación": -0.2});
+      las claves "ingreso(s)"/"gasto(s)" aplican a todo el tipo y la categoria tiene prioridad.
+    """
+    base = _base(df)
+    if not isinstance(var_ing, dict):
+        return _kpis(base["ingresos"] * (1 + var_ing), base["gastos"] * (1 + var_gas))
+
+    variaciones = {limpiar_texto(str(k)): float(v) for k, v in var_ing.items()}
+    factor = np.where(base["es_gasto"], 1.0 + var_gas, 1.0)
+    for clave, tipo in _ALIAS_TIPO.items():
+        if clave in variaciones:
+            factor = np.where(base["es_" + tipo], 1.0 + variaciones[clave], factor)
+    for categoria, variacion in variaciones.items():
+        factor = np.where(base["categorias"] == categoria, 1.0 + variacion, factor)
+
+    ajustados = base["montos"] * factor
+    return _kpis(float(ajustados[base["es_ingreso"]].sum()), float(ajustados[base["es_gasto"]].sum()))
+
+
+def superficie_sensibilidad(df: pd.DataFrame, var_ing=None, var_gas=None) -> dict:
+    """
+    Evalúa toda la rejilla var_ing x var_gas en una sola pasada vectorizada.
+    Por defecto: ingresos -50%..+100% y gastos -50%..+50% en pasos de 1%.
+    Devuelve las matrices de flujo y ahorro (filas = var_ing, columnas = var_gas)
+    y la curva de equilibrio: la variación de gastos que deja el flujo en 0 para cada var_ing.
+    """
+    var_ing = np.round(np.arange(-0.50, 1.0001, 0.01), 4) if var_ing is None else np.asarray(var_ing, dtype=float)
+    var_gas = np.round(np.arange(-0.50, 0.5001, 0.01), 4) if var_gas is None else np.asarray(var_gas, dtype=float)
+    base = _base(df)
+
+    ingresos = base["ingresos"] * (1 + var_ing)[:, None]
+    gastos = base["gastos"] * (1 + var_gas)[None, :]
+    flujo = ingresos - gastos
+    ahorro = np.divide(flujo, ingresos, out=np.zeros_like(flujo), where=ingresos > 0)
+
+    if base["gastos"] > 0:
+        equilibrio = base["ingresos"] * (1 + var_ing) / base["gastos"] - 1
+    else:
+        equilibrio = np.full_like(var_ing, np.nan)
+
+    return {
+        "var_ing": var_ing,
+        "var_gas": var_gas,
+        "flujo": flujo,
+        "ahorro": ahorro,
+        "equilibrio_var_gas": equilibrio,
+    }
@@ -1,73 +1,313 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
 import plotly.express as px
+from ledger import matriz_categorias, memo_dataset, serie_mensual
 
-def smart_optimizer(df):
-    st.header("🧠 Simulador de Estrategias Inteligentes")
+# --- Caché de modelos ---
+# El modelo depende sólo de la matriz mensual de categorías (gastos + ingresos): se identifica
+# por su hash y se guarda en memoria y en disco (joblib) para sobrevivir reinicios.
+DIR_MODELOS = os.getenv("FINMIND_MODELOS_DIR", os.path.join(".cache", "modelos"))
+VERSION_MODELO = "rf-200-v1"  # cambiarla invalida los modelos guardados (hiperparámetros, features)
+MAX_MODELOS_MEMORIA = 8
 
-    df = df.copy()
+_MODELOS: "OrderedDict[str, object]" = OrderedDict()
+_LOCK = threading.Lock()
 
-    # --- Limpieza básica ---
-    df.columns = df.columns.str.strip().str.lower()
-    if "fecha" not in df.columns or "tipo" not in df.columns or "monto" not in df.columns:
-        st.error("El archivo debe contener las columnas: fecha, tipo, monto, categoria.")
-        return
-    
-    df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce")
-    df = df.dropna(subset=["fecha", "monto"])
-    df["mes"] = df["fecha"].dt.to_period("M").astype(str)
-
-    # --- Agrupación de ingresos y gastos ---
-    gastos = df[df["tipo"].str.lower() == "gasto"].groupby(["mes", "categoria"])["monto"].sum().unstack(fill_value=0)
-    ingresos = df[df["tipo"].str.lower() == "ingreso"].groupby("mes")["monto"].sum()
+
+def _construir_datos_modelo(df: pd.DataFrame) -> pd.DataFrame:
+    gastos = matriz_categorias(df, "gasto")
+    ingresos = serie_mensual(df)["ingreso"]
     data = gastos.copy()
     data["Ingresos"] = ingresos
     data = data.fillna(0)
-
     # --- Variable objetivo: flujo neto ---
     data["Flujo"] = data["Ingresos"] - data.drop("Ingresos", axis=1).sum(axis=1)
+    return data
+
+
+def datos_modelo(df: pd.DataFrame) -> pd.DataFrame:
+    """Matriz mes x categoria de gastos + Ingresos + Flujo (objetivo), una vez por dataset."""
+    return memo_dataset(df, "datos_optimizer", _construir_datos_modelo)
+
+
+def clave_modelo(X: pd.DataFrame, y: pd.Series) -> str:
+    """Hash del contenido de las features (columnas, meses y valores) y del objetivo."""
+    h = hashlib.sha256(VERSION_MODELO.encode("utf-8"))
+    h.update("\x1f".join(map(str, X.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(X, index=True).to_numpy().tobytes())
+    h.update(pd.util.hash_pandas_object(y, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _recordar(clave: str, modelo) -> None:
+    with _LOCK:
+        _MODELOS[clave] = modelo
+        _MODELOS.move_to_end(clave)
+        while len(_MODELOS) > MAX_MODELOS_MEMORIA:
+            _MODELOS.popitem(last=False)
+
+
+def _modelo_en_disco(clave: str):
+    import joblib  # viene con sklearn
+    ruta = os.path.join(DIR_MODELOS, f"{clave}.joblib")
+    if not os.path.exists(ruta):
+        return None
+    try:
+        return joblib.load(ruta)
+    except Exception:
+        # archivo corrupto o de otra versión de sklearn: se reentrena
+        return None
+
+
+def _guardar_en_disco(clave: str, modelo) -> None:
+    import joblib
+    ruta = os.path.join(DIR_MODELOS, f"{clave}.joblib")
+    try:
+        os.makedirs(DIR_MODELOS, exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        joblib.dump(modelo, temporal)
+        os.replace(temporal, ruta)  # escritura atómica: otros procesos nunca leen un archivo a medias
+    except OSError:
+        pass
+
+
+def _entrenar(X: pd.DataFrame, y: pd.Series):
+    from sklearn.ensemble import RandomForestRegressor  # diferido: sklearn tarda en importarse
+    model = RandomForestRegressor(n_estimators=200, random_state=42, n_jobs=-1)
+    model.fit(X, y)
+    return model
+
+
+def _obtener_modelo(X: pd.DataFrame, y: pd.Series) -> Tuple[object, str]:
+    clave = clave_modelo(X, y)
+    with _LOCK:
+        modelo = _MODELOS.get(clave)
+    if modelo is not None:
+        return modelo, "memoria"
+    modelo = _modelo_en_disco(clave)
+    origen = "disco"
+    if modelo is None:
+        modelo = _entrenar(X, y)
+        _guardar_en_disco(clave, modelo)
+        origen = "entrenado"
+    _recordar(clave, modelo)
+    return modelo, origen
+
+
+def modelo_flujo(df: pd.DataFrame) -> Tuple[object, str]:
+    """
+    (RandomForest que predice el flujo, origen) con origen 'memoria', 'disco' o 'entrenado'.
+    Se reentrena sólo si cambia la matriz mensual de categorías; reabrir la página con el mismo
+    dataset no vuelve a calcular ni el hash.
+    """
+    construido = []
+
+    def _construir(d: pd.DataFrame) -> Tuple[object, str]:
+        construido.append(True)
+        data = datos_modelo(d)
+        return _obtener_modelo(data.drop(columns="Flujo"), data["Flujo"])
+    modelo, origen = memo_dataset(df, "modelo_optimizer", _construir)
+    return modelo, origen if construido else "memoria"
+
+
+# --- Búsqueda de escenarios con restricciones ---
+N_CANDIDATOS = 5000
+METODOS_EVALUACION = ("modelo", "lineal")
+
+
+def _generar_ajustes(k: int, n: int, limite_inf: float, limite_sup: float, semilla: int) -> np.ndarray:
+    """
+    Matriz (candidatos x categorías) de ajustes relativos dentro de [limite_inf, limite_sup]:
+    escenario actual, todo al mínimo, cada categoría sola en su mínimo y el resto aleatorio
+    (la mitad con sólo algunas categorías movidas, para cubrir recortes pequeños).
+    """
+    rng = np.random.default_rng(semilla)
+    especiales = np.vstack([np.zeros(k), np.full(k, limite_inf), np.eye(k) * limite_inf])
+    aleatorios = rng.uniform(limite_inf, limite_sup, size=(max(n - len(especiales), 0), k))
+    mitad = len(aleatorios) // 2
+    aleatorios[:mitad] *= rng.random((mitad, k)) < 0.5
+    return np.clip(np.vstack([especiales, aleatorios]), limite_inf, limite_sup)
+
+
+def _sustituto_lineal(X: pd.DataFrame, y: pd.Series) -> np.ndarray:
+    """Coeficientes (con intercepto al final) de mínimos cuadrados flujo ~ features."""
+    A = np.column_stack([X.to_numpy(dtype=float), np.ones(len(X))])
+    coef, *_ = np.linalg.lstsq(A, y.to_numpy(dtype=float), rcond=None)
+    return coef
+
+
+def frente_pareto(recorte: np.ndarray, flujo: np.ndarray) -> np.ndarray:
+    """Índices de los candidatos no dominados (menor recorte, mayor flujo), ordenados por recorte."""
+    orden = np.lexsort((-flujo, recorte))
+    flujo_ordenado = flujo[orden]
+    mejor_previo = np.maximum.accumulate(flujo_ordenado)
+    es_frente = np.r_[True, flujo_ordenado[1:] > mejor_previo[:-1]]
+    return orden[es_frente]
+
+
+def optimizar_presupuesto(df: pd.DataFrame, limite_inf: float = -0.30, limite_sup: float = 0.20,
+                          presupuesto_max: float = None, var_ingresos: float = 0.0,
+                          n_candidatos: int = N_CANDIDATOS, metodo: str = "modelo",
+                          semilla: int = 42) -> dict:
+    """
+    Busca ajustes por categoría de gasto sobre el último mes:
+    - cada ajuste dentro de [limite_inf, limite_sup] (p. ej. -0.30..+0.20)
+    - gasto total del escenario <= presupuesto_max (por defecto, el gasto actual)
+    - ingresos con variación fija var_ingresos
+    Todos los candidatos se evalúan en una sola llamada: model.predict del RandomForest
+    ('modelo') o un sustituto lineal de mínimos cuadrados ('lineal').
+    Devuelve el escenario actual, los candidatos factibles, su frente de Pareto
+    (flujo vs. recorte) y el de mayor flujo.
+    """
+    if metodo not in METODOS_EVALUACION:
+        raise ValueError(f"Método no soportado: '{metodo}'. Usa: {', '.join(METODOS_EVALUACION)}")
+    if limite_inf > limite_sup:
+        raise ValueError("El límite inferior no puede ser mayor que el superior.")
+
+    data = datos_modelo(df)
+    X = data.drop(columns="Flujo")
+    categorias = [c for c in X.columns if c != "Ingresos"]
+    actual = X.iloc[-1]
+    base_gastos = actual[categorias].to_numpy(dtype=float)
+    gasto_actual = float(base_gastos.sum())
+    presupuesto = gasto_actual if presupuesto_max is None else float(presupuesto_max)
+
+    ajustes = _generar_ajustes(len(categorias), n_candidatos, limite_inf, limite_sup, semilla)
+    gastos = base_gastos * (1.0 + ajustes)
+    gasto_total = gastos.sum(axis=1)
+    factible = gasto_total <= presupuesto + 1e-9
+    ajustes, gastos, gasto_total = ajustes[factible], gastos[factible], gasto_total[factible]
+
+    resultado = {
+        "categorias": categorias,
+        "gasto_actual": gasto_actual,
+        "presupuesto": presupuesto,
+        "evaluados": int(len(factible)),
+        "factibles": int(factible.sum()),
+    }
+    if not len(gastos):
+        resultado["mensaje"] = "Ningún escenario cumple el presupuesto con esos límites por categoría."
+        return resultado
+
+    ingresos = float(actual["Ingresos"]) * (1.0 + var_ingresos)
+    matriz = pd.DataFrame(gastos, columns=categorias)
+    matriz["Ingresos"] = ingresos
+    matriz = matriz[list(X.columns)]
+    base = actual.to_frame().T.astype(float)
+
+    if metodo == "modelo":
+        modelo, _ = modelo_flujo(df)
+        flujo = modelo.predict(matriz)
+        flujo_actual = float(modelo.predict(base)[0])
+    else:
+        coef = memo_dataset(df, "sustituto_lineal_optimizer", lambda d: _sustituto_lineal(X, data["Flujo"]))
+        flujo = matriz.to_numpy(dtype=float) @ coef[:-1] + coef[-1]
+        flujo_actual = float(actual.to_numpy(dtype=float) @ coef[:-1] + coef[-1])
+
+    recorte = np.clip(base_gastos - gastos, 0.0, None).sum(axis=1)
+    candidatos = pd.DataFrame(ajustes, columns=categorias)
+    candidatos["gasto_total"] = gasto_total
+    candidatos["recorte"] = recorte
+    candidatos["flujo"] = flujo
+
+    resultado.update({
+        "actual": actual,
+        "flujo_actual": flujo_actual,
+        "ingresos": ingresos,
+        "candidatos": candidatos,
+        "pareto": candidatos.iloc[frente_pareto(recorte, flujo)].reset_index(drop=True),
+        "mejor": candidatos.iloc[int(np.argmax(flujo))],
+    })
+    return resultado
+
+
+def smart_optimizer(df):
+    st.header("🧠 Simulador de Estrategias Inteligentes")
+
+    # --- Validación básica (sin copiar el ledger) ---
+    columnas = {str(c).strip().lower() for c in df.columns}
+    if not {"fecha", "tipo", "monto"}.issubset(columnas):
+        st.error("El archivo debe contener las columnas: fecha, tipo, monto, categoria.")
+        return
+
+    # --- Agrupación de ingresos y gastos (cubo mensual compartido) ---
+    data = datos_modelo(df)
 
     if len(data) < 4:
         st.warning("⚠️ Se necesitan al menos 4 meses de datos para ejecutar la simulación.")
         return
 
-    # --- Entrenamiento del modelo ---
+    # --- Entrenamiento del modelo (o reutilización del ya entrenado con la misma matriz) ---
     X = data.drop(columns="Flujo")
-    y = data["Flujo"]
-    model = RandomForestRegressor(n_estimators=200, random_state=42)
-    model.fit(X, y)
+    model, origen = modelo_flujo(df)
 
-    st.success("✅ Modelo entrenado correctamente sobre tus datos financieros.")
+    if origen == "entrenado":
+        st.success("✅ Modelo entrenado correctamente sobre tus datos financieros.")
+    else:
+        st.success("✅ Modelo reutilizado: tus datos no cambiaron desde el último entrenamiento.")
 
     # --- Importancia de variables ---
     importances = pd.Series(model.feature_importances_, index=X.columns).sort_values(ascending=False)
     fig_imp = px.bar(importances, orientation='h', title="Importancia de cada categoría en el flujo neto")
     st.plotly_chart(fig_imp, use_container_width=True)
 
-    # --- Escenario actual y optimizado ---
+    # --- Búsqueda de escenarios con restricciones ---
     st.subheader("💡 Escenario sugerido por IA")
-    escenario = X.iloc[-1].copy()
-    recomendaciones = {}
-
-    for cat in [c for c in X.columns if c != "Ingresos"]:
-        impacto = importances.get(cat, 0)
-        if impacto > 0.1:
-            # Reducir 10% los gastos con alto impacto negativo
-            recomendaciones[cat] = escenario[cat] * 0.9
-        elif 0.03 < impacto <= 0.1:
-            # Mantener igual los de impacto moderado
-            recomendaciones[cat] = escenario[cat]
-        else:
-            # Incrementar 10% en rubros con bajo impacto (potencial de inversión)
-            recomendaciones[cat] = escenario[cat] * 1.1
+    categorias = [c for c in X.columns if c != "Ingresos"]
+    gasto_actual = float(X.iloc[-1][categorias].sum())
+    c1, c2 = st.columns(2)
+    limite_inf, limite_sup = c1.slider("Ajuste permitido por categoría (%)", -50, 50, (-30, 20))
+    var_ingresos = c2.slider("Variación de ingresos (%)", -20, 30, 10) / 100
+    c3, c4, c5 = st.columns(3)
+    presupuesto_max = c3.number_input("Presupuesto máximo de gastos", min_value=0.0,
+                                      value=round(gasto_actual, 2), step=max(round(gasto_actual * 0.01, 2), 1.0))
+    n_candidatos = c4.select_slider("Escenarios a evaluar", options=[1000, 2000, 5000, 10000, 20000], value=N_CANDIDATOS)
+    metodo = c5.radio("Evaluación", METODOS_EVALUACION, horizontal=True,
+                      format_func=lambda m: "Modelo (RandomForest)" if m == "modelo" else "Sustituto lineal")
+
+    optimo = optimizar_presupuesto(
+        df, limite_inf=limite_inf / 100, limite_sup=limite_sup / 100, presupuesto_max=presupuesto_max,
+        var_ingresos=var_ingresos, n_candidatos=n_candidatos, metodo=metodo,
+    )
+    if "mensaje" in optimo:
+        st.warning(f"⚠️ {optimo['mensaje']}")
+        return
+    st.caption(f"{optimo['factibles']:,} de {optimo['evaluados']:,} escenarios cumplen el presupuesto; "
+               f"{len(optimo['pareto'])} forman el frente de Pareto.")
+
+    # --- Frente de Pareto: flujo vs. tamaño del recorte ---
+    pareto = optimo["pareto"]
+    fig_pareto = px.scatter(
+        optimo["candidatos"], x="recorte", y="flujo", opacity=0.25,
+        color_discrete_sequence=["#9aa5b1"],
+        labels={"recorte": "Recorte total de gastos ($)", "flujo": "Flujo neto estimado ($)"},
+        title="Escenarios evaluados y frente de Pareto",
+    )
+    fig_pareto.add_scatter(x=pareto["recorte"], y=pareto["flujo"], mode="lines+markers", name="Frente de Pareto")
+    st.plotly_chart(fig_pareto, use_container_width=True)
+
+    # El punto por defecto es el de mayor flujo; se puede elegir otro del frente con menos recorte
+    opciones = list(range(len(pareto)))
+    elegido = st.select_slider(
+        "Escenario del frente de Pareto", options=opciones, value=opciones[-1],
+        format_func=lambda i: f"Recorte ${pareto['recorte'].iloc[i]:,.0f} → flujo ${pareto['flujo'].iloc[i]:,.0f}",
+    )
+    punto = pareto.iloc[elegido]
 
-    recomendaciones["Ingresos"] = escenario["Ingresos"] * 1.1
-    escenario_opt = pd.DataFrame([recomendaciones])
+    escenario = optimo["actual"]
+    recomendaciones = {cat: escenario[cat] * (1 + punto[cat]) for cat in categorias}
+    recomendaciones["Ingresos"] = optimo["ingresos"]
+    escenario_opt = pd.DataFrame([recomendaciones])[list(X.columns)]
 
-    flujo_pred = model.predict(escenario_opt)[0]
-    flujo_actual = model.predict([escenario])[0]
+    flujo_pred = float(punto["flujo"])
+    flujo_actual = optimo["flujo_actual"]
     delta = flujo_pred - flujo_actual
 
     st.metric("Flujo actual", f"${flujo_actual:,.0f}")
@@ -101,22 +341,22 @@ def smart_optimizer(df):
         if cat == "Ingresos":
             st.markdown(f"""
             **Ingresos**
-            - 💰 El modelo recomienda **incrementar en +10%** tus ingresos proyectados.
+            - 💰 El escenario supone **una variación de {var_ingresos*100:+.0f}%** en tus ingresos proyectados.
             - Esto puede lograrse mediante **nuevas estrategias de venta, revisión de precios o campañas de fidelización**.
             - Este ajuste tiene un impacto directo en la mejora del flujo neto general.
             """)
         else:
-            cambio = (val / escenario[cat] - 1) * 100
+            cambio = punto[cat] * 100
             impacto = importances.get(cat, 0)
             
-            if cambio < 0:
+            if cambio < -0.05:
                 st.markdown(f"""
                 **{cat.capitalize()}**
                 - 📉 El modelo sugiere **reducir este gasto en {abs(cambio):.1f}%**.
                 - Esto se debe a que representa un **alto impacto negativo ({impacto*100:.1f}%)** sobre el flujo neto.
                 - Se recomienda **renegociar contratos, mejorar eficiencia operativa o limitar gastos innecesarios**.
                 """)
-            elif cambio > 0:
+            elif cambio > 0.05:
                 st.markdown(f"""
                 **{cat.capitalize()}**
                 - 📈 El modelo sugiere **invertir más (+{cambio:.1f}%)** en esta categoría.
@@ -0,0 +1,88 @@
+# perfil_arranque.py
+"""
+Perfil de tiempos de import del arranque de la app.
+Cada etapa se ejecuta en un intérprete nuevo con `python -X importtime` y se reporta:
+- el tiempo total de imports de la etapa
+- los paquetes de primer nivel más costosos (tiempo acumulado)
+- si se cargó algún módulo pesado que no debería estar en ese camino
+
+Uso (desde EcoFolder/):
+    python perfil_arranque.py            # todas las etapas
+    python perfil_arranque.py --top 10
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# (nombre, código a importar, módulos pesados prohibidos en esa etapa)
+# streamlit mismo importa plotly.io y plotly.graph_objects al arrancar: en las primeras etapas
+# sólo se vigila plotly.express.
+ETAPAS: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ("landing", "import streamlit; import landingpage.landing",
+     ("pandas", "sklearn", "google.generativeai", "torch", "transformers", "plotly.express")),
+    ("carga de datos", "import streamlit; import landingpage.landing; import utils; import mcp",
+     ("sklearn", "google.generativeai", "torch", "transformers", "plotly.express")),
+    ("dashboard", "import utils, mcp; import plotly.express",
+     ("sklearn", "google.generativeai", "torch", "transformers")),
+    ("núcleo de salud", "import health_core",
+     ("streamlit", "plotly", "sklearn", "google.generativeai", "torch", "transformers")),
+    ("salud financiera", "import health",
+     ("sklearn", "google.generativeai", "torch", "transformers")),
+    ("optimizador", "import optimizer",
+     ("google.generativeai", "torch", "transformers")),
+    ("IA (Gemini)", "import dashboard_ai, decision_ai, simulator_ai",
+     ("sklearn", "torch", "transformers")),
+]
+
+
+def perfilar(codigo: str) -> Tuple[Dict[str, float], List[str]]:
+    """Devuelve (ms acumulados por paquete de primer nivel, módulos importados)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "error desconocido")
+
+    por_paquete: Dict[str, float] = defaultdict(float)
+    modulos: List[str] = []
+    for linea in proc.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = (p.strip() for p in linea[len("import time:"):].split("|"))
+        modulos.append(nombre.strip())
+        # los imports de primer nivel no llevan sangría en la columna del nombre
+        if not nombre.startswith(" "):
+            por_paquete[nombre.split(".")[0]] += int(acumulado) / 1000
+    return dict(por_paquete), modulos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de imports del arranque de FinMind")
+    parser.add_argument("--top", type=int, default=8, help="paquetes a mostrar por etapa")
+    args = parser.parse_args()
+
+    fallas = 0
+    for nombre, codigo, prohibidos in ETAPAS:
+        try:
+            por_paquete, modulos = perfilar(codigo)
+        except RuntimeError as e:
+            print(f"\n== {nombre}: no se pudo importar ({e})")
+            continue
+        total = sum(por_paquete.values())
+        print(f"\n== {nombre}: {total:,.0f} ms en imports ({len(modulos)} módulos)")
+        for paquete, ms in sorted(por_paquete.items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f"   {ms:8.0f} ms  {paquete}")
+        cargados = sorted({p for p in prohibidos if any(m == p or m.startswith(p + ".") for m in modulos)})
+        if cargados:
+            fallas += 1
+            print(f"   !! módulos pesados cargados en esta etapa: {', '.join(cargados)}")
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == "__main__":
+    main()
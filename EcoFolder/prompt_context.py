@@ -0,0 +1,135 @@
+# prompt_context.py
+"""
+Constructor de contexto acotado para los prompts del asistente.
+- Sólo usa agregados: KPIs (mcp.analizar_finanzas), serie mensual, categorías principales
+  y meses atípicos, nunca el ledger completo
+- Respeta un presupuesto fijo de tokens: las secciones entran por prioridad y la serie
+  mensual se recorta a los meses más recientes que quepan
+- La muestra opcional de filas pasa por dashboard_ai.anonimizar_df
+"""
+
+import math
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dashboard_ai import anonimizar_df
+from ledger import serie_mensual, totales_por_categoria
+
+PRESUPUESTO_TOKENS = 1500
+CHARS_POR_TOKEN = 4  # aproximación estándar para texto en español/inglés
+TOP_CATEGORIAS = 8
+FILAS_MUESTRA = 3
+Z_ANOMALIA = 2.0
+
+
+def estimar_tokens(texto: str) -> int:
+    return math.ceil(len(texto) / CHARS_POR_TOKEN)
+
+
+def _fmt(x: float) -> str:
+    return f"{x:,.0f}"
+
+
+def _seccion_kpis(analisis: Dict[str, Any]) -> str:
+    return (
+        "KPIs:\n"
+        f"- ingresos: {_fmt(analisis['ingresos'])}\n"
+        f"- gastos: {_fmt(analisis['gastos'])}\n"
+        f"- flujo: {_fmt(analisis['flujo'])}\n"
+        f"- ahorro: {analisis['ahorro'] * 100:.1f}%"
+    )
+
+
+def _lineas_mensuales(resumen: pd.DataFrame) -> List[str]:
+    return [
+        f"{mes} | {_fmt(fila.ingreso)} | {_fmt(fila.gasto)} | {_fmt(fila.flujo)}"
+        for mes, fila in resumen.iterrows()
+    ]
+
+
+def _seccion_categorias(df: pd.DataFrame) -> str:
+    lineas = []
+    for tipo, titulo in (("gasto", "Principales gastos por categoría"), ("ingreso", "Principales ingresos por categoría")):
+        totales = totales_por_categoria(df, tipo).sort_values(ascending=False)
+        if totales.empty:
+            continue
+        total = float(totales.sum()) or 1.0
+        lineas.append(f"{titulo}:")
+        for cat, monto in totales.head(TOP_CATEGORIAS).items():
+            lineas.append(f"- {cat}: {_fmt(monto)} ({monto / total * 100:.1f}%)")
+    return "\n".join(lineas)
+
+
+def _seccion_anomalias(resumen: pd.DataFrame) -> str:
+    flujo = resumen["flujo"]
+    if len(flujo) < 3:
+        return ""
+    z = (flujo - flujo.mean()) / (flujo.std(ddof=0) + 1e-9)
+    atipicos = z[np.abs(z) > Z_ANOMALIA]
+    if atipicos.empty:
+        return "Meses atípicos (flujo): ninguno"
+    detalle = ", ".join(f"{mes} (flujo {_fmt(flujo[mes])}, z={valor:+.1f})" for mes, valor in atipicos.items())
+    return f"Meses atípicos (flujo): {detalle}"
+
+
+def _seccion_muestra(df: pd.DataFrame) -> str:
+    # sin columnas internas de la representación compacta (mes_id, n)
+    muestra = anonimizar_df(df.head(FILAS_MUESTRA).drop(columns=["mes_id", "n"], errors="ignore"))
+    return "Muestra de transacciones (anonimizada):\n" + muestra.to_csv(index=False, float_format="%.2f").strip()
+
+
+def construir_contexto(df: pd.DataFrame, analisis: Dict[str, Any],
+                       presupuesto_tokens: int = PRESUPUESTO_TOKENS) -> Tuple[str, Dict[str, Any]]:
+    """
+    Devuelve (texto de contexto, estadísticas). Las secciones se agregan por prioridad
+    (KPIs, serie mensual, categorías, anomalías, muestra) mientras quepan en el presupuesto.
+    """
+    limite = presupuesto_tokens * CHARS_POR_TOKEN
+    secciones: List[str] = []
+    incluidas: List[str] = []
+
+    def _cabe(texto: str) -> bool:
+        return len("\n\n".join(secciones + [texto])) <= limite
+
+    kpis = _seccion_kpis(analisis)
+    secciones.append(kpis)
+    incluidas.append("kpis")
+
+    resumen = serie_mensual(df)
+    lineas = _lineas_mensuales(resumen)
+    encabezado = "Serie mensual (mes | ingresos | gastos | flujo):"
+    meses_incluidos = len(lineas)
+    # recorta los meses más antiguos hasta que kpis + serie quepan en ~60% del límite (~40% para lo demás)
+    limite_serie = int(limite * 0.6) - len(kpis)
+    while meses_incluidos > 0 and len(encabezado) + sum(len(l) + 1 for l in lineas[-meses_incluidos:]) > limite_serie:
+        meses_incluidos -= 1
+    if meses_incluidos > 0:
+        omitidos = len(lineas) - meses_incluidos
+        texto_serie = "\n".join([encabezado] + lineas[-meses_incluidos:])
+        if omitidos:
+            texto_serie += f"\n({omitidos} meses anteriores omitidos)"
+        secciones.append(texto_serie)
+        incluidas.append("serie_mensual")
+
+    for nombre, constructor in (
+        ("categorias", lambda: _seccion_categorias(df)),
+        ("anomalias", lambda: _seccion_anomalias(resumen)),
+        ("muestra", lambda: _seccion_muestra(df)),
+    ):
+        texto = constructor()
+        if texto and _cabe(texto):
+            secciones.append(texto)
+            incluidas.append(nombre)
+
+    contexto = "\n\n".join(secciones)
+    stats = {
+        "caracteres": len(contexto),
+        "tokens_estimados": estimar_tokens(contexto),
+        "presupuesto_tokens": presupuesto_tokens,
+        "secciones": incluidas,
+        "meses_incluidos": meses_incluidos,
+        "meses_totales": len(lineas),
+    }
+    return contexto, stats
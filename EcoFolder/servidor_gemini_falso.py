@@ -0,0 +1,105 @@
+# servidor_gemini_falso.py
+"""
+Servidor HTTP local que imita la API REST de Gemini (generateContent y streamGenerateContent),
+para probar ai_executor / gemini_client sin cuota ni red
+(tests/test_servidor_gemini_falso.py lo levanta en un puerto libre).
+
+Uso:
+    python servidor_gemini_falso.py --puerto 8089 --latencia 1.5
+    GEMINI_API_KEY=falsa GEMINI_API_ENDPOINT=http://localhost:8089 streamlit run app.py
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_LOCK = threading.Lock()
+_STATS = {"solicitudes": 0, "simultaneas": 0, "max_simultaneas": 0}
+
+
+def _respuesta(texto: str) -> dict:
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": texto}], "role": "model"},
+            "finishReason": "STOP",
+            "index": 0,
+        }]
+    }
+
+
+class ManejadorGemini(BaseHTTPRequestHandler):
+    latencia_s = 1.0
+    chunks = 4
+
+    def log_message(self, formato, *args):  # silencioso
+        pass
+
+    def do_GET(self):
+        # /stats: métricas del servidor para verificar coalescencia y límites
+        with _LOCK:
+            cuerpo = json.dumps(_STATS).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_POST(self):
+        largo = int(self.headers.get("Content-Length", 0))
+        peticion = json.loads(self.rfile.read(largo) or b"{}")
+        try:
+            prompt = peticion["contents"][0]["parts"][0]["text"]
+        except (KeyError, IndexError):
+            prompt = ""
+
+        with _LOCK:
+            _STATS["solicitudes"] += 1
+            _STATS["simultaneas"] += 1
+            _STATS["max_simultaneas"] = max(_STATS["max_simultaneas"], _STATS["simultaneas"])
+        try:
+            texto = f"Respuesta simulada ({len(prompt)} caracteres de prompt)."
+            if ":streamGenerateContent" in self.path:
+                self._stream(texto)
+            else:
+                time.sleep(self.latencia_s)
+                cuerpo = json.dumps(_respuesta(texto)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+        finally:
+            with _LOCK:
+                _STATS["simultaneas"] -= 1
+
+    def _stream(self, texto: str):
+        # el transporte REST del SDK lee un arreglo JSON que llega por partes
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        paso = max(1, len(texto) // self.chunks)
+        partes = [texto[i:i + paso] for i in range(0, len(texto), paso)]
+        self.wfile.write(b"[")
+        for i, parte in enumerate(partes):
+            time.sleep(self.latencia_s / len(partes))
+            self.wfile.write((("," if i else "") + json.dumps(_respuesta(parte))).encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor falso de la API de Gemini")
+    parser.add_argument("--puerto", type=int, default=8089)
+    parser.add_argument("--latencia", type=float, default=1.0, help="segundos por respuesta")
+    args = parser.parse_args()
+
+    ManejadorGemini.latencia_s = args.latencia
+    servidor = ThreadingHTTPServer(("127.0.0.1", args.puerto), ManejadorGemini)
+    print(f"Gemini falso escuchando en http://127.0.0.1:{args.puerto} (latencia {args.latencia}s)")
+    servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 # simulator_ai.py
-from gemini_client import generar_respuesta
+from gemini_client import responder
 import pandas as pd
-from typing import Dict
+from typing import Dict, Iterator
 
 PROMPT_TEMPLATE = """
 Eres un asistente financiero experto. A continuación tienes:
@@ -51,5 +51,10 @@ def preparar_prompt(df: pd.DataFrame, kpis: Dict, var_ing: float, var_gas: float
 
 def analizar_simulacion_ai(df: pd.DataFrame, kpis_sim: Dict, var_ing: float, var_gas: float) -> str:
     prompt = preparar_prompt(df, kpis_sim, var_ing, var_gas)
-    respuesta = generar_respuesta(prompt)
+    respuesta = responder(prompt)
     return respuesta
+
+
+def analizar_simulacion_ai_stream(df: pd.DataFrame, kpis_sim: Dict, var_ing: float, var_gas: float) -> Iterator[str]:
+    prompt = preparar_prompt(df, kpis_sim, var_ing, var_gas)
+    return responder(prompt, stream=True)
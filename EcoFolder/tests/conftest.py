@@ -0,0 +1,11 @@
+# conftest.py
+import os
+import sys
+
+# los módulos de EcoFolder se importan planos (from ledger import ...), como en la app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark-filas", type=int, nargs="+", default=[10_000],
+                     help="tamaños de ledger para tests/test_benchmark_salud.py")
@@ -0,0 +1,33 @@
+# sinteticos.py
+"""Ledgers sintéticos con la forma que deja ingesta.compactar_ledger, para tests y benchmarks."""
+
+import numpy as np
+import pandas as pd
+
+from ingesta import compactar_ledger
+
+MESES = 36
+CATEGORIAS_INGRESO = ["Ventas", "Servicios", "Intereses", "Otros ingresos"]
+CATEGORIAS_GASTO = ["Nómina", "Renta", "Servicios públicos", "Marketing", "Insumos", "Impuestos", "Transporte", "Otros"]
+
+
+def ledger_sintetico(filas: int, meses: int = MESES, semilla: int = 0) -> pd.DataFrame:
+    """Ledger normalizado (fecha, tipo, categoria, monto, concepto) con ~40% de ingresos."""
+    rng = np.random.default_rng(semilla)
+    inicio = np.datetime64("2021-01-01")
+    fecha = inicio + rng.integers(0, meses * 30, filas).astype("timedelta64[D]")
+    es_ingreso = rng.random(filas) < 0.4
+    categoria = np.where(
+        es_ingreso,
+        np.array(CATEGORIAS_INGRESO, dtype=object)[rng.integers(0, len(CATEGORIAS_INGRESO), filas)],
+        np.array(CATEGORIAS_GASTO, dtype=object)[rng.integers(0, len(CATEGORIAS_GASTO), filas)],
+    )
+    monto = np.round(np.where(es_ingreso, rng.lognormal(7.5, 0.6, filas), rng.lognormal(7.0, 0.8, filas)), 2)
+    df = pd.DataFrame({
+        "fecha": pd.to_datetime(fecha),
+        "tipo": np.where(es_ingreso, "ingreso", "gasto"),
+        "categoria": categoria,
+        "monto": monto,
+        "concepto": "Movimiento",
+    })
+    return compactar_ledger(df, float32=False)
@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+import ai_executor
+
+
+@pytest.fixture(autouse=True)
+def limitador_holgado(monkeypatch):
+    # estas pruebas miden el cupo por sesión, no la tasa global
+    monkeypatch.setattr(ai_executor, "_BUCKET", ai_executor.TokenBucket(tasa=1000, capacidad=1000))
+
+
+def test_timeout_acota_la_espera_del_cupo():
+    sesion = "sesion-ocupada"
+    liberar = threading.Event()
+    hilos = [threading.Thread(target=ai_executor.ejecutar, args=(f"lenta-{i}", liberar.wait, sesion))
+             for i in range(ai_executor.MAX_POR_SESION)]
+    for hilo in hilos:
+        hilo.start()
+    time.sleep(0.2)
+    try:
+        inicio = time.monotonic()
+        with pytest.raises(RuntimeError):
+            ai_executor.ejecutar("otra", lambda: "x", sesion=sesion, timeout=0.3)
+        assert time.monotonic() - inicio < 1.0
+    finally:
+        liberar.set()
+        for hilo in hilos:
+            hilo.join()
+
+
+def test_espera_del_cupo_se_descuenta_del_timeout():
+    from concurrent.futures import TimeoutError as FuturoTimeout
+
+    sesion = "sesion-lenta"
+    hilos = [threading.Thread(target=ai_executor.ejecutar, args=(f"ocupa-{i}", lambda: time.sleep(0.3), sesion))
+             for i in range(ai_executor.MAX_POR_SESION)]
+    for hilo in hilos:
+        hilo.start()
+    time.sleep(0.05)
+    inicio = time.monotonic()
+    with pytest.raises(FuturoTimeout):
+        ai_executor.ejecutar("descuento", lambda: time.sleep(0.4), sesion=sesion, timeout=0.5)
+    assert time.monotonic() - inicio < 0.65
+    for hilo in hilos:
+        hilo.join()
+
+
+def test_sesiones_inactivas_no_se_retienen():
+    import gc
+
+    antes = len(ai_executor._SESIONES)
+    for i in range(50):
+        ai_executor.ejecutar(f"corta-{i}", lambda: "ok", sesion=f"efimera-{i}")
+    gc.collect()
+    assert len(ai_executor._SESIONES) <= antes
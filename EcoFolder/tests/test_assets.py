@@ -0,0 +1,30 @@
+import pytest
+
+import assets
+
+
+@pytest.fixture
+def locales(monkeypatch, tmp_path):
+    monkeypatch.setattr(assets, "RECURSOS_LOCALES", True)
+    monkeypatch.setattr(assets, "DIR_STATIC", str(tmp_path))
+    (tmp_path / "finmind.css").write_text("body { color: red; }", encoding="utf-8")
+    assets.hoja_estilos.cache_clear()
+    yield tmp_path
+    assets.hoja_estilos.cache_clear()
+
+
+def test_sin_archivos_locales_usa_cdn(locales):
+    html = assets.hoja_estilos()
+    assert assets.FUENTES_CDN in html and assets.ICONOS_CDN in html
+    assert "app/static" not in html
+
+
+def test_con_archivos_locales_usa_static(locales):
+    for ruta in (assets.FUENTE_LOCAL, *assets.ICONOS_LOCALES):
+        archivo = locales.joinpath(*ruta)
+        archivo.parent.mkdir(parents=True, exist_ok=True)
+        archivo.write_bytes(b"")
+    html = assets.hoja_estilos()
+    assert "app/static/fonts/InterVariable.woff2" in html
+    assert "app/static/bootstrap-icons/bootstrap-icons.css" in html
+    assert assets.FUENTES_CDN not in html and assets.ICONOS_CDN not in html
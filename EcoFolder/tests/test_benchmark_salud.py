@@ -0,0 +1,81 @@
+"""
+Benchmarks del camino de salud financiera (health_core) con pytest-benchmark.
+Por cada tamaño (--benchmark-filas, 10k por defecto) se mide sobre un ledger compactado como el de la app:
+- frio: cubo mensual + calcular_salud + detectar_anomalias sobre un DataFrame nuevo
+- tibio: las mismas llamadas con el cubo ya memoizado
+- incremental: calcular_salud con un EstadoSalud previo tras agregar un mes nuevo
+- historial: score por prefijo de meses desde cero
+- transacciones: baselines por categoría + top-k de filas atípicas sobre un DataFrame nuevo
+
+Uso (desde EcoFolder/):
+    python -m pytest tests/test_benchmark_salud.py --benchmark-filas 10000 100000 1000000 --benchmark-autosave
+    python -m pytest tests/test_benchmark_salud.py --benchmark-compare --benchmark-compare-fail=min:25%
+    python -m pytest tests --benchmark-skip          # sólo los tests funcionales
+"""
+
+import pandas as pd
+import pytest
+
+from health_core import EstadoSalud, anomalias_transacciones, calcular_salud, detectar_anomalias
+from ingesta import compactar_ledger
+from ledger import cubo_mensual
+from sinteticos import MESES, ledger_sintetico
+
+
+def pytest_generate_tests(metafunc):
+    if "filas" in metafunc.fixturenames:
+        metafunc.parametrize("filas", metafunc.config.getoption("benchmark_filas"), scope="module")
+
+
+@pytest.fixture(scope="module")
+def base(filas):
+    df = ledger_sintetico(filas)
+    # calienta memo de ledger, sklearn y numpy
+    calcular_salud(df)
+    detectar_anomalias(df)
+    return df
+
+
+def test_frio(benchmark, base):
+    def frio():
+        # copia superficial: objeto nuevo, sin memo del cubo
+        df = base.copy(deep=False)
+        cubo_mensual(df)
+        calcular_salud(df)
+        detectar_anomalias(df)
+
+    benchmark(frio)
+
+
+def test_tibio(benchmark, base):
+    def tibio():
+        calcular_salud(base)
+        detectar_anomalias(base)
+
+    benchmark(tibio)
+
+
+def test_incremental(benchmark, base, filas):
+    # un mes adicional de movimientos sobre el estado ya sincronizado
+    extra = ledger_sintetico(max(filas // MESES, 1), meses=1, semilla=1)
+    extra["fecha"] = extra["fecha"] + pd.DateOffset(months=MESES)
+    ampliado = compactar_ledger(pd.concat([base, extra], ignore_index=True), float32=False)
+    cubo_mensual(ampliado)
+
+    def preparar():
+        estado = EstadoSalud()
+        calcular_salud(base, estado=estado)
+        return (ampliado,), {"estado": estado}
+
+    # sólo se cronometra la actualización; el estado se sincroniza con la base en cada ronda
+    resultado = benchmark.pedantic(calcular_salud, setup=preparar, rounds=5)
+    assert resultado["ok"]
+
+
+def test_historial(benchmark, base):
+    benchmark(lambda: calcular_salud(base, estado=EstadoSalud(), historial=True))
+
+
+def test_transacciones(benchmark, base):
+    resultado = benchmark(lambda: anomalias_transacciones(base.copy(deep=False), k=20))
+    assert resultado["ok"]
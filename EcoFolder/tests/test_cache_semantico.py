@@ -0,0 +1,52 @@
+import pytest
+
+import cache_semantico
+
+UMBRAL = 0.9
+
+
+@pytest.mark.parametrize("guardada, nueva", [
+    ("¿Qué pasa si aumento mis ingresos un 10%?", "¿Qué pasa si aumento mis ingresos un 20%?"),
+    ("¿Debo invertir en bonos?", "¿No debo invertir en bonos?"),
+])
+def test_cifras_y_negaciones_distintas_no_comparten_respuesta(guardada, nueva):
+    contexto = "ctx-" + guardada
+    cache_semantico.registrar_pregunta(contexto, guardada, "clave", umbral=UMBRAL)
+    # los trigramas solos sí las considerarían iguales
+    assert float(cache_semantico.embedding(guardada) @ cache_semantico.embedding(nueva)) >= UMBRAL
+    assert cache_semantico.buscar_similar(contexto, nueva, umbral=UMBRAL) is None
+
+
+def test_misma_firma_comparte_respuesta():
+    contexto = "ctx-parafrasis"
+    cache_semantico.registrar_pregunta(contexto, "¿Qué pasa si aumento mis ingresos un 10%?", "clave", umbral=UMBRAL)
+    assert cache_semantico.buscar_similar(contexto, "que pasa si aumento mis ingresos un 10 %", umbral=UMBRAL) == "clave"
+
+
+def test_similitud_apagada_por_defecto():
+    assert cache_semantico.UMBRAL_SIMILITUD > 1
+    contexto = "ctx-apagado"
+    cache_semantico.registrar_pregunta(contexto, "¿Debo invertir en bonos?", "clave", umbral=UMBRAL)
+    assert cache_semantico.buscar_similar(contexto, "¿Debo invertir en bonos?") is None
+
+
+def test_clave_normalizada_exige_cifras_exactas_de_la_pregunta():
+    contexto = "KPIs: ingresos 1234567.89, gastos 987654.32\nPregunta: "
+    a, b = "¿Puedo gastar 1234567 este año?", "¿Puedo gastar 1234999 este año?"
+    assert cache_semantico.normalizar_prompt(contexto + a) == cache_semantico.normalizar_prompt(contexto + b)
+    assert cache_semantico.clave_normalizada(contexto + a, pregunta=a) != \
+        cache_semantico.clave_normalizada(contexto + b, pregunta=b)
+    # las cifras del contexto (KPIs) sí se redondean en la clave
+    casi = "KPIs: ingresos 1234567.91, gastos 987654.30\nPregunta: "
+    assert cache_semantico.clave_normalizada(contexto + a, pregunta=a) == \
+        cache_semantico.clave_normalizada(casi + a, pregunta=a)
+
+
+def test_json_canonico_conserva_cifras_exactas():
+    import json
+
+    import numpy as np
+
+    texto = cache_semantico.json_canonico({"b": np.float64(987654.32), "a": 1234567.89, "n": np.int64(7)})
+    assert texto == '{"a":1234567.89,"b":987654.32,"n":7}'
+    assert json.loads(texto)["a"] == 1234567.89
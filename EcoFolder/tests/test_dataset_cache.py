@@ -0,0 +1,47 @@
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+import dataset_cache
+
+
+def _df(filas: int) -> pd.DataFrame:
+    return pd.DataFrame({"monto": range(filas)})
+
+
+def test_lru_respeta_presupuesto():
+    dataset_cache.limpiar()
+    presupuesto = 2.5 * dataset_cache._tamano_bytes(_df(10_000)) / (1024 * 1024)
+    for huella in ("a", "b", "c"):
+        assert dataset_cache.guardar_dataset(huella, _df(10_000), presupuesto_mb=presupuesto)
+    assert dataset_cache.obtener_dataset("a") is None
+    assert dataset_cache.obtener_dataset("c") is not None
+
+
+def test_demasiado_grande_no_se_guarda():
+    dataset_cache.limpiar()
+    assert not dataset_cache.guardar_dataset("grande", _df(10_000), presupuesto_mb=0.001)
+    assert dataset_cache.obtener_dataset("grande") is None
+
+
+def _app_sesion():
+    import pandas as pd
+    import streamlit as st
+    import utils
+
+    st.session_state.setdefault("lecturas", 0)
+    df = utils.obtener_dataset("grande")
+    if df is None:
+        st.session_state["lecturas"] += 1
+        df = pd.DataFrame({"monto": range(10_000)})
+        utils.guardar_dataset("grande", df)
+    st.write(st.session_state["lecturas"])
+
+
+def test_dataset_grande_queda_en_la_sesion(monkeypatch):
+    monkeypatch.setattr(dataset_cache, "PRESUPUESTO_MB", 0.001)
+    at = AppTest.from_function(_app_sesion).run()
+    at.run()
+    at.run()
+    assert not at.exception
+    assert at.session_state["lecturas"] == 1
+    assert at.session_state["dataset_sesion"][0] == "grande"
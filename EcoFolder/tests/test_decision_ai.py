@@ -0,0 +1,42 @@
+import random
+
+import pandas as pd
+import pytest
+
+from decision_ai import proyeccion_simple_from_series, reemplazar_en_stream
+
+
+def _partir(texto: str, semilla: int):
+    rng = random.Random(semilla)
+    cortes = sorted(rng.sample(range(1, len(texto)), k=min(12, len(texto) - 1)))
+    return [texto[i:j] for i, j in zip([0] + cortes, cortes + [len(texto)])]
+
+
+@pytest.mark.parametrize("semilla", range(25))
+def test_separador_partido_entre_chunks(semilla):
+    texto = "RESUMEN:\n-------\nInsights --- a-b\n--------------\nFin---" + "-" * semilla
+    chunks = _partir(texto, semilla)
+    assert "".join(reemplazar_en_stream(iter(chunks), "-------", "\n\n")) == texto.replace("-------", "\n\n")
+
+
+def test_separador_en_el_limite_exacto():
+    assert list(reemplazar_en_stream(iter(["abc---", "----def"]), "-------", "\n\n")) == ["abc", "\n\ndef"]
+
+
+def test_proyeccion_usa_forecast():
+    serie = pd.Series([100.0 + 10 * (i % 12) + i for i in range(36)],
+                      index=[f"{2021 + i // 12}-{i % 12 + 1:02d}" for i in range(36)])
+    proy = proyeccion_simple_from_series(serie, 6)
+    assert len(proy["monthly"]) == 6 and proy["meses"][0] == "2024-01"
+    assert all(lo <= y <= hi for lo, y, hi in zip(proy["inferior_80"], proy["monthly"], proy["superior_80"]))
+
+
+def test_prompt_a_responder_conserva_precision(monkeypatch):
+    import decision_ai
+
+    prompts = []
+    monkeypatch.setattr(decision_ai, "responder", lambda prompt, **kwargs: prompts.append(prompt) or "ok")
+    decision_ai.solicitar_recomendaciones_text({"total_ingresos": 1234567.89, "total_gastos": 987654.32},
+                                               {"horizon_months": 12})
+    assert "1234567.89" in prompts[0] and "987654.32" in prompts[0]
+    assert "1230000" not in prompts[0] and "988000" not in prompts[0]
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import forecast
+
+
+def _ledger_con_pico_en_diciembre(omitir: str = None) -> pd.DataFrame:
+    filas = []
+    for mes in pd.period_range("2022-01", "2024-12", freq="M"):
+        if str(mes) == omitir:
+            continue
+        fecha = mes.to_timestamp()
+        filas.append((fecha, "ingreso", "Ventas", 1500.0 if mes.month == 12 else 1000.0))
+        filas.append((fecha, "gasto", "Renta", 400.0))
+    return pd.DataFrame(filas, columns=["fecha", "tipo", "categoria", "monto"])
+
+
+def test_mes_faltante_no_desplaza_la_estacionalidad():
+    df = _ledger_con_pico_en_diciembre(omitir="2024-03")
+    series = forecast.series_dataset(df)
+    assert len(series) == 36 and series.loc["2024-03", "ingreso"] == 0.0
+
+    pron = forecast.pronosticar_dataset(df, horizonte=12, columnas=["ingreso"])
+    ingreso = pron["pronostico"]["ingreso"]
+    assert ingreso.idxmax() == "2025-12"
+    assert ingreso["2025-01"] < ingreso["2025-12"]
+
+
+def test_pronosticar_completa_meses_de_una_serie_suelta():
+    serie = pd.DataFrame({"flujo": [1.0, 2.0, 4.0]}, index=["2024-01", "2024-02", "2024-04"])
+    pron = forecast.pronosticar(serie, horizonte=2)
+    assert list(pron["pronostico"].index) == ["2024-05", "2024-06"]
+
+
+def _ajuste(alpha, beta, gamma, phi, m):
+    return {"alpha": np.array([alpha]), "beta": np.array([beta]), "gamma": np.array([gamma]),
+            "phi": np.array([phi]), "m": m, "sigma": np.array([1.0])}
+
+
+def test_varianza_estacional_ingenuo():
+    h = np.arange(1, 37)
+    factor = forecast._pesos_innovacion({"m": 12, "sigma": np.array([1.0])}, "estacional_ingenuo", 36)[0]
+    np.testing.assert_allclose(factor, np.sqrt((h - 1) // 12 + 1))
+    paseo = forecast._pesos_innovacion({"m": 1, "sigma": np.array([1.0])}, "estacional_ingenuo", 5)[0]
+    np.testing.assert_allclose(paseo, np.sqrt(np.arange(1, 6)))
+
+
+def test_varianza_holt_winters_forma_cerrada():
+    # ETS(A,A,A), Hyndman y Athanasopoulos (FPP3, tabla 8.8) con beta* = alpha·beta
+    alpha, beta, gamma, m, H = 0.3, 0.2, 0.4, 12, 30
+    b = alpha * beta
+    h = np.arange(1, H + 1)
+    k = (h - 1) // m
+    esperado = (1 + (h - 1) * (alpha ** 2 + alpha * b * h + b ** 2 / 6 * h * (2 * h - 1))
+                + gamma * k * (2 * alpha + gamma + b * m * (k + 1)))
+    factor = forecast._pesos_innovacion(_ajuste(alpha, beta, gamma, 1.0, m), "holt_winters", H)[0]
+    np.testing.assert_allclose(factor ** 2, esperado)
+
+
+def test_varianza_tendencia_amortiguada_forma_cerrada():
+    # ETS(A,Ad,N), misma tabla
+    alpha, beta, phi, H = 0.5, 0.2, 0.9, 24
+    b = alpha * beta
+    h = np.arange(1, H + 1)
+    esperado = (1 + alpha ** 2 * (h - 1)
+                + b * phi * h / (1 - phi) ** 2 * (2 * alpha * (1 - phi) + b * phi)
+                - b * phi * (1 - phi ** h) / ((1 - phi) ** 2 * (1 - phi ** 2))
+                * (2 * alpha * (1 - phi ** 2) + b * phi * (1 + 2 * phi - phi ** h)))
+    factor = forecast._pesos_innovacion(_ajuste(alpha, beta, 0.0, phi, 1), "tendencia_amortiguada", H)[0]
+    np.testing.assert_allclose(factor ** 2, esperado)
+
+
+def test_intervalos_anidados_y_ajuste_cacheado():
+    rng = np.random.default_rng(0)
+    meses = pd.period_range("2021-01", periods=40, freq="M").astype(str)
+    series = pd.DataFrame({"a": 100 + 10 * np.sin(np.arange(40) * np.pi / 6) + rng.normal(0, 2, 40),
+                           "b": np.linspace(50, 90, 40) + rng.normal(0, 1, 40)}, index=meses)
+    pron = forecast.pronosticar(series, horizonte=18)
+    assert (pron["inferior_95"] <= pron["inferior_80"]).all().all()
+    assert (pron["inferior_80"] <= pron["pronostico"]).all().all()
+    assert (pron["pronostico"] <= pron["superior_80"]).all().all()
+    assert (pron["superior_80"] <= pron["superior_95"]).all().all()
+    assert forecast.ajustar_series(series) is forecast.ajustar_series(series.copy())
@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+import gemini_client
+
+
+class _ModeloCaido:
+    """Modelo que tarda lo que le dejan y siempre falla con un error transitorio."""
+
+    def __init__(self):
+        self.timeouts = []
+
+    def generate_content(self, prompt, generation_config=None, request_options=None, stream=False):
+        self.timeouts.append(request_options["timeout"])
+        time.sleep(min(request_options["timeout"], 0.2))
+        raise TimeoutError("sin respuesta")
+
+
+@pytest.fixture
+def modelo(monkeypatch):
+    modelo = _ModeloCaido()
+    monkeypatch.setattr(gemini_client, "obtener_modelo", lambda *a, **k: modelo)
+    monkeypatch.setattr(gemini_client, "_espera_backoff", lambda intento: 0.3)
+    return modelo
+
+
+def test_deadline_total_incluye_reintentos(modelo):
+    inicio = time.monotonic()
+    with pytest.raises(RuntimeError):
+        gemini_client._generar_respuesta_directa("hola", timeout=0.6, max_reintentos=10)
+    assert time.monotonic() - inicio < 0.8
+    assert len(modelo.timeouts) < 11
+    assert all(t <= 0.6 for t in modelo.timeouts)
+
+
+def test_deadline_total_en_streaming(modelo):
+    inicio = time.monotonic()
+    with pytest.raises(RuntimeError):
+        list(gemini_client.generar_respuesta_stream("hola", timeout=0.6, max_reintentos=10, sesion="deadline"))
+    assert time.monotonic() - inicio < 0.8
+    assert modelo.timeouts[1] < modelo.timeouts[0]
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import health_core
+from sinteticos import ledger_sintetico
+from health_core import EstadoSalud, _Acumulado, calcular_salud, detectar_anomalias
+from ingesta import compactar_ledger
+
+
+def _meses(n: int, semilla: int = 0):
+    rng = np.random.default_rng(semilla)
+    categorias = ["Ventas", "Servicios", "Renta", "Nómina", "Marketing"]
+    return {
+        f"2022-{i + 1:02d}" if i < 12 else f"2023-{i - 11:02d}": (
+            float(rng.uniform(0, 5_000)) if i % 7 else 0.0,  # algunos meses sin ingresos
+            float(rng.uniform(500, 4_000)),
+            frozenset(rng.choice(categorias, 3, replace=False)),
+            frozenset(rng.choice(categorias[:2], 1)),
+        )
+        for i in range(n)
+    }
+
+
+def _desde_cero(datos):
+    acumulado = _Acumulado()
+    for mes in datos.values():
+        acumulado.sumar(mes, 1)
+    return acumulado
+
+
+def _formula_directa(datos):
+    """Índice calculado de una vez con numpy, sin acumulados."""
+    ingreso = np.array([d[0] for d in datos.values()])
+    flujo = ingreso - np.array([d[1] for d in datos.values()])
+    ratio = np.divide(flujo, ingreso, out=np.zeros_like(flujo), where=ingreso != 0)
+    media = flujo.mean()
+    cv = 0.0 if abs(media) < 1e-9 else flujo.std() / abs(media)
+    todas = set().union(*(d[2] for d in datos.values()))
+    de_ingreso = set().union(*(d[3] for d in datos.values()))
+    return {"ahorro_promedio": ratio.mean(), "estabilidad": max(min(1 - cv, 1.0), 0.0),
+            "diversificacion": len(de_ingreso) / len(todas)}
+
+
+def test_welford_altas_y_bajas_igualan_recalculo():
+    datos = _meses(20)
+    acumulado = _desde_cero(datos)
+    quitados = list(datos)[3:15:2]
+    for mes in quitados:
+        acumulado.sumar(datos[mes], -1)
+    restantes = {m: d for m, d in datos.items() if m not in quitados}
+
+    flujo = np.array([d[0] - d[1] for d in restantes.values()])
+    assert acumulado.n == len(restantes)
+    assert acumulado.media == pytest.approx(flujo.mean(), rel=1e-12)
+    assert acumulado.m2 == pytest.approx(((flujo - flujo.mean()) ** 2).sum(), rel=1e-9)
+    for clave, valor in _formula_directa(restantes).items():
+        assert acumulado.componentes()[clave] == pytest.approx(valor, abs=1e-12)
+    assert acumulado.score() == pytest.approx(_desde_cero(restantes).score(), abs=1e-9)
+
+
+def test_estado_incremental_igual_a_estado_nuevo():
+    datos = _meses(18)
+    estado = EstadoSalud()
+    estado.aplicar(dict(list(datos.items())[:12]))
+    estado.historial()
+
+    cambiado = dict(datos)
+    cambiado["2022-05"] = (1.0, 2.0, frozenset({"Renta"}), frozenset())
+    del cambiado["2022-08"]
+    assert estado.aplicar(cambiado) == sorted({"2022-05", "2022-08", *list(datos)[12:]})
+
+    nuevo = EstadoSalud()
+    nuevo.aplicar(cambiado)
+    assert estado.score() == pytest.approx(nuevo.score(), abs=1e-9)
+    for (mes, score), (mes_n, score_n) in zip(estado.historial(), nuevo.historial()):
+        assert mes == mes_n
+        assert score == pytest.approx(score_n, abs=1e-9, nan_ok=True)
+    assert estado.aplicar(cambiado) == []
+
+
+def test_calcular_salud_coincide_con_formula_directa():
+    df = ledger_sintetico(20_000, meses=24, semilla=3)
+    salud = calcular_salud(df, historial=True)
+    esperado = _formula_directa(health_core.resumen_salud(df))
+    assert salud["ok"]
+    for clave, valor in esperado.items():
+        assert salud["componentes"][clave] == pytest.approx(valor, abs=1e-12)
+    assert salud["historial"]["score"].iloc[-1] == pytest.approx(salud["score"])
+
+
+def test_calcular_salud_sin_columnas():
+    assert not calcular_salud(pd.DataFrame({"monto": [1.0]}))["ok"]
+
+
+def test_isolation_forest_se_reutiliza():
+    df = ledger_sintetico(20_000, meses=24, semilla=11)
+    primero = detectar_anomalias(df, contaminacion=0.1)
+    assert primero["origen"] == "entrenado"
+
+    # mismo contenido en otro objeto: hit por hash, mismas etiquetas
+    segundo = detectar_anomalias(df.copy(), contaminacion=0.1)
+    assert segundo["origen"] == "memoria"
+    assert (segundo["resumen"]["anomalia"] == primero["resumen"]["anomalia"]).all()
+
+    # un mes más al final: se puntúa con el modelo previo
+    extra = ledger_sintetico(500, meses=1, semilla=12)
+    extra["fecha"] = extra["fecha"] + pd.DateOffset(months=24)
+    ampliado = compactar_ledger(pd.concat([df, extra], ignore_index=True), float32=False)
+    tercero = detectar_anomalias(ampliado, contaminacion=0.1)
+    assert tercero["origen"] == "incremental"
+    assert tercero["meses_incrementales"] == 1
+
+    # otra contaminación es otro modelo
+    assert detectar_anomalias(df, contaminacion=0.2)["origen"] == "entrenado"
+
+
+def test_anomalias_transacciones_encuentra_fila_plantada():
+    df = ledger_sintetico(20_000, meses=12, semilla=5)
+    df = df.copy()
+    df.loc[123, "monto"] = df["monto"].max() * 50
+    resultado = health_core.anomalias_transacciones(df, k=5)
+    assert resultado["ok"]
+    assert 123 in resultado["top"].index
+
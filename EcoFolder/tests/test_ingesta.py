@@ -0,0 +1,39 @@
+import io
+
+import pandas as pd
+
+from dataset_cache import huella_contenido, huella_stream
+from ingesta import filtrar_por_lotes, iterar_lotes
+from ledger import ledger_agregado
+
+
+def _csv() -> bytes:
+    df = pd.DataFrame({
+        "Fecha": pd.date_range("2023-01-01", periods=500, freq="D").astype(str),
+        "Tipo": ["ingreso", "gasto"] * 250,
+        "Categoria": ["Ventas", "Renta", "Servicios", "Renta"] * 125,
+        "Monto": range(500),
+        "Extra": "x",
+    })
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def test_huella_stream_igual_a_huella_contenido():
+    contenido = _csv()
+    archivo = io.BytesIO(contenido)
+    archivo.read(10)
+    assert huella_stream(archivo, bloque=97) == huella_contenido(contenido)
+    assert archivo.tell() == 0
+
+
+def test_lotes_desde_archivo_abierto_igual_que_desde_bytes():
+    contenido = _csv()
+    archivo = io.BytesIO(contenido)
+    huella_stream(archivo)
+    desde_stream = ledger_agregado(iterar_lotes("datos.csv", archivo, tamano_lote=64))
+    desde_bytes = ledger_agregado(iterar_lotes("datos.csv", contenido, tamano_lote=64))
+    pd.testing.assert_frame_equal(desde_stream, desde_bytes)
+
+    # el mismo archivo se puede volver a recorrer (drill-down) sin reabrirlo
+    filas = filtrar_por_lotes("datos.csv", archivo, mes="2023-02", categoria="renta", tamano_lote=64)
+    assert len(filas) == 14 and (filas["categoria"] == "renta").all()
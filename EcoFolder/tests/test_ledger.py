@@ -0,0 +1,18 @@
+import pandas as pd
+
+import ledger
+
+
+def test_serie_mensual_ignora_meses_sin_ingresos_ni_gastos():
+    df = pd.DataFrame({
+        "fecha": pd.to_datetime(["2024-01-10", "2024-02-05", "2024-03-20", "2024-04-01"]),
+        "tipo": ["Ingreso", "transferencia", "gasto", "transferencia"],
+        "categoria": ["Ventas", "Cuentas", "Renta", "Cuentas"],
+        "monto": [1000.0, 500.0, 300.0, 200.0],
+    })
+    serie = ledger.serie_mensual(df)
+    assert list(serie.index) == ["2024-01", "2024-03"]
+    assert serie.loc["2024-01", "flujo"] == 1000.0
+    assert serie.loc["2024-03", "flujo"] == -300.0
+    # el cubo sigue conservando los demás tipos para quien los necesite
+    assert set(ledger.cubo_mensual(df)["tipo"]) == {"ingreso", "gasto", "transferencia"}
@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+import gemini_client
+import llm_cache
+
+
+def test_clave_incluye_modelo_y_configuracion():
+    base = llm_cache.clave_prompt("hola", "gemini-2.5-flash", {"max_output_tokens": 2048})
+    assert base == llm_cache.clave_prompt("hola", "gemini-2.5-flash", {"max_output_tokens": 2048})
+    assert base != llm_cache.clave_prompt("hola", "gemini-2.5-pro", {"max_output_tokens": 2048})
+    assert base != llm_cache.clave_prompt("hola", "gemini-2.5-flash", {"max_output_tokens": 256})
+    assert gemini_client.clave_respuesta("hola", 256) != gemini_client.clave_respuesta("hola", 2048)
+
+
+def test_ruta_por_defecto_no_depende_del_directorio():
+    if "FINMIND_LLM_CACHE_RUTA" in os.environ:
+        pytest.skip("ruta fijada por el entorno")
+    assert os.path.isabs(llm_cache.RUTA_SQLITE)
+    assert os.path.dirname(os.path.dirname(llm_cache.RUTA_SQLITE)) == os.path.dirname(os.path.abspath(llm_cache.__file__))
+
+
+def test_otro_max_output_tokens_no_usa_la_respuesta_cacheada(monkeypatch):
+    memoria = llm_cache.CacheMemoria()
+    monkeypatch.setattr(llm_cache, "obtener_backend", lambda *a: memoria)
+    llm_cache.guardar(gemini_client.clave_respuesta("¿cómo voy?", 64), "respuesta truncada")
+    texto, _, _ = gemini_client._buscar_en_cache("¿cómo voy?", None, 2048)
+    assert texto is None
+    texto, _, _ = gemini_client._buscar_en_cache("¿cómo voy?", None, 64)
+    assert texto == "respuesta truncada"
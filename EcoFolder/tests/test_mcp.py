@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import mcp
+from sinteticos import ledger_sintetico
+
+
+def _linea_base(df: pd.DataFrame, var_ing: float = 0.0, var_gas: float = 0.0) -> dict:
+    """Implementación original: suma de monto por tipo sobre una copia escalada del ledger."""
+    ingresos = df.loc[df["tipo"] == "ingreso", "monto"].sum() * (1 + var_ing)
+    gastos = df.loc[df["tipo"] == "gasto", "monto"].sum() * (1 + var_gas)
+    flujo = ingresos - gastos
+    return {"ingresos": ingresos, "gastos": gastos, "flujo": flujo, "ahorro": flujo / ingresos if ingresos > 0 else 0}
+
+
+def _ledger_sin_fechas() -> pd.DataFrame:
+    return pd.DataFrame({
+        "fecha": ["2024-01-05", None, "2024-02-01", "no es fecha"],
+        "tipo": ["ingreso", "gasto", "gasto", "ingreso"],
+        "categoria": ["Ventas", "Renta", None, "Servicios"],
+        "monto": [1000.0, 400.0, 50.0, 250.0],
+    })
+
+
+@pytest.mark.parametrize("df", [
+    _ledger_sin_fechas(),
+    _ledger_sin_fechas().drop(columns="fecha"),
+    _ledger_sin_fechas().drop(columns="categoria"),
+    ledger_sintetico(5_000),
+], ids=["fechas_nulas", "sin_fecha", "sin_categoria", "sintetico"])
+def test_analizar_finanzas_coincide_con_linea_base(df):
+    esperado = _linea_base(df)
+    obtenido = mcp.analizar_finanzas(df)
+    for clave, valor in esperado.items():
+        assert obtenido[clave] == pytest.approx(float(valor), rel=1e-9)
+
+
+def test_fila_sin_fecha_no_se_pierde():
+    assert mcp.analizar_finanzas(_ledger_sin_fechas())["gastos"] == pytest.approx(450.0)
+
+
+def test_simular_escenario_coincide_con_linea_base():
+    df = _ledger_sin_fechas()
+    for var_ing, var_gas in [(0.1, -0.2), (-0.5, 0.5), (0.0, 0.0)]:
+        esperado = _linea_base(df, var_ing, var_gas)
+        obtenido = mcp.simular_escenario(df, var_ing, var_gas)
+        assert obtenido["flujo"] == pytest.approx(esperado["flujo"])
+    # la categoria tiene prioridad sobre el tipo; la fila sin fecha también se escala
+    obtenido = mcp.simular_escenario(df, {"gastos": 0.1, "Renta": 0.5})
+    assert obtenido["gastos"] == pytest.approx(400.0 * 1.5 + 50.0 * 1.1)
+    assert np.isclose(mcp.superficie_sensibilidad(df, [0.0], [0.0])["flujo"][0, 0], 1250.0 - 450.0)
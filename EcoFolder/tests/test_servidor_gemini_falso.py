@@ -0,0 +1,112 @@
+"""ai_executor + gemini_client contra servidor_gemini_falso.py (sin red ni cuota)."""
+import threading
+import time
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import ai_executor
+import gemini_client
+import servidor_gemini_falso
+from servidor_gemini_falso import ManejadorGemini
+
+
+@contextmanager
+def _servidor_falso():
+    import google.generativeai as genai
+    from google.generativeai.client import _client_manager
+
+    # genai.configure es global al proceso: se guarda la configuración previa para restaurarla
+    previa = (dict(_client_manager.client_config), _client_manager.default_metadata, dict(_client_manager.clients))
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), ManejadorGemini)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    genai.configure(api_key="falsa", transport="rest",
+                    client_options={"api_endpoint": f"http://127.0.0.1:{srv.server_address[1]}"})
+    try:
+        yield srv
+    finally:
+        srv.shutdown()
+        _client_manager.client_config, _client_manager.default_metadata, _client_manager.clients = previa
+        gemini_client.obtener_modelo.cache_clear()
+
+
+@pytest.fixture(scope="module")
+def servidor():
+    with _servidor_falso() as srv:
+        yield srv
+
+
+def test_restaura_configuracion_de_genai():
+    from google.generativeai.client import _client_manager
+
+    antes = dict(_client_manager.client_config)
+    with _servidor_falso():
+        assert _client_manager.client_config != antes
+    assert _client_manager.client_config == antes
+
+
+@pytest.fixture
+def gemini(servidor, monkeypatch):
+    monkeypatch.setattr(gemini_client, "DISPONIBLE", True)
+    monkeypatch.setattr(ManejadorGemini, "latencia_s", 0.3)
+    # limitador holgado salvo en la prueba que lo mide
+    monkeypatch.setattr(ai_executor, "_BUCKET", ai_executor.TokenBucket(tasa=100, capacidad=100))
+    with servidor_gemini_falso._LOCK:
+        servidor_gemini_falso._STATS.update(solicitudes=0, simultaneas=0, max_simultaneas=0)
+    return servidor_gemini_falso._STATS
+
+
+def _en_paralelo(llamadas):
+    resultados = [None] * len(llamadas)
+
+    def _correr(i, llamada):
+        resultados[i] = llamada()
+
+    hilos = [threading.Thread(target=_correr, args=(i, llamada)) for i, llamada in enumerate(llamadas)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados
+
+
+def test_prompts_identicos_en_vuelo_se_coalescen(gemini):
+    antes = ai_executor.estadisticas()["coalescidas"]
+    resultados = _en_paralelo([
+        (lambda i=i: gemini_client.generar_respuesta("¿Cómo voy este mes?", sesion=f"coalescer-{i}"))
+        for i in range(5)
+    ])
+    assert len(set(resultados)) == 1 and resultados[0].startswith("Respuesta simulada")
+    assert gemini["solicitudes"] == 1
+    assert ai_executor.estadisticas()["coalescidas"] - antes == 4
+
+
+def test_cupo_por_sesion(gemini):
+    _en_paralelo([
+        (lambda i=i: gemini_client.generar_respuesta(f"pregunta {i}", sesion="una-sesion"))
+        for i in range(5)
+    ])
+    assert gemini["solicitudes"] == 5
+    assert gemini["max_simultaneas"] <= ai_executor.MAX_POR_SESION
+
+
+def test_sesiones_distintas_no_se_limitan_entre_si(gemini):
+    _en_paralelo([
+        (lambda i=i: gemini_client.generar_respuesta(f"otra pregunta {i}", sesion=f"sesion-{i}"))
+        for i in range(4)
+    ])
+    assert gemini["max_simultaneas"] > ai_executor.MAX_POR_SESION
+
+
+def test_token_bucket_limita_la_tasa(gemini, monkeypatch):
+    monkeypatch.setattr(ManejadorGemini, "latencia_s", 0.0)
+    monkeypatch.setattr(ai_executor, "_BUCKET", ai_executor.TokenBucket(tasa=10, capacidad=1))
+    inicio = time.monotonic()
+    _en_paralelo([
+        (lambda i=i: gemini_client.generar_respuesta(f"tasa {i}", sesion=f"tasa-{i}"))
+        for i in range(5)
+    ])
+    # 1 ficha inicial y 4 repuestas a 10/s
+    assert time.monotonic() - inicio >= 0.35
+    assert gemini["solicitudes"] == 5
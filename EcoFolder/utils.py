@@ -2,145 +2,52 @@
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import unicodedata
+import numpy as np
+import time
+import dataset_cache
+from dataset_cache import huella_stream
+from ingesta import (COLUMNAS_LEDGER, COLUMNAS_REQUERIDAS, EXTENSIONES_SOPORTADAS, FORMATOS_POR_LOTES,
+                     clave_mes, compactar_ledger, filtrar_por_lotes, formato_de, iterar_lotes,
+                     leer_archivo, limpiar_texto, normalizar_ledger, reporte_memoria)
+from ledger import (cubo_mensual, ledger_agregado, memo_dataset, serie_mensual, serie_periodica,
+                    totales_por_categoria)
 
-
-def limpiar_texto(texto):
-    if not isinstance(texto, str):
-        return texto
-    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('utf-8')
-    return texto.strip().lower()
+HUELLA_EJEMPLO = "datos_ejemplo"
 
 
 def cargar_datos():
     with st.sidebar:
-        # Estilo visual del sidebar con corrección para la flecha de Streamlit
+        # Estilos del sidebar en static/finmind.css (assets.aplicar_estilos)
         st.markdown("""
-        <style>
-            @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap');
-
-            /* Fuente Inter solo en texto */
-            body, p, h1, h2, h3, h4, h5, h6, label, button, input, textarea, .sidebar-card, .checkbox-card {
-                font-family: 'Inter', sans-serif !important;
-            }
-
-            /* Restaurar fuente para íconos del sidebar (flecha y Material Icons) */
-            .material-icons,
-            .material-icons-outlined,
-            .material-symbols-outlined,
-            [data-testid="stSidebarCollapseControl"] span {
-                font-family: 'Material Icons Outlined','Material Icons','Material Symbols Outlined' !important;
-                font-weight: normal !important;
-                font-style: normal !important;
-                letter-spacing: normal !important;
-                text-transform: none !important;
-            }
-
-            /* Tarjeta principal */
-            .sidebar-card {
-                background-color: #fff;
-                border-radius: 14px;
-                padding: 5px;
-                box-shadow: 0 3px 6px rgba(0,0,0,0.06);
-                margin-bottom: 18px;
-            }
-            .sidebar-header {
-                display: flex;
-                align-items: center;
-                gap: 12px;
-                margin-bottom: 8px;
-            }
-            .sidebar-header .icon {
-                background: #d71921;
-                color: white;
-                border-radius: 10px;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                width: 42px;
-                height: 42px;
-                font-size: 22px;
-                font-weight: bold;
-            }
-            .sidebar-header h3 {
-                margin: 0;
-                color: #0E1E40;
-                font-size: 1.05rem;
-                font-weight: 800;
-            }
-            .sidebar-header p {
-                margin: 0;
-                color: #666;
-                font-size: 0.85rem;
-            }
-
-            /* File uploader */
-            div[data-testid="stFileUploader"] > section {
-                border: 2px dashed #e6b8b8 !important;
-                border-radius: 12px !important;
-                background-color: #fff !important;
-                padding: 20px 10px !important;
-                display: flex !important;
-                flex-direction: column !important;
-                align-items: center !important;
-                justify-content: center !important;
-                text-align: center !important;
-            }
-            div[data-testid="stFileUploader"] button {
-                background: linear-gradient(90deg, #d71921, #f54747);
-                color: #fff !important;
-                border: none !important;
-                border-radius: 10px !important;
-                padding: 8px 18px !important;
-                font-weight: 600 !important;
-                margin-top: 10px !important;
-                font-size: 0.9rem !important;
-            }
-            div[data-testid="stFileUploader"] button:hover {
-                background: linear-gradient(90deg, #b20f19, #e73d3d);
-            }
-
-            /* Checkbox card */
-            .checkbox-card {
-                background: #fff5f5;
-                border: 1px solid #f5c2c2;
-                border-radius: 10px;
-                padding: 12px 14px;
-                margin-top: 15px;
-            }
-            .checkbox-card label {
-                font-weight: 600 !important;
-                color: #0E1E40 !important;
-            }
-            .checkbox-card small {
-                display: block;
-                color: #555;
-                font-size: 0.8rem;
-                margin-left: 24px;
-                margin-top: 4px;
-            }
-        </style>
-
-        <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/bootstrap-icons.css">
         <div class="sidebar-card">
             <div class="sidebar-header">
                 <div class="icon"><i class="bi bi-file-earmark-arrow-up"></i></div>
                 <div>
                     <h3>Carga de datos</h3>
-                    <p>Sube tu archivo (.xlsx)</p>
+                    <p>Sube tu archivo (.xlsx, .csv, .parquet, .feather)</p>
                 </div>
             </div>
         </div>
         """, unsafe_allow_html=True)
 
-    archivo = st.sidebar.file_uploader("Sube tu archivo (.xlsx)", type=["xlsx"], key="file_uploader")
+    archivo = st.sidebar.file_uploader("Sube tu archivo (.xlsx, .csv, .parquet, .feather)",
+                                       type=EXTENSIONES_SOPORTADAS, key="file_uploader")
     usar_ejemplo = st.sidebar.checkbox("Usar datos de ejemplo", key="usar_ejemplo")
+    por_lotes = False
+    if archivo is not None and formato_de(archivo.name) in FORMATOS_POR_LOTES:
+        por_lotes = st.sidebar.checkbox(
+            "Procesar por lotes (ledgers muy grandes)", key="ingesta_por_lotes",
+            help="Agrega el archivo por mes y categoría sin cargar todas las filas en memoria."
+        )
 
     if not archivo and not usar_ejemplo:
         return None
 
     if usar_ejemplo and not archivo:
+        df_cache = obtener_dataset(HUELLA_EJEMPLO)
+        if df_cache is not None:
+            st.sidebar.success("✅ Usando datos de ejemplo")
+            return df_cache
         data = {
             "empresa_id": ["E001"]*6,
             "fecha": pd.date_range("2024-01-01", periods=6, freq="ME"),
@@ -151,17 +58,26 @@ def cargar_datos():
         }
         df = pd.DataFrame(data)
         st.sidebar.success("✅ Usando datos de ejemplo")
-        return procesar_dataframe(df, es_ejemplo=True)
+        df_procesado = procesar_dataframe(df, es_ejemplo=True)
+        df_procesado.attrs["huella"] = HUELLA_EJEMPLO
+        guardar_dataset(HUELLA_EJEMPLO, df_procesado)
+        return df_procesado
+
+    if archivo is not None and por_lotes:
+        return _cargar_por_lotes(archivo)
 
     if archivo is not None:
-        archivo_id = f"{archivo.name}_{archivo.size}"
-        if 'ultimo_archivo' in st.session_state and st.session_state.ultimo_archivo == archivo_id:
-            if 'datos_cargados' in st.session_state:
-                return st.session_state.datos_cargados
+        huella = _huella_archivo(archivo)
+        df_cache = obtener_dataset(huella)
+        if df_cache is not None:
+            st.sidebar.success(f"✅ Archivo '{archivo.name}' cargado desde caché")
+            _mostrar_reporte_memoria(df_cache)
+            return df_cache
 
         try:
             with st.spinner('Procesando archivo...'):
-                df = pd.read_excel(archivo)
+                inicio = time.perf_counter()
+                df = leer_archivo(archivo.name, archivo.getvalue())
                 st.sidebar.success(f"✅ Archivo '{archivo.name}' leído correctamente")
 
                 with st.sidebar.expander("Ver vista previa del archivo"):
@@ -169,9 +85,11 @@ def cargar_datos():
                     st.dataframe(df.head(3))
 
                 df_procesado = procesar_dataframe(df, es_ejemplo=False)
+                st.sidebar.caption(f"⏱️ Ingesta: {time.perf_counter() - inicio:.2f} s ({len(df):,} filas)")
                 if df_procesado is not None:
-                    st.session_state.ultimo_archivo = archivo_id
-                    st.session_state.datos_cargados = df_procesado
+                    df_procesado.attrs["huella"] = huella
+                    guardar_dataset(huella, df_procesado)
+                    _mostrar_reporte_memoria(df_procesado)
                 return df_procesado
 
         except Exception as e:
@@ -182,13 +100,121 @@ def cargar_datos():
     return None
 
 
+def obtener_dataset(huella: str):
+    """DataFrame procesado de la caché compartida o, si era demasiado grande para ella, de la sesión."""
+    df = dataset_cache.obtener_dataset(huella)
+    if df is None:
+        propio = st.session_state.get("dataset_sesion")
+        if propio is not None and propio[0] == huella:
+            return propio[1]
+    return df
+
+
+def guardar_dataset(huella: str, df: pd.DataFrame) -> None:
+    """
+    Guarda en la caché compartida; si no cabe en su presupuesto se conserva sólo en esta sesión
+    (una entrada, la del último archivo grande) para no releerlo en cada rerun.
+    """
+    if not dataset_cache.guardar_dataset(huella, df):
+        st.session_state["dataset_sesion"] = (huella, df)
+
+
+def _mostrar_reporte_memoria(df: pd.DataFrame):
+    reporte = df.attrs.get("reporte_memoria")
+    if reporte is None:
+        return
+    total = reporte.loc["TOTAL"]
+    with st.sidebar.expander(f"💾 Memoria: {total['antes_mb']:.1f} MB → {total['despues_mb']:.1f} MB"):
+        st.dataframe(reporte)
+
+
+def _cargar_por_lotes(archivo):
+    """
+    Ingesta por lotes: sólo se conservan los agregados mes x tipo x categoria.
+    El archivo se hashea y se lee como stream (sin getvalue ni copias del contenido), así que la
+    memoria adicional queda acotada por el lote. Límite que queda: Streamlit mantiene el upload
+    completo en la memoria del servidor mientras la sesión lo conserva (ver server.maxUploadSize).
+    """
+    huella = f"{_huella_archivo(archivo)}:lotes"
+    df_cache = obtener_dataset(huella)
+    if df_cache is not None:
+        st.sidebar.success(f"✅ Archivo '{archivo.name}' cargado desde caché (agregado por lotes)")
+        return df_cache
+
+    try:
+        with st.spinner('Procesando archivo por lotes...'):
+            inicio = time.perf_counter()
+            df_agregado = ledger_agregado(iterar_lotes(archivo.name, archivo))
+            n_filas = int(df_agregado["n"].sum())
+            st.sidebar.success(f"✅ Archivo '{archivo.name}' agregado por lotes")
+            st.sidebar.caption(
+                f"⏱️ Ingesta: {time.perf_counter() - inicio:.2f} s "
+                f"({n_filas:,} filas → {len(df_agregado):,} agregados)"
+            )
+            df_agregado.attrs["huella"] = huella
+            guardar_dataset(huella, df_agregado)
+            return df_agregado
+    except Exception as e:
+        st.sidebar.error(f"❌ Error al leer el archivo: {e}")
+        st.error(f"**Detalles del error:** {str(e)}")
+        return None
+
+
+def mostrar_detalle_transacciones(df: pd.DataFrame):
+    """
+    Drill-down de transacciones por mes/categoria. Si el ledger se cargó por lotes,
+    las filas crudas se leen del archivo sólo en este momento.
+    """
+    cubo = cubo_mensual(df)
+    if cubo.empty:
+        return
+    with st.expander("🔎 Detalle de transacciones"):
+        c1, c2 = st.columns(2)
+        mes = c1.selectbox("Mes", sorted(cubo["mes"].unique(), reverse=True), key="detalle_mes")
+        categorias = sorted(cubo.loc[cubo["mes"] == mes, "categoria"].astype(str).unique())
+        categoria = c2.selectbox("Categoría", categorias, key="detalle_categoria")
+        if not st.button("Ver transacciones", key="detalle_ver"):
+            return
+        if df.attrs.get("agregado"):
+            archivo = st.session_state.get("file_uploader")
+            if archivo is None:
+                st.warning("El archivo original ya no está disponible para el detalle.")
+                return
+            with st.spinner("Buscando transacciones en el archivo..."):
+                # memoizado junto al ledger agregado (ya cacheado por huella): repetir un filtro no relee el archivo
+                filas = memo_dataset(df, f"detalle:{mes}:{categoria}",
+                                     lambda _: filtrar_por_lotes(archivo.name, archivo, mes=mes, categoria=categoria))
+        else:
+            fechas = df["fecha"]
+            mascara = ((fechas.dt.year * 12 + fechas.dt.month - 1) == clave_mes(mes)) & (
+                df["categoria"].astype(str) == categoria
+            )
+            filas = df.loc[mascara, [c for c in COLUMNAS_LEDGER if c in df.columns]].head(5_000)
+        st.caption(f"{len(filas):,} transacciones (máx. 5,000)")
+        st.dataframe(filas, use_container_width=True)
+
+
+def _huella_archivo(archivo) -> str:
+    """
+    Hash SHA-256 del contenido subido. Se recuerda sólo para el upload actual de la sesión
+    para no volver a hashear el mismo archivo en cada rerun.
+    """
+    file_id = getattr(archivo, "file_id", None)
+    recordada = st.session_state.get("huella_archivo")
+    if file_id is not None and recordada is not None and recordada[0] == file_id:
+        return recordada[1]
+    huella = huella_stream(archivo)
+    if file_id is not None:
+        st.session_state["huella_archivo"] = (file_id, huella)
+    return huella
+
+
 def procesar_dataframe(df, es_ejemplo=False):
     df.columns = [limpiar_texto(c) for c in df.columns]
     if not es_ejemplo:
         st.sidebar.info(f"📋 Columnas detectadas: {', '.join(df.columns)}")
 
-    columnas_requeridas = ["fecha", "tipo", "categoria", "monto"]
-    faltantes = [c for c in columnas_requeridas if c not in df.columns]
+    faltantes = [c for c in COLUMNAS_REQUERIDAS if c not in df.columns]
 
     if faltantes:
         st.error(f"❌ **Faltan columnas requeridas:** {', '.join(faltantes)}")
@@ -197,88 +223,15 @@ def procesar_dataframe(df, es_ejemplo=False):
         st.code("fecha | tipo | categoria | monto")
         return None
 
-    df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce")
-    df["monto"] = pd.to_numeric(df["monto"], errors="coerce")
-    df["tipo"] = df["tipo"].astype(str).str.lower().str.strip()
-    df["categoria"] = df["categoria"].astype(str).str.lower().str.strip()
-    df["concepto"] = df.get("concepto", "Sin concepto")
-
-    df = df.dropna(subset=["fecha", "monto"])
+    df = normalizar_ledger(df)
+    uso_antes = df.memory_usage(deep=True, index=False)
+    df = compactar_ledger(df)
+    df.attrs["reporte_memoria"] = reporte_memoria(uso_antes, df)
     return df
 
 
 def mostrar_kpis(analisis: dict, titulo="Indicadores financieros"):
     st.markdown(f"""
-        <style>
-            @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap');
-            body, p, h1, h2, h3, h4, h5, h6, label, button {{
-                font-family: 'Inter', sans-serif !important;
-            }}
-            .material-icons,
-            .material-icons-outlined,
-            .material-symbols-outlined {{
-                font-family: 'Material Icons Outlined','Material Icons','Material Symbols Outlined' !important;
-            }}
-            .kpi-container {{
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 1rem;
-                margin-top: 1.5rem;
-                margin-bottom: 2rem;
-            }}
-            .kpi-card {{
-                background: linear-gradient(180deg, #FFFFFF 0%, #FAFAFA 100%);
-                border: 1px solid #E5E7EB;
-                border-radius: 10px;
-                padding: 1rem 1.2rem;
-                transition: all 0.2s ease;
-            }}
-            .kpi-card:hover {{
-                transform: translateY(-3px);
-                border-color: #d71921;
-                box-shadow: 0 2px 6px rgba(0,0,0,0.05);
-            }}
-            .kpi-title {{
-                color: #374151;
-                font-size: 0.9rem;
-                font-weight: 600;
-                margin-bottom: 0.4rem;
-                display: flex;
-                align-items: center;
-                gap: 0.4rem;
-            }}
-            .kpi-value {{
-                font-size: 1.4rem;
-                font-weight: 800;
-                color: #0E1E40;
-            }}
-            .titulo-kpi {{
-                color: #0E1E40;
-                font-weight: 800;
-                font-size: 1.3rem;
-                margin-top: 2rem;
-                margin-bottom: 0.3rem;
-                
-            }}
-            .divider {{
-                border: none;
-                border-top: 2px solid #d71921;
-                width: 100%;
-                margin-bottom: 1rem;
-                opacity: 0.9;
-            }}
-            .positivo {{
-                color: #16a34a;
-                font-weight: 600;
-                font-size: 0.85rem;
-            }}
-            .negativo {{
-                color: #dc2626;
-                font-weight: 600;
-                font-size: 0.85rem;
-            }}
-        </style>
-                
         <div class="titulo-kpi">{titulo}</div>
         <hr class="divider">
 
@@ -306,50 +259,40 @@ def mostrar_kpis(analisis: dict, titulo="Indicadores financieros"):
     """, unsafe_allow_html=True)
 
 
-def mostrar_dashboard(df: pd.DataFrame, analisis: dict):
-    st.markdown("""
-        <style>
-            @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap');
-            body, p, h1, h2, h3, h4, h5, h6, label, button {
-                font-family: 'Inter', sans-serif !important;
-            }
-            .material-icons,
-            .material-icons-outlined,
-            .material-symbols-outlined {
-                font-family: 'Material Icons Outlined','Material Icons','Material Symbols Outlined' !important;
-            }
-            .titulo-dashboard {
-                color: #0E1E40;
-                font-weight: 800;
-                font-size: 1.3rem;
-                margin-top: 2rem;
-                margin-bottom: 0.3rem;
-                
-            }
-            .divider {
-                border: none;
-                border-top: 2px solid #d71921;
-                width: 100%;
-                margin-bottom: 1.2rem;
-                opacity: 0.9;
-            }
-        </style>
-        <div class="titulo-dashboard"><i class="bi bi-bar-chart-line-fill"></i> Dashboard Financiero</div>
-        <hr class="divider">
-    """, unsafe_allow_html=True)
+# Dashboard: figuras memoizadas por dataset y granularidad
+MAX_BARRAS_MES = 36  # con más meses se agrupa por trimestre (y por año si aún son demasiados)
+GRANULARIDADES = {"Automática": None, "Mes": "mes", "Trimestre": "trimestre", "Año": "anio"}
+ETIQUETAS_PERIODO = {"mes": "Mes", "trimestre": "Trimestre", "anio": "Año"}
+
 
-    df["mes"] = df["fecha"].dt.to_period("M").astype(str)
-    resumen = df.groupby(["mes", "tipo"])["monto"].sum().reset_index()
+def _periodo_automatico(n_meses: int) -> str:
+    if n_meses <= MAX_BARRAS_MES:
+        return "mes"
+    if n_meses <= MAX_BARRAS_MES * 3:
+        return "trimestre"
+    return "anio"
 
+
+def _figura_barras(df: pd.DataFrame, periodo: str):
+    import plotly.express as px  # diferido: no hace falta para la landing ni la carga de datos
+
+    serie = serie_periodica(df, periodo)
+    datos = (
+        serie[["ingreso", "gasto"]]
+        .rename_axis("periodo")
+        .reset_index()
+        .melt(id_vars="periodo", var_name="tipo", value_name="monto")
+    )
+    etiqueta = ETIQUETAS_PERIODO[periodo]
     fig = px.bar(
-        resumen,
-        x="mes",
+        datos,
+        x="periodo",
         y="monto",
         color="tipo",
         barmode="group",
         color_discrete_map={"ingreso": "#00A884", "gasto": "#D71921"},
-        title="Ingresos vs Gastos por Mes",
-        labels={"monto": "Monto ($)", "mes": "Mes"},
+        title=f"Ingresos vs Gastos por {etiqueta}",
+        labels={"monto": "Monto ($)", "periodo": etiqueta},
     )
 
     fig.update_layout(
@@ -368,33 +311,56 @@ def mostrar_dashboard(df: pd.DataFrame, analisis: dict):
         ),
         margin=dict(t=40, b=30),
     )
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
+
+
+def _figura_pastel(df: pd.DataFrame):
+    import plotly.express as px
 
-    gastos_cat = (
-        df[df["tipo"] == "gasto"]
-        .groupby("categoria")["monto"]
-        .sum()
-        .sort_values(ascending=False)
+    gastos_cat = totales_por_categoria(df, "gasto").sort_values(ascending=False)
+    fig = px.pie(
+        gastos_cat,
+        values=gastos_cat.values,
+        names=gastos_cat.index,
+        title="Distribución de Gastos por Categoría",
+        color_discrete_sequence=px.colors.sequential.Reds,
     )
+    fig.update_traces(textposition="inside", textinfo="percent+label", textfont_size=12)
+    fig.update_layout(
+        plot_bgcolor="#ffffff",
+        paper_bgcolor="#ffffff",
+        title_font=dict(size=15, color="#0E1E40", family="Inter, sans-serif"),
+        legend_title_text="Categorías",
+        margin=dict(t=30, b=30),
+    )
+    return fig
+
+
+def mostrar_dashboard(df: pd.DataFrame, analisis: dict):
+    """
+    Las figuras se construyen desde las series agregadas de ledger y se memoizan por dataset
+    y granularidad: los reruns sólo vuelven a enviar la figura ya armada.
+    """
+    st.markdown("""
+        <div class="titulo-dashboard"><i class="bi bi-bar-chart-line-fill"></i> Dashboard Financiero</div>
+        <hr class="divider">
+    """, unsafe_allow_html=True)
+
+    n_meses = len(serie_mensual(df))
+    eleccion = st.radio("Agrupar por", list(GRANULARIDADES), horizontal=True, key="dashboard_granularidad")
+    periodo = GRANULARIDADES[eleccion] or _periodo_automatico(n_meses)
+    if GRANULARIDADES[eleccion] is None and periodo != "mes":
+        st.caption(f"{n_meses} meses: se agrupan por {ETIQUETAS_PERIODO[periodo].lower()} para graficarlos.")
+
+    fig = memo_dataset(df, f"fig_dashboard_barras:{periodo}", lambda d: _figura_barras(d, periodo))
+    st.plotly_chart(fig, use_container_width=True)
+
+    gastos_cat = totales_por_categoria(df, "gasto").sort_values(ascending=False)
 
     if not gastos_cat.empty:
         col1, col2 = st.columns([1.3, 0.7])
         with col1:
-            fig2 = px.pie(
-                gastos_cat,
-                values=gastos_cat.values,
-                names=gastos_cat.index,
-                title="Distribución de Gastos por Categoría",
-                color_discrete_sequence=px.colors.sequential.Reds,
-            )
-            fig2.update_traces(textposition="inside", textinfo="percent+label", textfont_size=12)
-            fig2.update_layout(
-                plot_bgcolor="#ffffff",
-                paper_bgcolor="#ffffff",
-                title_font=dict(size=15, color="#0E1E40", family="Inter, sans-serif"),
-                legend_title_text="Categorías",
-                margin=dict(t=30, b=30),
-            )
+            fig2 = memo_dataset(df, "fig_dashboard_pastel", _figura_pastel)
             st.plotly_chart(fig2, use_container_width=True)
 
         with col2:
@@ -405,3 +371,50 @@ def mostrar_dashboard(df: pd.DataFrame, analisis: dict):
             for cat, monto in gastos_cat.head(5).items():
                 st.markdown(f"<p style='margin:0.3rem 0;'>• <b>{cat.title()}</b>: ${monto:,.0f}</p>", unsafe_allow_html=True)
             st.markdown("</div>", unsafe_allow_html=True)
+
+
+def mostrar_superficie_sensibilidad(df: pd.DataFrame, var_ing_actual: float = 0.0, var_gas_actual: float = 0.0):
+    """Mapa de calor del flujo/ahorro para toda la rejilla de escenarios y su curva de equilibrio."""
+    import plotly.graph_objects as go
+    from mcp import superficie_sensibilidad
+
+    sup = superficie_sensibilidad(df)
+    metrica = st.radio("Métrica", ["Flujo", "Ahorro (%)"], horizontal=True, key="sensibilidad_metrica")
+    if metrica == "Flujo":
+        z, formato, titulo = sup["flujo"], "$,.0f", "Flujo ($)"
+    else:
+        z, formato, titulo = sup["ahorro"] * 100, ".1f", "Ahorro (%)"
+
+    x = sup["var_gas"] * 100
+    y = sup["var_ing"] * 100
+    limite = float(np.nanmax(np.abs(z))) or 1.0
+
+    fig = go.Figure(go.Heatmap(
+        x=x, y=y, z=z,
+        colorscale=[[0, "#D71921"], [0.5, "#FFFFFF"], [1, "#00A884"]],
+        zmin=-limite, zmax=limite,
+        colorbar=dict(title=titulo),
+        hovertemplate="Gastos %{x:.0f}%<br>Ingresos %{y:.0f}%<br>" + titulo + ": %{z:" + formato + "}<extra></extra>",
+    ))
+
+    equilibrio = sup["equilibrio_var_gas"] * 100
+    dentro = (equilibrio >= x.min()) & (equilibrio <= x.max())
+    fig.add_trace(go.Scatter(
+        x=equilibrio[dentro], y=y[dentro], mode="lines", name="Punto de equilibrio (flujo = 0)",
+        line=dict(color="#0E1E40", width=2, dash="dash"),
+    ))
+    fig.add_trace(go.Scatter(
+        x=[var_gas_actual * 100], y=[var_ing_actual * 100], mode="markers", name="Escenario actual",
+        marker=dict(color="#0E1E40", size=12, symbol="x"),
+    ))
+    fig.update_layout(
+        title="Superficie de sensibilidad: variación de ingresos vs. gastos",
+        xaxis_title="Variación de gastos (%)",
+        yaxis_title="Variación de ingresos (%)",
+        plot_bgcolor="#ffffff",
+        paper_bgcolor="#ffffff",
+        font=dict(family="Inter, sans-serif", size=13),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        margin=dict(t=60, b=30),
+    )
+    st.plotly_chart(fig, use_container_width=True)